@@ -2,6 +2,16 @@ import pandas as pd
 import streamlit as st
 import plotly.express as px
 import plotly.graph_objects as go
+from plotly.subplots import make_subplots
+from datetime import time, timedelta
+
+from occupancy.bins import BIN_WIDTHS, minute_of_day
+from occupancy.cache import file_key
+from occupancy.index import build_index
+from occupancy.loading import load_sensor_csv
+from occupancy.memo import FIGURE_CACHE_MB, LRUCache
+from occupancy.metrics import capacity_utilization, floor_daily_matrix, floor_weekly_matrix
+from occupancy.timing import StageTimer
 
 # Set Streamlit page configuration
 st.set_page_config(page_title="ABC Company - Winnipeg Office", layout="wide")
@@ -42,48 +52,40 @@ st.markdown("""
 def convert_df_to_csv(df):
     return df.to_csv(index=False).encode('utf-8')
 
-# Load your data
-@st.cache_data
-def load_data(file_path):
-    df = pd.read_csv(file_path)
-    
-    # Ensure 'Local Hour' and 'Local Minute' are integers
-    df['Local Hour'] = pd.to_numeric(df['Local Hour'], errors='coerce').astype('Int64')
-    df['Local Minute'] = pd.to_numeric(df['Local Minute'], errors='coerce').astype('Int64')
-    
-    # Combine and convert timestamp
-    df['timestamp'] = pd.to_datetime(
-        df['Local Date'].astype(str) + ' ' +
-        df['Local Hour'].astype(str).str.zfill(2) + ':' +
-        df['Local Minute'].astype(str).str.zfill(2),
-        format='%Y-%m-%d %H:%M',
-        errors='coerce'
-    )
-    
-    # Check for any parsing errors in 'timestamp'
-    if df['timestamp'].isnull().any():
+# Load your data; keyed by the file's version (path, size and mtime) so a replaced file is reloaded
+@st.cache_data(max_entries=2)
+def load_data(file_path, version):
+    df, report = load_sensor_csv(file_path)
+
+    # Check for any parsing errors in 'timestamp' and 'Local Date'
+    if report.unparsed_timestamps:
         st.warning("⚠️ Some timestamps couldn't be parsed and are set to 'NaT'. Please check your CSV file for consistency.")
-    
-    # Set 'timestamp' as index
-    df.set_index('timestamp', inplace=True)
-    
-    # Convert 'Local Date' to datetime.date (no time component)
-    df['Local Date'] = pd.to_datetime(df['Local Date'], format='%Y-%m-%d', errors='coerce').dt.date
-    
-    # Check for any parsing errors in 'Local Date'
-    if df['Local Date'].isnull().any():
+    if report.unparsed_dates:
         st.warning("⚠️ Some 'Local Date' entries couldn't be parsed and are set to 'NaT'. Please check your CSV file for consistency.")
-    
-    # Calculate 'Week Start' as Monday of each week
-    df['Week Start'] = df['Local Date'] - pd.to_timedelta(pd.to_datetime(df['Local Date']).dt.dayofweek, unit='d')
-    
-    # Convert 'Week Start' to date
-    df['Week Start'] = pd.to_datetime(df['Week Start']).dt.date
-    
+
     return df
 
+# Build the sorted (Floor, Date, Time) index once per loaded file version
+@st.cache_resource(max_entries=2)
+def load_floor_index(file_path, version):
+    return build_index(load_data(file_path, version), 'Location Name')
+
+# Aggregates and figures of recent selections, shared by every session within a memory budget
+@st.cache_resource
+def load_figure_cache():
+    return LRUCache(int(FIGURE_CACHE_MB * 2 ** 20))
+
+# Stage timings of this run, shown in the sidebar when OCCUPANCY_TIMING is set
+timer = StageTimer('app40')
+
+# Version of the data file (path, size and mtime), part of the data and every figure cache key
+data_version = file_key('AlphaComWeekly_Cleaned.csv')
+
 # Load the data
-df = load_data('AlphaComWeekly_Cleaned.csv')
+with timer.stage('load_data'):
+    df = load_data('AlphaComWeekly_Cleaned.csv', data_version)
+    floor_index = load_floor_index('AlphaComWeekly_Cleaned.csv', data_version)
+figure_cache = load_figure_cache()
 
 # Streamlit app
 st.title("🏢 ABC Company - Winnipeg Office")
@@ -135,12 +137,17 @@ st.sidebar.subheader("📅 Weekly Filters")
 available_weeks = sorted(df['Week Start'].dropna().unique())
 selected_week_start = st.sidebar.selectbox("Select Week Starting (Monday):", available_weeks)
 
-# Office hours note
-st.sidebar.markdown("⏰ **Note:** Office hours are defined as 9 AM to 5 PM.")
+# Subheader for time bins and office hours
+st.sidebar.subheader("⏰ Time Bins and Office Hours")
 
-# Set office hours
-start_time = pd.Timestamp("09:00").time()
-end_time = pd.Timestamp("17:00").time()
+# Width of the time bins of the daily charts
+bin_minutes = st.sidebar.select_slider("Select Time Bin:", options=BIN_WIDTHS, value=60,
+                                       format_func=lambda minutes: f"{minutes} min")
+
+# Set office hours (bin starts from start_time to end_time are shown)
+start_time, end_time = st.sidebar.slider("Select Office Hours:", min_value=time(0, 0), max_value=time(23, 55),
+                                         value=(time(9, 0), time(17, 0)), step=timedelta(minutes=bin_minutes),
+                                         format="HH:mm")
 
 # Function to generate download link with unique key
 def get_download_link(df_utilization, title, filename, key):
@@ -157,69 +164,89 @@ def get_download_link(df_utilization, title, filename, key):
 qualitative_colors = px.colors.qualitative.Plotly
 color_map = {floor: qualitative_colors[i % len(qualitative_colors)] for i, floor in enumerate(selected_floors)}
 
-# Function to create individual plots
-def create_individual_plots(filtered_dfs, time_labels, y_limit_upper, plot_type, x_label):
-    plots = []
-    for floor, filtered_df in filtered_dfs.items():
-        if not filtered_df.empty:
-            # Reset index and rename columns for plotting
-            filtered_df = filtered_df.reset_index()
-            # Rename 'timestamp' to 'Time' if it exists
-            if 'timestamp' in filtered_df.columns:
-                filtered_df.rename(columns={'timestamp': 'Time'}, inplace=True)
-            else:
-                filtered_df.rename(columns={'index': 'Time'}, inplace=True)
-            
-            # Ensure 'Time' is in string format '%H:%M' or '%A'
-            if isinstance(filtered_df['Time'].iloc[0], pd.Timestamp):
-                if x_label == "Time":
-                    filtered_df['Time'] = filtered_df['Time'].dt.strftime('%H:%M')
-                else:
-                    filtered_df['Time'] = filtered_df['Time'].dt.strftime('%A')
-            else:
-                # Handle cases where 'Time' might already be a string but ensure proper formatting
-                filtered_df['Time'] = pd.to_datetime(filtered_df['Time'], errors='coerce').dt.strftime('%H:%M')
-            
-            # Drop rows where 'Time' couldn't be parsed
-            filtered_df = filtered_df.dropna(subset=['Time'])
-    
-            color = color_map[floor]
-            if plot_type == "Bar":
-                fig = px.bar(filtered_df, x='Time', y='Associated Users Count',
-                             title=f"{floor}",
-                             labels={"Time": x_label, "Associated Users Count": "Number of Users"},
-                             template='plotly_white',
-                             color_discrete_sequence=[color])
-            elif plot_type == "Line":
-                fig = px.line(filtered_df, x='Time', y='Associated Users Count',
-                              title=f"{floor}",
-                              labels={"Time": x_label, "Associated Users Count": "Number of Users"},
-                              markers=True, template='plotly_white',
-                              color_discrete_sequence=[color])
-            elif plot_type == "Area":
-                fig = px.area(filtered_df, x='Time', y='Associated Users Count',
-                              title=f"{floor}",
-                              labels={"Time": x_label, "Associated Users Count": "Number of Users"},
-                              template='plotly_white',
-                              color_discrete_sequence=[color])
-            elif plot_type == "Scatter":
-                fig = px.scatter(filtered_df, x='Time', y='Associated Users Count',
-                                 title=f"{floor}",
-                                 labels={"Time": x_label, "Associated Users Count": "Number of Users"},
-                                 template='plotly_white',
-                                 color_discrete_sequence=[color])
-            else:
-                continue  # Skip if an unknown plot_type is passed
-    
-            fig.update_layout(
-                xaxis=dict(tickmode='array', tickvals=time_labels, ticktext=time_labels),
-                yaxis=dict(range=[0, y_limit_upper]),
-                title_x=0.5,
-                hovermode='x unified'
-            )
-            fig.update_xaxes(tickangle=45)
-            plots.append(fig)
-    return plots
+# Add one floor's series to a figure as the selected chart type, optionally into a subplot cell
+def add_occupancy_trace(fig, plot_type, x, y, floor, row=None, col=None, showlegend=True, opacity=None):
+    color = color_map[floor]
+    if plot_type == "Bar":
+        trace = go.Bar(x=x, y=y, name=floor, marker_color=color, opacity=opacity)
+    elif plot_type == "Line":
+        trace = go.Scatter(x=x, y=y, mode='lines+markers', name=floor, marker=dict(color=color), line=dict(width=2))
+    elif plot_type == "Area":
+        trace = go.Scatter(x=x, y=y, mode='lines', name=floor, fill='tozeroy', marker=dict(color=color), line=dict(width=2))
+    elif plot_type == "Scatter":
+        trace = go.Scatter(x=x, y=y, mode='markers', name=floor, marker=dict(color=color, size=8))
+    else:
+        return  # Skip if an unknown plot_type is passed
+    trace.update(legendgroup=floor, showlegend=showlegend)
+    fig.add_trace(trace, row=row, col=col)
+
+# Function to create individual plots: one figure with a subplot per floor on shared axes, so
+# the floors are serialized and sent to the browser once however many are selected
+def create_individual_plots(floor_values, labels, y_limit_upper, plot_type, x_label, num_cols):
+    floors = [floor for floor, values in floor_values.items() if len(values)]
+    if not floors:
+        return None
+    num_rows = -(-len(floors) // num_cols)
+
+    fig = make_subplots(
+        rows=num_rows, cols=num_cols,
+        subplot_titles=[str(floor) for floor in floors],
+        shared_xaxes=True, shared_yaxes=True,
+        vertical_spacing=min(0.1, 0.5 / num_rows), horizontal_spacing=0.03
+    )
+    for idx, floor in enumerate(floors):
+        add_occupancy_trace(fig, plot_type, labels, floor_values[floor], floor,
+                            row=idx // num_cols + 1, col=idx % num_cols + 1, showlegend=False)
+
+    fig.update_layout(height=300 * num_rows + 100, template='plotly_white', hovermode='x unified', showlegend=False)
+    fig.update_xaxes(tickmode='array', tickvals=labels, ticktext=labels, tickangle=45)
+    fig.update_xaxes(title_text=x_label, row=num_rows)
+    fig.update_yaxes(range=[0, y_limit_upper])
+    fig.update_yaxes(title_text="Number of Users", col=1)
+    return fig
+
+# Function to create the combined plot of all floors
+def create_combined_plot(floor_values, labels, y_limit_upper, plot_type, x_label, title):
+    fig = go.Figure()
+    for floor, values in floor_values.items():
+        add_occupancy_trace(fig, plot_type, labels, values, floor, opacity=0.6)
+
+    fig.update_layout(
+        title=title,
+        xaxis_title=x_label,
+        yaxis_title="Number of Users",
+        xaxis=dict(tickmode='array', tickvals=labels, ticktext=labels),
+        barmode='group' if plot_type == "Bar" else None,
+        yaxis=dict(range=[0, y_limit_upper]),
+        legend_title="Floors",
+        template='plotly_white',
+        hovermode='x unified'
+    )
+    fig.update_xaxes(tickangle=45)
+    return fig
+
+# Capacity of each floor (its first reported value); floors without one get 0
+def get_capacities(floors):
+    capacities = {}
+    for floor in floors:
+        capacity_data = floor_index.rows(floor)['Capacity']
+        if not capacity_data.empty:
+            capacities[floor] = capacity_data.values[0]
+        else:
+            st.warning(f"No capacity data available for {floor}. Setting capacity to 0.")
+            capacities[floor] = 0
+    return capacities
+
+# Utilization of each floor against its capacity, with download records for floors that have one
+def get_utilization(matrix, capacities):
+    avg_utilization = capacity_utilization(matrix, capacities)
+    utilization_records = {}
+    for floor, utilization in avg_utilization.items():
+        if capacities[floor] > 0:
+            utilization_records[floor] = {'Floor': floor, 'Average Utilization (%)': utilization}
+        else:
+            st.warning(f"Capacity for {floor} is zero. Utilization set to 0%.")
+    return avg_utilization, utilization_records
 
 # Determine number of columns based on layout option
 def get_num_columns():
@@ -239,140 +266,52 @@ with tab1:
     if selected_date not in available_dates:
         st.warning(f"No data available for {selected_date}")
     else:
-        # Filter the DataFrame based on user input for daily trends
-        daily_filtered_dfs = {}
-        daily_capacities = {}
-        for floor in selected_floors:
-            filtered_df = df[
-                (df['Location Name'] == floor) &
-                (df['Local Date'] == selected_date)
-            ]
-            # Resample and process data
-            hourly_occupancy = filtered_df.resample('H').max()
-            hourly_occupancy = hourly_occupancy.between_time(start_time.strftime('%H:%M'),
-                                                             end_time.strftime('%H:%M'))
-            hourly_occupancy = hourly_occupancy.reindex(pd.date_range(
-                start=pd.Timestamp.combine(selected_date, start_time),
-                end=pd.Timestamp.combine(selected_date, end_time),
-                freq='H'
-            ), fill_value=0)
-            daily_filtered_dfs[floor] = hourly_occupancy
-            capacity_data = df.loc[df['Location Name'] == floor, 'Capacity']
-            if not capacity_data.empty:
-                daily_capacities[floor] = capacity_data.values[0]
-            else:
-                st.warning(f"No capacity data available for {floor}. Setting capacity to 0.")
-                daily_capacities[floor] = 0
-
-        # Check if any filtered_df is empty
-        if all(filtered_df.empty for filtered_df in daily_filtered_dfs.values()):
+        # Bin the selected floors' rows of the day all at once; bins without readings count as
+        # empty. The matrix is reused while only the chart type or layout changes.
+        start_minute, end_minute = minute_of_day(start_time), minute_of_day(end_time)
+        daily_key = ('daily', data_version, tuple(selected_floors), selected_date, bin_minutes, start_minute, end_minute)
+        with timer.stage('aggregate', chart='daily', floors=len(selected_floors)):
+            daily_matrix = figure_cache.get_or_compute(daily_key, lambda: floor_daily_matrix(
+                floor_index, selected_floors, 'Associated Users Count', selected_date, bin_minutes, start_minute, end_minute))
+        daily_capacities = get_capacities(selected_floors)
+
+        # Check if any floor has data
+        if not daily_matrix.entities:
             st.warning("🚫 No data available for the selected filters.")
         else:
-            # Create a common set of timestamps for the selected date and time range
-            time_range = pd.date_range(
-                start=pd.Timestamp.combine(selected_date, start_time),
-                end=pd.Timestamp.combine(selected_date, end_time),
-                freq='H'
-            )
-            time_labels = time_range.strftime('%H:%M')
-
-            # Initialize variables
-            max_users = 0
-            avg_utilization = {}
-            utilization_records = {}
+            # Common labels of the bins of the selected date and office hours
+            time_labels = daily_matrix.periods.strftime('%H:%M')
 
             # Calculate the maximum number of users and average utilization
-            for floor, hourly_occupancy in daily_filtered_dfs.items():
-                if not hourly_occupancy.empty:
-                    floor_max = hourly_occupancy['Associated Users Count'].max()
-                    max_users = max(max_users, floor_max)
-                    avg_users = hourly_occupancy['Associated Users Count'].mean()
-                    capacity = daily_capacities[floor]
-                    if capacity > 0:
-                        utilization = (avg_users / capacity) * 100
-                        avg_utilization[floor] = utilization
-                        utilization_records[floor] = {'Floor': floor, 'Average Utilization (%)': utilization}
-                    else:
-                        avg_utilization[floor] = 0
-                        st.warning(f"Capacity for {floor} is zero. Utilization set to 0%.")
+            max_users = daily_matrix.values.max() if daily_matrix.values.size else 0
+            with timer.stage('utilization', chart='daily'):
+                avg_utilization, utilization_records = get_utilization(daily_matrix, daily_capacities)
 
             # Round up the y-axis limit to the nearest ten
             y_limit_upper = (int(max_users) // 10 + 1) * 10
 
-            # Create individual plots
-            plots = create_individual_plots(daily_filtered_dfs, time_labels, y_limit_upper, chart_type, "Time")
+            # Plot the binned values of each floor against the bin labels
+            daily_values = {floor: daily_matrix.row(floor) for floor in daily_matrix.entities}
 
-            # Display plots based on layout option
+            # Create individual plots as one subplot grid, laid out by the layout option
             num_cols = get_num_columns()
-            if num_cols > 1:
-                cols = st.columns(num_cols)
-                for idx, fig in enumerate(plots):
-                    with cols[idx % num_cols]:
-                        st.plotly_chart(fig, use_container_width=True)
-            else:
-                for fig in plots:
-                    st.plotly_chart(fig, use_container_width=True)
+            with timer.stage('figure', chart='daily_individual'):
+                individual_fig = figure_cache.get_or_compute(
+                    daily_key + ('individual', chart_type, num_cols),
+                    lambda: create_individual_plots(daily_values, time_labels, y_limit_upper, chart_type, "Time", num_cols)
+                )
+            if individual_fig is not None:
+                with timer.stage('render', chart='daily_individual'):
+                    st.plotly_chart(individual_fig, use_container_width=True)
 
             # Create combined Plotly graph
-            combined_fig = go.Figure()
-
-            for floor, hourly_occupancy in daily_filtered_dfs.items():
-                hourly_occupancy = hourly_occupancy.reset_index()
-                hourly_occupancy.rename(columns={'index': 'Time'}, inplace=True)
-
-                # Ensure 'Time' is formatted correctly
-                hourly_occupancy['Time'] = hourly_occupancy['Time'].dt.strftime('%H:%M')
-
-                color = color_map[floor]
-                if chart_type == "Bar":
-                    combined_fig.add_trace(go.Bar(
-                        x=hourly_occupancy['Time'],
-                        y=hourly_occupancy['Associated Users Count'],
-                        name=floor,
-                        marker_color=color,
-                        opacity=0.6
-                    ))
-                elif chart_type == "Line":
-                    combined_fig.add_trace(go.Scatter(
-                        x=hourly_occupancy['Time'],
-                        y=hourly_occupancy['Associated Users Count'],
-                        mode='lines+markers',
-                        name=floor,
-                        marker=dict(color=color),
-                        line=dict(width=2)
-                    ))
-                elif chart_type == "Area":
-                    combined_fig.add_trace(go.Scatter(
-                        x=hourly_occupancy['Time'],
-                        y=hourly_occupancy['Associated Users Count'],
-                        mode='lines',
-                        name=floor,
-                        fill='tozeroy',
-                        marker=dict(color=color),
-                        line=dict(width=2)
-                    ))
-                elif chart_type == "Scatter":
-                    combined_fig.add_trace(go.Scatter(
-                        x=hourly_occupancy['Time'],
-                        y=hourly_occupancy['Associated Users Count'],
-                        mode='markers',
-                        name=floor,
-                        marker=dict(color=color, size=8)
-                    ))
-
-            combined_fig.update_layout(
-                title="Combined Occupancy",
-                xaxis_title="Time",
-                yaxis_title="Number of Users",
-                xaxis=dict(tickmode='array', tickvals=time_labels, ticktext=time_labels),
-                barmode='group' if chart_type == "Bar" else None,
-                yaxis=dict(range=[0, y_limit_upper]),
-                legend_title="Floors",
-                template='plotly_white',
-                hovermode='x unified'
-            )
-            combined_fig.update_xaxes(tickangle=45)
-            st.plotly_chart(combined_fig, use_container_width=True)
+            with timer.stage('figure', chart='daily_combined'):
+                combined_fig = figure_cache.get_or_compute(
+                    daily_key + ('combined', chart_type),
+                    lambda: create_combined_plot(daily_values, time_labels, y_limit_upper, chart_type, "Time", "Combined Occupancy")
+                )
+            with timer.stage('render', chart='daily_combined'):
+                st.plotly_chart(combined_fig, use_container_width=True)
 
             # Display average daily utilization
             utilization_text = "<div style='border: 2px solid #4CAF50; padding: 10px; border-radius: 10px; background-color: #f9f9f9;'>"
@@ -415,207 +354,59 @@ with tab2:
     # Convert 'selected_week_start' to date object
     selected_week_start_date = pd.to_datetime(selected_week_start).date()
 
-    # Define week end date as Friday (Monday to Friday)
-    week_end_date = selected_week_start_date + pd.Timedelta(days=4)
-
     # Check if selected week has data
     if selected_week_start_date not in available_weeks:
         st.warning(f"No data available for the week starting {selected_week_start_date}")
     else:
-        # Filter the DataFrame based on the selected week
-        weekly_filtered_dfs = {}
-        weekly_capacities = {}
+        # Daily maxima of the selected floors within office hours, computed for all floors at once
+        with timer.stage('aggregate', chart='weekly', floors=len(selected_floors)):
+            weekly_matrix = floor_weekly_matrix(floor_index, selected_floors, 'Associated Users Count', selected_week_start_date,
+                                                minute_of_day(start_time), minute_of_day(end_time))
         for floor in selected_floors:
-            filtered_df = df[
-                (df['Location Name'] == floor) &
-                (df['Local Date'] >= selected_week_start_date) &
-                (df['Local Date'] <= week_end_date)
-            ]
-
-            if filtered_df.empty:
-                st.warning(f"No data available for {floor} in the selected week.")
-                continue  # Skip to the next floor
-
-            # Apply between_time BEFORE resampling
-            filtered_df = filtered_df.between_time(start_time.strftime('%H:%M'),
-                                                   end_time.strftime('%H:%M'))
-
-            # Check if filtered_df is empty after between_time
-            if filtered_df.empty:
-                st.warning(f"No data available for {floor} during office hours.")
-                continue  # Skip to the next floor
-
-            # Group by date and get max 'Associated Users Count'
-            daily_occupancy = filtered_df.groupby(filtered_df.index.date)['Associated Users Count'].max()
-            daily_occupancy = daily_occupancy.to_frame()
-
-            # Reindex to include all days in the week
-            date_range = pd.date_range(start=selected_week_start_date, end=week_end_date, freq='D').date
-            daily_occupancy = daily_occupancy.reindex(date_range, fill_value=0)
-
-            # Check if daily_occupancy is empty after processing
-            if daily_occupancy.empty:
-                st.warning(f"No occupancy data available for {floor} after processing.")
-                continue  # Skip to the next floor
-
-            weekly_filtered_dfs[floor] = daily_occupancy
-
-            capacity_data = df.loc[df['Location Name'] == floor, 'Capacity']
-            if not capacity_data.empty:
-                weekly_capacities[floor] = capacity_data.values[0]
-            else:
-                st.warning(f"No capacity data available for {floor}. Setting capacity to 0.")
-                weekly_capacities[floor] = 0
+            if floor not in weekly_matrix.entities:
+                st.warning(f"No data available for {floor} during office hours in the selected week.")
+        weekly_capacities = get_capacities(weekly_matrix.entities)
 
         # Proceed with plotting and analysis if there's data
-        if weekly_filtered_dfs:
-            # Create a date range for the selected week (Monday to Friday)
-            date_range = pd.date_range(
-                start=selected_week_start_date,
-                end=week_end_date,
-                freq='D'
-            )
-            date_labels = date_range.strftime('%A')  # Day names
-
-            # Initialize variables
-            max_users = 0
-            avg_utilization = {}
-            utilization_records_weekly = {}
+        if weekly_matrix.entities:
+            # Day names of the selected week (Monday to Friday)
+            date_labels = weekly_matrix.periods.strftime('%A')
 
             # Calculate the maximum number of users and average utilization
-            for floor, daily_occupancy in weekly_filtered_dfs.items():
-                if not daily_occupancy.empty:
-                    floor_max = daily_occupancy['Associated Users Count'].max()
-                    max_users = max(max_users, floor_max)
-                    avg_users = daily_occupancy['Associated Users Count'].mean()
-                    capacity = weekly_capacities[floor]
-                    if capacity > 0:
-                        utilization = (avg_users / capacity) * 100
-                        avg_utilization[floor] = utilization
-                        utilization_records_weekly[floor] = {'Floor': floor, 'Average Utilization (%)': utilization}
-                    else:
-                        avg_utilization[floor] = 0
-                        st.warning(f"Capacity for {floor} is zero. Utilization set to 0%.")
+            max_users = weekly_matrix.values.max()
+            with timer.stage('utilization', chart='weekly'):
+                avg_utilization, utilization_records_weekly = get_utilization(weekly_matrix, weekly_capacities)
 
             # Round up the y-axis limit to the nearest ten
             y_limit_upper = (int(max_users) // 10 + 1) * 10
 
-            # Create individual plots
-            plots_weekly = []
-            for floor, daily_occupancy in weekly_filtered_dfs.items():
-                if not daily_occupancy.empty:
-                    daily_occupancy = daily_occupancy.reset_index()
-                    daily_occupancy.rename(columns={'index': 'Day'}, inplace=True)
-
-                    # Ensure 'Day' is formatted correctly
-                    daily_occupancy['Day'] = pd.to_datetime(daily_occupancy['Day']).dt.strftime('%A')
-
-                    color = color_map[floor]
-                    if chart_type == "Bar":
-                        fig = px.bar(daily_occupancy, x='Day', y='Associated Users Count',
-                                     title=f"{floor}",
-                                     labels={"Day": "Day", "Associated Users Count": "Number of Users"},
-                                     template='plotly_white',
-                                     color_discrete_sequence=[color])
-                    elif chart_type == "Line":
-                        fig = px.line(daily_occupancy, x='Day', y='Associated Users Count',
-                                      title=f"{floor}",
-                                      labels={"Day": "Day", "Associated Users Count": "Number of Users"},
-                                      markers=True, template='plotly_white',
-                                      color_discrete_sequence=[color])
-                    elif chart_type == "Area":
-                        fig = px.area(daily_occupancy, x='Day', y='Associated Users Count',
-                                      title=f"{floor}",
-                                      labels={"Day": "Day", "Associated Users Count": "Number of Users"},
-                                      template='plotly_white',
-                                      color_discrete_sequence=[color])
-                    elif chart_type == "Scatter":
-                        fig = px.scatter(daily_occupancy, x='Day', y='Associated Users Count',
-                                         title=f"{floor}",
-                                         labels={"Day": "Day", "Associated Users Count": "Number of Users"},
-                                         template='plotly_white',
-                                         color_discrete_sequence=[color])
-
-                    fig.update_layout(
-                        xaxis=dict(tickmode='array', tickvals=date_labels, ticktext=date_labels),
-                        yaxis=dict(range=[0, y_limit_upper]),
-                        title_x=0.5,
-                        hovermode='x unified'
-                    )
-                    fig.update_xaxes(tickangle=45)
-                    plots_weekly.append(fig)
-
-            # Display plots based on layout option
+            # Plot the daily maxima of each floor against the day names
+            weekly_values = {floor: weekly_matrix.row(floor) for floor in weekly_matrix.entities}
+
+            # Figures of the week are reused while only the chart type or layout changes
+            weekly_key = ('weekly', data_version, tuple(selected_floors), selected_week_start_date,
+                          minute_of_day(start_time), minute_of_day(end_time))
+
+            # Create individual plots as one subplot grid, laid out by the layout option
             num_cols = get_num_columns()
-            if num_cols > 1:
-                cols = st.columns(num_cols)
-                for idx, fig in enumerate(plots_weekly):
-                    with cols[idx % num_cols]:
-                        st.plotly_chart(fig, use_container_width=True)
-            else:
-                for fig in plots_weekly:
-                    st.plotly_chart(fig, use_container_width=True)
+            with timer.stage('figure', chart='weekly_individual'):
+                individual_fig_weekly = figure_cache.get_or_compute(
+                    weekly_key + ('individual', chart_type, num_cols),
+                    lambda: create_individual_plots(weekly_values, date_labels, y_limit_upper, chart_type, "Day", num_cols)
+                )
+            if individual_fig_weekly is not None:
+                with timer.stage('render', chart='weekly_individual'):
+                    st.plotly_chart(individual_fig_weekly, use_container_width=True)
 
             # Create combined Plotly graph
-            combined_fig_weekly = go.Figure()
-
-            for floor, daily_occupancy in weekly_filtered_dfs.items():
-                daily_occupancy = daily_occupancy.reset_index()
-                daily_occupancy.rename(columns={'index': 'Day'}, inplace=True)
-
-                # Ensure 'Day' is formatted correctly
-                daily_occupancy['Day'] = pd.to_datetime(daily_occupancy['Day']).dt.strftime('%A')
-
-                color = color_map[floor]
-                if chart_type == "Bar":
-                    combined_fig_weekly.add_trace(go.Bar(
-                        x=daily_occupancy['Day'],
-                        y=daily_occupancy['Associated Users Count'],
-                        name=floor,
-                        marker_color=color,
-                        opacity=0.6
-                    ))
-                elif chart_type == "Line":
-                    combined_fig_weekly.add_trace(go.Scatter(
-                        x=daily_occupancy['Day'],
-                        y=daily_occupancy['Associated Users Count'],
-                        mode='lines+markers',
-                        name=floor,
-                        marker=dict(color=color),
-                        line=dict(width=2)
-                    ))
-                elif chart_type == "Area":
-                    combined_fig_weekly.add_trace(go.Scatter(
-                        x=daily_occupancy['Day'],
-                        y=daily_occupancy['Associated Users Count'],
-                        mode='lines',
-                        name=floor,
-                        fill='tozeroy',
-                        marker=dict(color=color),
-                        line=dict(width=2)
-                    ))
-                elif chart_type == "Scatter":
-                    combined_fig_weekly.add_trace(go.Scatter(
-                        x=daily_occupancy['Day'],
-                        y=daily_occupancy['Associated Users Count'],
-                        mode='markers',
-                        name=floor,
-                        marker=dict(color=color, size=8)
-                    ))
-
-            combined_fig_weekly.update_layout(
-                title="Combined Weekly Occupancy",
-                xaxis_title="Day",
-                yaxis_title="Number of Users",
-                xaxis=dict(tickmode='array', tickvals=date_labels, ticktext=date_labels),
-                barmode='group' if chart_type == "Bar" else None,
-                yaxis=dict(range=[0, y_limit_upper]),
-                legend_title="Floors",
-                template='plotly_white',
-                hovermode='x unified'
-            )
-            combined_fig_weekly.update_xaxes(tickangle=45)
-            st.plotly_chart(combined_fig_weekly, use_container_width=True)
+            with timer.stage('figure', chart='weekly_combined'):
+                combined_fig_weekly = figure_cache.get_or_compute(
+                    weekly_key + ('combined', chart_type),
+                    lambda: create_combined_plot(weekly_values, date_labels, y_limit_upper, chart_type, "Day",
+                                                 "Combined Weekly Occupancy")
+                )
+            with timer.stage('render', chart='weekly_combined'):
+                st.plotly_chart(combined_fig_weekly, use_container_width=True)
 
             # Display average weekly utilization
             utilization_text_weekly = "<div style='border: 2px solid #FF5722; padding: 10px; border-radius: 10px; background-color: #fff7f0;'>"
@@ -648,3 +439,16 @@ with tab2:
             """, unsafe_allow_html=True)
         else:
             st.warning("🚫 No data available after processing. Please adjust your filters.")
+
+# Figure cache usage after this run
+cache_stats = figure_cache.stats()
+st.sidebar.caption(
+    f"🗄️ Figure cache: {cache_stats['hits']} hits, {cache_stats['misses']} misses, "
+    f"{cache_stats['entries']} entries ({cache_stats['bytes'] / 2 ** 20:.1f} of {cache_stats['max_bytes'] / 2 ** 20:.0f} MB)"
+)
+
+# Stage timings of this run, also appended to the timing log
+if timer.enabled:
+    with st.sidebar.expander(f"⏱️ Stage timings ({timer.total_seconds():.2f}s)"):
+        st.dataframe(timer.frame(), hide_index=True, use_container_width=True)
+    timer.write_log()
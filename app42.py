@@ -1,18 +1,32 @@
 import pandas as pd
 import streamlit as st
 import plotly.express as px
-import plotly.graph_objects as go
+import numpy as np
 import os
-
-# Try to import openpyxl, and if it fails, show a user-friendly message
-try:
-    import openpyxl
-except ImportError:
-    st.error("The openpyxl library is not installed. Please install it to read Excel files.")
-    st.stop()
+from datetime import time, timedelta
+from itertools import groupby
+
+from occupancy.bins import BIN_WIDTHS, minute_of_day
+from occupancy.bookings import build_booking_rollup
+from occupancy.cube import build_cube
+from occupancy.dimensions import rooms_by_floor, space_keys_by_name, split_spaces
+from occupancy.dataset import files_in
+from occupancy.dedup import read_deduplicated, read_hour_flags
+from occupancy.export import EXPORT_FORMATS, EXPORT_TABLES, export_to_file
+from occupancy.figures import create_combined_heatmap
+from occupancy.headcounts import PEAK_KEY_COLUMNS, PEAKS_PARTITION, build_peak_histograms, histogram_hashes, histogram_scores, rightsizing_frame
+from occupancy.ingest import update_manifest
+from occupancy.loading import TIMESTAMP_SOURCE, TIMESTAMP_SOURCES, load_week, week_files
+from occupancy.manifest import manifest_spaces
+from occupancy.memo import FIGURE_CACHE_MB, LRUCache
+from occupancy.metrics import presence_utilization, room_daily_matrix, room_weekly_matrix
+from occupancy.rollup import HOURS_PARTITION, build_rollup
+from occupancy.sites import load_sites, site_settings
+from occupancy.timing import StageTimer
+from occupancy.watch import describe_changes, folder_snapshot, workbook_paths
 
 # Set Streamlit page configuration
-st.set_page_config(page_title="ABC Company - Winnipeg Office Room Occupancy", layout="wide")
+st.set_page_config(page_title="ABC Company - Room Occupancy", layout="wide")
 
 # Apply custom CSS styles
 st.markdown("""
@@ -50,99 +64,204 @@ st.markdown("""
 def convert_df_to_csv(df):
     return df.to_csv(index=False).encode('utf-8')
 
-# Modify the load_data function to handle potential file reading errors
-@st.cache_data
-def load_data(folder_path):
-    all_files = [os.path.join(folder_path, f) for f in os.listdir(folder_path) if f.endswith('.xlsx')]
-    li = []
+# Read the folder manifest (dates, weeks, floors, rooms and capacities) without loading any fact data
+# Only new or changed workbooks are parsed, so the sidebar can render from the manifest alone.
+# Keyed by a snapshot of the folder, so added, changed or removed workbooks are picked up on the next run.
+@st.cache_resource(max_entries=2)
+def load_manifest(folder_path, snapshot):
+    all_files = workbook_paths(folder_path)
 
-    for filename in all_files:
-        try:
-            df = pd.read_excel(filename, engine='openpyxl')
-            li.append(df)
-        except Exception as e:
-            st.warning(f"Error reading file {filename}: {str(e)}")
+    manifest, errors = update_manifest(folder_path, all_files)
+    for filename, e in errors:
+        st.warning(f"Error reading file {filename}: {str(e)}")
 
-    if not li:
+    if not manifest['workbooks']:
         st.error("No valid Excel files could be read. Please check your data files.")
         st.stop()
 
-    df = pd.concat(li, axis=0, ignore_index=True)
-
-    df['Local Date'] = pd.to_datetime(df['Local Date'], format='%Y-%m-%d', errors='coerce')
-    df['Local Time'] = pd.to_datetime(df['Local Time'], format='%H:%M:%S', errors='coerce').dt.time
-
-    df['timestamp'] = pd.to_datetime(df['Local Date'].dt.strftime('%Y-%m-%d') + ' ' + df['Local Time'].astype(str), errors='coerce')
-
-    if df['timestamp'].isnull().any():
-        st.warning("⚠️ Some timestamps couldn't be parsed and are set to 'NaT'. Please check your Excel files for consistency.")
-
-    df.set_index('timestamp', inplace=True)
-    df['Local Date'] = df['Local Date'].dt.date
-
-    if df['Local Date'].isnull().any():
-        st.warning("⚠️ Some 'Local Date' entries couldn't be parsed and are set to 'NaT'. Please check your Excel files for consistency.")
-
-    df['Week Start'] = df['Local Date'] - pd.to_timedelta(pd.to_datetime(df['Local Date']).dt.dayofweek, unit='d')
-    df['Week Start'] = pd.to_datetime(df['Week Start']).dt.date
-
-    # Ensure 'People Presence' is binary
-    df['People Presence'] = df['People Presence'].astype(int)
+    if manifest['undated_rows']:
+        st.warning(f"⚠️ {manifest['undated_rows']} 'Local Date' entries couldn't be parsed and are skipped. Please check your Excel files for consistency.")
+
+    duplicates = {}
+    for counts in manifest['duplicates'].values():
+        for workbook, count in counts.items():
+            duplicates[workbook] = duplicates.get(workbook, 0) + count
+    for workbook, count in duplicates.items():
+        st.info(f"ℹ️ {count} readings in {os.path.basename(workbook)} are repeated by overlapping exports and counted once ({manifest['dedup_policy']} policy).")
+
+    return manifest
+
+# Fact rows of one week, stopping the app if none could be read and warning about values that
+# could not be parsed. Only the given week partitions are read, and only the columns the dashboard uses; the frame is
+# shared read-only by every session (cache_resource), keyed by the week, its partition files and
+# the space table, so a new export only reloads the weeks it covers (or all, if it adds rooms)
+@st.cache_resource(max_entries=8)
+def load_data(folder_path, week, files, spaces_id, _spaces, timestamp_source=TIMESTAMP_SOURCE):
+    df, report = load_week(files, week, _spaces, timestamp_source)
+    if df is None:
+        st.error("No valid Excel files could be read. Please check your data files.")
+        st.stop()
 
+    if report.unparsed_timestamps:
+        st.warning(f"⚠️ {report.unparsed_timestamps} timestamps couldn't be parsed and are set to 'NaT'. Please check your Excel files for consistency.")
+    if report.unparsed_dates:
+        st.warning(f"⚠️ {report.unparsed_dates} 'Local Date' entries couldn't be parsed and are set to 'NaT'. Please check your Excel files for consistency.")
     return df
 
-# Function to get unique floors
-def get_unique_floors(df):
-    return sorted(df['Floor Name'].dropna().unique())
-
-# Function to create combined heatmap for all rooms
-def create_combined_heatmap(all_room_data, x_label):
-    fig = go.Figure()
-
-    # Add heatmap trace
-    fig.add_trace(go.Heatmap(
-        z=all_room_data.T.values,
-        x=all_room_data.index,
-        y=all_room_data.columns,
-        colorscale='YlOrRd',
-        showscale=False,
-        hoverongaps=False,
-        hovertemplate='Room: %{y}<br>Time: %{x}<br>Occupied: %{z}<extra></extra>'
-    ))
-
-    # Update layout
-    fig.update_layout(
-        title='Combined Room Occupancy',
-        xaxis_title=x_label,
-        yaxis_title='Rooms',
-        height=max(400, 50 * len(all_room_data.columns) + 100),
-        xaxis=dict(
-            tickmode='array',
-            tickvals=all_room_data.index,
-            ticktext=[f"{h:02d}:00" for h in range(9, 18)] if x_label == "Time of Day" else ['Mon', 'Tue', 'Wed', 'Thu', 'Fri'],
-            tickangle=45
-        ),
-        yaxis=dict(autorange="reversed")
-    )
+# Build the room x day x slot occupancy cube once per loaded week
+@st.cache_resource(max_entries=8)
+def load_cube(folder_path, week, files, spaces_id, _spaces, timestamp_source=TIMESTAMP_SOURCE):
+    return build_cube(load_data(folder_path, week, files, spaces_id, _spaces, timestamp_source), len(_spaces))
+
+# Cube of one building for the week containing a date, built from that building's partitions of the week only
+def week_cube(folder_path, manifest, building, date, timestamp_source=TIMESTAMP_SOURCE):
+    week, files = week_files(manifest, date, timestamp_source, building)
+    spaces_id = manifest['buildings'][building]['spaces_id']
+    return load_cube(folder_path, week, files, spaces_id, load_spaces(folder_path, spaces_id, manifest, building),
+                     timestamp_source)
+
+# Aggregates and figures of recent selections, shared by every session within a memory budget
+@st.cache_resource
+def load_figure_cache():
+    return LRUCache(int(FIGURE_CACHE_MB * 2 ** 20))
+
+# Prefix-sum rollup of occupied and observed hours over the whole history, built from the
+# small per-workbook hour flags (one per room and day across overlapping exports) of one building;
+# keyed by the flag files so changed workbooks rebuild it
+@st.cache_resource(max_entries=4)
+def load_rollup(folder_path, files, spaces_id, _spaces):
+    return build_rollup(read_flags(files, _spaces), len(_spaces))
+
+# Prefix-sum rollup of booked, used, walk-in and ghost-booked hours, built from the same hour flags
+@st.cache_resource(max_entries=4)
+def load_booking_rollup(folder_path, files, spaces_id, _spaces):
+    return build_booking_rollup(read_flags(files, _spaces), len(_spaces))
+
+# Per room-day hour histograms of 'Peak People Count' of one building, merged for any range instead of
+# rereading the readings; keyed by the histogram files so changed workbooks rebuild them
+@st.cache_resource(max_entries=4)
+def load_peak_histograms(folder_path, files, spaces_id, _spaces):
+    histograms, _ = read_deduplicated(list(files), hashes=histogram_hashes, score=histogram_scores, key_columns=PEAK_KEY_COLUMNS)
+    if histograms is None:
+        histograms = empty_keyed(['Hour', 'Readings', 'Observed Minutes', 'Occupied Minutes'])
+        histograms['Peak Counts'] = pd.Series(dtype=object)
+    else:
+        histograms, _ = split_spaces(histograms.to_pandas(), _spaces)
+    return build_peak_histograms(histograms, len(_spaces))
+
+# Empty frame keyed by space and day with the given integer columns, for buildings without hour flags or histograms yet
+def empty_keyed(columns):
+    return pd.DataFrame({'Space Key': pd.Series(dtype=np.int16), 'Local Date': pd.Series(dtype='datetime64[ns]'),
+                         **{column: pd.Series(dtype=np.int32) for column in columns}})
+
+# Hour flags of the given files, one per room and day merged hour by hour across overlapping exports, keyed by space
+def read_flags(files, spaces):
+    flags = read_hour_flags(list(files))
+    if flags is None:
+        return empty_keyed(['Occupied Hours', 'Observed Hours', 'Booked Hours'])
+    flags, _ = split_spaces(flags.to_pandas(), spaces)
+    return flags
+
+# Space dimension table of one building, taken from the manifest; keyed by its fingerprint
+@st.cache_resource(max_entries=16)
+def load_spaces(folder_path, spaces_id, _manifest, building):
+    return manifest_spaces(_manifest, building)
+
+# Build the room name -> space key and floor -> rooms lookups once per space table
+@st.cache_resource(max_entries=16)
+def load_hierarchy(folder_path, spaces_id, _spaces):
+    return space_keys_by_name(_spaces), rooms_by_floor(_spaces)
 
-    return fig
+# Function to get unique floors
+def get_unique_floors(spaces):
+    return sorted(spaces['Floor Name'].dropna().unique())
+
+# Above this many rooms the combined heatmap is paged and grouped by floor
+LARGE_HEATMAP_ROOMS = 40
+
+# Rooms shown per heatmap page, which bounds the chart payload however many rooms are selected
+HEATMAP_PAGE_ROOMS = 40
+
+# Show the combined heatmap. Large selections are shown a page of rooms at a time, ordered by
+# floor, with one collapsible section per floor, so only one page of rows is sent to the browser.
+# Figures are memoized under cache_key plus the rooms they show.
+def show_combined_heatmap(all_room_data, x_label, room_floor, key, cache_key, tick_step=1):
+    if len(all_room_data.columns) <= LARGE_HEATMAP_ROOMS:
+        with timer.stage('figure', chart=key):
+            fig = figure_cache.get_or_compute(cache_key + ('heatmap',),
+                                              lambda: create_combined_heatmap(all_room_data, x_label, tick_step))
+        with timer.stage('render', chart=key):
+            st.plotly_chart(fig, use_container_width=True)
+        return
+
+    rooms = sorted(all_room_data.columns, key=lambda room: (str(room_floor.get(room, '')), str(room)))
+    num_pages = -(-len(rooms) // HEATMAP_PAGE_ROOMS)
+    page = st.number_input(f"Rooms page (1-{num_pages}):", min_value=1, max_value=num_pages, value=1, key=f"{key}_page")
+    first = (page - 1) * HEATMAP_PAGE_ROOMS
+    page_rooms = rooms[first:first + HEATMAP_PAGE_ROOMS]
+    st.caption(f"Showing rooms {first + 1}-{first + len(page_rooms)} of {len(rooms)}, grouped by floor")
+
+    for floor, section in groupby(page_rooms, key=lambda room: room_floor.get(room, 'Unknown floor')):
+        section = list(section)
+        with st.expander(f"{floor} ({len(section)} rooms)", expanded=True):
+            with timer.stage('figure', chart=key, floor=floor):
+                fig = figure_cache.get_or_compute(
+                    cache_key + ('heatmap', tuple(section)),
+                    lambda: create_combined_heatmap(all_room_data[section], x_label, tick_step, title=str(floor), row_height=25)
+                )
+            with timer.stage('render', chart=key, floor=floor):
+                st.plotly_chart(fig, use_container_width=True, key=f"{key}_{floor}")
+
+# Stage timings of this run, shown in the sidebar when OCCUPANCY_TIMING is set
+timer = StageTimer('app42')
+
+# Read the manifest of the 'Room Occupancy' folder; fact data is loaded once the selection is known
+# A snapshot (names, sizes, mtimes) of the folder is taken on every run to notice new exports
+with timer.stage('load_manifest'):
+    manifest = load_manifest('Room Occupancy', folder_snapshot('Room Occupancy'))
+if not manifest['buildings']:
+    st.error("No buildings found in the Excel files. Please check the 'Building Name' column.")
+    st.stop()
 
-# Load the data from the 'Room Occupancy' folder
-df = load_data('Room Occupancy')
+# Site selection: each building is a separate shard of the dataset, loaded and cached on its own,
+# with its own title, office hours and time zone (see occupancy/sites.py)
+sites = load_sites()
+st.sidebar.header("🌐 Site Selection")
+selected_building = st.sidebar.selectbox("Select Site:", list(manifest['buildings']),
+                                         format_func=lambda building: site_settings(sites, building)['title'])
+building_info = manifest['buildings'][selected_building]
+site = site_settings(sites, selected_building)
+
+# Only the selected building's spaces (and later its rows) are loaded
+with timer.stage('load_spaces', building=selected_building):
+    spaces = load_spaces('Room Occupancy', building_info['spaces_id'], manifest, selected_building)
+    room_keys, floor_rooms = load_hierarchy('Room Occupancy', building_info['spaces_id'], spaces)
+
+# Tell the session when exports were ingested since its previous run
+if st.session_state.get('data_version', manifest['version']) != manifest['version']:
+    st.toast(f"📥 New data loaded ({describe_changes(manifest)})")
+st.session_state.data_version = manifest['version']
+room_floor = {room: floor for floor, rooms in floor_rooms.items() for room in rooms}
+capacities = spaces['Space Capacity'].to_numpy()
+figure_cache = load_figure_cache()
 
 # Streamlit app
-st.title("🏢 ABC Company - Winnipeg Office Room Occupancy")
+st.title(f"🏢 ABC Company - {site['title']} Room Occupancy")
 
 # Create tabs
-tab1, tab2 = st.tabs(["Daily Trends", "Weekly Trends"])
+tab1, tab2, tab3, tab4, tab5 = st.tabs(["Daily Trends", "Weekly Trends", "Date Range Trends", "Bookings", "Right-Sizing"])
 
 # Sidebar for filters
 st.sidebar.header("🏢 Floor and Room Selection")
 
 # Get unique floors
-floors = get_unique_floors(df)
+floors = get_unique_floors(spaces)
 
-# Use session state to store selected floors and rooms
+# Use session state to store selected floors and rooms; they are cleared when the site changes
+if st.session_state.get('selected_building') != selected_building:
+    st.session_state.selected_floors = []
+    st.session_state.selected_rooms = []
+    st.session_state.selected_building = selected_building
 if 'selected_floors' not in st.session_state:
     st.session_state.selected_floors = []
 if 'selected_rooms' not in st.session_state:
@@ -156,13 +275,13 @@ st.session_state.selected_floors = selected_floors
 
 # Get unique room names ('Space Name' column) based on selected floors
 if selected_floors:
-    available_rooms = df[df['Floor Name'].isin(selected_floors)]['Space Name'].dropna().unique()
+    available_rooms = [room for floor in selected_floors for room in floor_rooms.get(floor, [])]
 else:
-    available_rooms = df['Space Name'].dropna().unique()
+    available_rooms = list(room_keys)
 
 # Button to select all rooms on chosen floors
 if st.sidebar.button("Select All Rooms on Chosen Floors"):
-    st.session_state.selected_rooms = available_rooms.tolist()
+    st.session_state.selected_rooms = list(available_rooms)
 
 # Room selection
 selected_rooms = st.sidebar.multiselect(
@@ -182,36 +301,119 @@ layout_option = st.sidebar.radio("Select Layout:", ["Focus", "Analyse"], index=0
 st.sidebar.subheader("📅 Daily Filters")
 
 # Get available years, months, and days
-available_dates = df['Local Date'].dropna().unique()
-years = sorted(pd.to_datetime(available_dates).year.unique())
+available_dates = pd.DatetimeIndex(building_info['dates'])
+years = sorted(available_dates.year.unique())
 selected_year = st.sidebar.selectbox("Select Year:", years)
 
 # Filter months based on selected year
-months = sorted(pd.to_datetime(available_dates)[pd.to_datetime(available_dates).year == selected_year].month.unique())
+months = sorted(available_dates[available_dates.year == selected_year].month.unique())
 month_names = [pd.Timestamp(month=month, day=1, year=selected_year).strftime('%B') for month in months]
 month_dict = dict(zip(month_names, months))
 selected_month_name = st.sidebar.selectbox("Select Month:", month_names)
 selected_month = month_dict[selected_month_name]
 
 # Filter days based on selected year and month
-days = sorted(pd.to_datetime(available_dates)[
-    (pd.to_datetime(available_dates).year == selected_year) &
-    (pd.to_datetime(available_dates).month == selected_month)
+days = sorted(available_dates[
+    (available_dates.year == selected_year) &
+    (available_dates.month == selected_month)
 ].day.unique())
 selected_day = st.sidebar.selectbox("Select Day:", days)
 # Subheader for weekly filters
 st.sidebar.subheader("📅 Weekly Filters")
 
 # Get available weeks (as dates)
-available_weeks = sorted(df['Week Start'].dropna().unique())
+available_weeks = [week.date() for week in pd.DatetimeIndex(building_info['weeks'])]
 selected_week_start = st.sidebar.selectbox("Select Week Starting (Monday):", available_weeks)
 
-# Office hours note
-st.sidebar.markdown("⏰ **Note:** Office hours are defined as 9 AM to 5 PM.")
-
-# Set office hours
-start_time = pd.Timestamp("09:00").time()
-end_time = pd.Timestamp("17:00").time()
+# Subheader for date range filters
+st.sidebar.subheader("📆 Date Range Filters")
+
+# A calendar month, a quarter or any custom span of the available dates
+range_mode = st.sidebar.radio("Select Range:", ["Month", "Quarter", "Custom"], horizontal=True)
+if range_mode == "Custom":
+    selected_range = st.sidebar.date_input(
+        "Select Dates:",
+        value=(available_dates.min().date(), available_dates.max().date()),
+        min_value=available_dates.min().date(),
+        max_value=available_dates.max().date()
+    )
+    range_start = pd.Timestamp(selected_range[0])
+    range_end = pd.Timestamp(selected_range[-1])
+else:
+    periods = sorted(available_dates.to_period('M' if range_mode == "Month" else 'Q').unique(), reverse=True)
+    selected_period = st.sidebar.selectbox(
+        f"Select {range_mode}:",
+        periods,
+        format_func=lambda period: period.strftime('%B %Y') if range_mode == "Month" else f"Q{period.quarter} {period.year}",
+        key='range_period'
+    )
+    range_start = selected_period.start_time
+    range_end = selected_period.end_time.normalize()
+
+# Level at which utilization over the range is reported
+range_level = st.sidebar.radio("Report By:", ["Room", "Floor", "Building"], horizontal=True)
+
+# Subheader for time bins and office hours
+st.sidebar.subheader("⏰ Time Bins and Office Hours")
+
+# Width of the time bins of the daily heatmap
+bin_minutes = st.sidebar.select_slider("Select Time Bin:", options=BIN_WIDTHS, value=60,
+                                       format_func=lambda minutes: f"{minutes} min")
+
+# Set office hours (bin starts from start_time to end_time are shown; date ranges use whole hours),
+# starting from the site's office hours in its local time
+start_time, end_time = st.sidebar.slider("Select Office Hours:", min_value=time(0, 0), max_value=time(23, 55),
+                                         value=(time(*divmod(site['start_minute'], 60)), time(*divmod(site['end_minute'], 60))),
+                                         step=timedelta(minutes=bin_minutes), format="HH:mm",
+                                         key=f"office_hours_{selected_building}")
+if building_info['time_zones']:
+    st.sidebar.caption(f"🕒 Times are local to {', '.join(building_info['time_zones'])}")
+
+# Timestamps from the exports' local date and time, or converted from their UTC timestamp and time zone
+timestamp_source = st.sidebar.radio("Timestamps From:", TIMESTAMP_SOURCES, index=TIMESTAMP_SOURCES.index(TIMESTAMP_SOURCE),
+                                    horizontal=True, format_func={'local': "Local time", 'utc': "UTC + time zone"}.get)
+
+# Subheader for bulk exports
+st.sidebar.subheader("📦 Bulk Export")
+
+# Raw rows, hourly presence or daily utilization of the selected rooms over the date range filters,
+# written under the cache directory a week at a time, and only once 'Prepare Export' is clicked
+export_format = st.sidebar.radio("Export Format:", list(EXPORT_FORMATS), horizontal=True,
+                                 format_func={'csv': "CSV", 'parquet': "Parquet", 'zip': "Zip per floor"}.get)
+export_labels = {'raw': "Raw sensor rows", 'hourly': "Hourly presence", 'utilization': "Daily utilization"}
+if export_format == 'zip':
+    export_tables = list(EXPORT_TABLES)
+else:
+    export_tables = [st.sidebar.selectbox("Export Table:", EXPORT_TABLES, format_func=export_labels.get)]
+st.sidebar.caption(f"Selected rooms, {range_start.date()} to {range_end.date()}, within office hours")
+export_request = (export_format, tuple(export_tables), selected_building, tuple(selected_rooms), range_start, range_end,
+                  minute_of_day(start_time), minute_of_day(end_time), timestamp_source, manifest['version'])
+
+if st.sidebar.button("Prepare Export", disabled=not selected_rooms):
+    previous = st.session_state.pop('export', None)
+    if previous and os.path.exists(previous[1]):
+        os.remove(previous[1])
+    with timer.stage('export', format=export_format, rooms=len(selected_rooms)), st.spinner("Preparing export..."):
+        export_path = export_to_file(export_format, export_tables, manifest, spaces, selected_rooms, range_start,
+                                     range_end, minute_of_day(start_time), minute_of_day(end_time),
+                                     building=selected_building, timestamp_source=timestamp_source)
+    st.session_state.export = (export_request, export_path)
+
+# The prepared file is offered until the export selection changes
+prepared_export = st.session_state.get('export')
+if prepared_export and prepared_export[0] == export_request and os.path.exists(prepared_export[1]):
+    mime, extension = EXPORT_FORMATS[export_format]
+    with open(prepared_export[1], 'rb') as export_file:
+        st.sidebar.download_button(
+            label="📥 Download Export",
+            data=export_file,
+            file_name=f"room_occupancy_{range_start:%Y%m%d}_{range_end:%Y%m%d}{extension}",
+            mime=mime,
+            key='download_export'
+        )
+
+# Only the week partitions of the selected day and week are loaded
+selected_date = pd.Timestamp(year=selected_year, month=selected_month, day=selected_day)
 
 # Function to generate download link with unique key
 def get_download_link(df_utilization, title, filename, key):
@@ -224,6 +426,15 @@ def get_download_link(df_utilization, title, filename, key):
         key=key
     )
 
+# Space keys of the selected rooms grouped by floor or building name
+def level_groups(keys, level):
+    level_column = 'Floor Name' if level == "Floor" else 'Building Name'
+    groups = {}
+    for key in keys:
+        if key >= 0:
+            groups.setdefault(spaces.at[key, level_column], []).append(key)
+    return groups
+
 # Color mapping for rooms
 qualitative_colors = px.colors.qualitative.Plotly
 color_map = {room: qualitative_colors[i % len(qualitative_colors)] for i, room in enumerate(selected_rooms)}
@@ -232,91 +443,68 @@ color_map = {room: qualitative_colors[i % len(qualitative_colors)] for i, room i
 with tab1:
     st.markdown("<h3 style='color: #4CAF50;'>Daily Dashboard</h3>", unsafe_allow_html=True)
 
-    # Create selected date
-    selected_date = pd.Timestamp(year=selected_year, month=selected_month, day=selected_day).date()
-
     if not selected_rooms:
         st.warning("Please select at least one room to view occupancy data.")
     elif selected_date not in available_dates:
-        st.warning(f"No data available for {selected_date}")
+        st.warning(f"No data available for {selected_date.date()}")
     else:
-        # Filter the DataFrame based on user input for daily trends
-        daily_filtered_dfs = {}
+        selected_keys = [room_keys.get(room, -1) for room in selected_rooms]
+        start_minute, end_minute = minute_of_day(start_time), minute_of_day(end_time)
+
+        # Bin occupancy for every selected room at once out of the precomputed cube; bins without
+        # readings count as unoccupied. Reused while only unrelated widgets change.
+        def build_daily_data():
+            with timer.stage('load_data', week=week_files(manifest, selected_date)[0]):
+                cube = week_cube('Room Occupancy', manifest, selected_building, selected_date, timestamp_source)
+            return room_daily_matrix(cube, selected_rooms, selected_keys, selected_date, bin_minutes, start_minute, end_minute)
+        daily_key = ('daily', week_files(manifest, selected_date, timestamp_source, selected_building)[1], timestamp_source,
+                     tuple(selected_rooms), selected_date, bin_minutes, start_minute, end_minute)
+
         daily_capacities = {}
-        for room in selected_rooms:
-            filtered_df = df[
-                (df['Space Name'] == room) &
-                (df['Local Date'] == selected_date)
-            ]
-            hourly_occupancy = filtered_df.resample('H')['People Presence'].max()
-            hourly_occupancy = hourly_occupancy.between_time(start_time.strftime('%H:%M'),
-                                                             end_time.strftime('%H:%M'))
-            hourly_occupancy = hourly_occupancy.reindex(pd.date_range(
-                start=pd.Timestamp.combine(selected_date, start_time),
-                end=pd.Timestamp.combine(selected_date, end_time),
-                freq='H'
-            ), fill_value=0)
-            daily_filtered_dfs[room] = hourly_occupancy
-            capacity_data = df.loc[df['Space Name'] == room, 'Space Capacity']
-            if not capacity_data.empty:
-                daily_capacities[room] = capacity_data.values[0]
+        for room, key in zip(selected_rooms, selected_keys):
+            if key >= 0:
+                daily_capacities[room] = capacities[key]
             else:
                 st.warning(f"No capacity data available for {room}. Setting capacity to 0.")
                 daily_capacities[room] = 0
 
-        # Safe DataFrame creation and visualization
-        if daily_filtered_dfs:
-            if any(not df.empty for df in daily_filtered_dfs.values()):
-                try:
-                    # Create DataFrame with explicit index
-                    combined_daily_data = pd.DataFrame(daily_filtered_dfs).fillna(0)
-                    if not combined_daily_data.empty:
-                        combined_fig = create_combined_heatmap(combined_daily_data, "Time of Day")
-                        st.plotly_chart(combined_fig, use_container_width=True)
-
-                        # Calculate and display utilization
-                        avg_utilization = {}
-                        utilization_records = {}
-                        for room, hourly_occupancy in daily_filtered_dfs.items():
-                            if not hourly_occupancy.empty:
-                                utilization = (hourly_occupancy.sum() / len(hourly_occupancy)) * 100
-                                avg_utilization[room] = utilization
-                                utilization_records[room] = {'Room': room, 'Usage (%)': utilization}
-
-                        # Display utilization text and download button
-                        if avg_utilization:
-                            utilization_text = "<div style='border: 2px solid #4CAF50; padding: 10px; border-radius: 10px; background-color: #f9f9f9;'>"
-                            utilization_text += "<h3 style='color: #4CAF50;'>Average Daily Utilization</h3>"
-                            for room, utilization in avg_utilization.items():
-                                utilization_text += f"<p style='font-size: 18px; font-weight: bold; color: #333;'>{room}: {utilization:.2f}% utilized</p>"
-                            utilization_text += "</div>"
-                            st.markdown(utilization_text, unsafe_allow_html=True)
-
-                            if utilization_records:
-                                df_utilization = pd.DataFrame(utilization_records.values())
-                                get_download_link(
-                                    df_utilization,
-                                    title="📄 Download Daily Utilization Data",
-                                    filename="average_daily_utilization.csv",
-                                    key='download_daily'
-                                )
-                    else:
-                        st.warning("No data available for visualization after processing.")
-                except ValueError as e:
-                    st.warning("Unable to create visualizations. Please check if data is available for the selected criteria.")
-                    st.error(f"Error details: {str(e)}")
-            else:
-                st.warning("No occupancy data found for the selected criteria.")
-        else:
-            st.warning("No data available for the selected filters.")
+        try:
+            with timer.stage('aggregate', chart='daily', rooms=len(selected_rooms)):
+                daily_matrix = figure_cache.get_or_compute(daily_key, build_daily_data)
+            combined_daily_data = daily_matrix.frame()
+            show_combined_heatmap(combined_daily_data, "Time of Day", room_floor, key='heatmap_daily',
+                                  cache_key=daily_key, tick_step=60 // bin_minutes)
+
+            # Calculate and display utilization
+            with timer.stage('utilization', chart='daily'):
+                avg_utilization = presence_utilization(daily_matrix)
+            utilization_records = {room: {'Room': room, 'Usage (%)': utilization} for room, utilization in avg_utilization.items()}
+
+            # Display utilization text and download button
+            if avg_utilization:
+                utilization_text = "<div style='border: 2px solid #4CAF50; padding: 10px; border-radius: 10px; background-color: #f9f9f9;'>"
+                utilization_text += "<h3 style='color: #4CAF50;'>Average Daily Utilization</h3>"
+                for room, utilization in avg_utilization.items():
+                    utilization_text += f"<p style='font-size: 18px; font-weight: bold; color: #333;'>{room}: {utilization:.2f}% utilized</p>"
+                utilization_text += "</div>"
+                st.markdown(utilization_text, unsafe_allow_html=True)
+
+                if utilization_records:
+                    df_utilization = pd.DataFrame(utilization_records.values())
+                    get_download_link(
+                        df_utilization,
+                        title="📄 Download Daily Utilization Data",
+                        filename="average_daily_utilization.csv",
+                        key='download_daily'
+                    )
+        except ValueError as e:
+            st.warning("Unable to create visualizations. Please check if data is available for the selected criteria.")
+            st.error(f"Error details: {str(e)}")
             # Weekly Trends Tab
 with tab2:
     st.markdown("<h3 style='color: #4CAF50;'>Weekly Dashboard</h3>", unsafe_allow_html=True)
     st.write("This section displays weekly room occupancy trends.")
 
-    # Ensure 'Week Start' is a date object
-    df['Week Start'] = pd.to_datetime(df['Week Start']).dt.date
-
     # Convert 'selected_week_start' to date object
     selected_week_start_date = pd.to_datetime(selected_week_start).date()
 
@@ -331,36 +519,29 @@ with tab2:
         # Create date range for the week
         date_range = pd.date_range(start=selected_week_start_date, end=week_end_date, freq='D')
         
-        # Initialize DataFrame with date range as index
-        combined_weekly_data = pd.DataFrame(index=date_range)
-        
-        # Fill data for each room
-        for room in selected_rooms:
-            filtered_df = df[
-                (df['Space Name'] == room) &
-                (df['Local Date'] >= selected_week_start_date) &
-                (df['Local Date'] <= week_end_date)
-            ]
-            if not filtered_df.empty:
-                daily_occupancy = filtered_df.groupby('Local Date')['People Presence'].max()
-                combined_weekly_data[room] = daily_occupancy
+        # Daily max presence per room for Monday to Friday, sliced out of the cube
+        selected_keys = [room_keys.get(room, -1) for room in selected_rooms]
+
+        # Only rooms with readings during the week are shown; days without readings count as unoccupied
+        def build_weekly_data():
+            with timer.stage('load_data', week=selected_week_start_date):
+                cube = week_cube('Room Occupancy', manifest, selected_building, selected_week_start_date, timestamp_source)
+            return room_weekly_matrix(cube, selected_rooms, selected_keys, selected_week_start_date, len(date_range))
+        weekly_key = ('weekly', week_files(manifest, selected_week_start_date, timestamp_source, selected_building)[1],
+                      timestamp_source, tuple(selected_rooms), selected_week_start_date)
+        with timer.stage('aggregate', chart='weekly', rooms=len(selected_rooms)):
+            weekly_matrix = figure_cache.get_or_compute(weekly_key, build_weekly_data)
+        combined_weekly_data = weekly_matrix.frame()
 
         # Continue with visualization if data exists
         if not combined_weekly_data.empty:
             try:
-                combined_fig = create_combined_heatmap(combined_weekly_data.fillna(0), "Day of Week")
-                st.plotly_chart(combined_fig, use_container_width=True)
+                show_combined_heatmap(combined_weekly_data, "Day of Week", room_floor, key='heatmap_weekly', cache_key=weekly_key)
 
                 # Calculate weekly utilization
-                avg_utilization_weekly = {}
-                utilization_records_weekly = {}
-                
-                for room in selected_rooms:
-                    if room in combined_weekly_data.columns:
-                        room_data = combined_weekly_data[room].fillna(0)
-                        utilization = (room_data.sum() / len(room_data)) * 100
-                        avg_utilization_weekly[room] = utilization
-                        utilization_records_weekly[room] = {'Room': room, 'Usage (%)': utilization}
+                with timer.stage('utilization', chart='weekly'):
+                    avg_utilization_weekly = presence_utilization(weekly_matrix)
+                utilization_records_weekly = {room: {'Room': room, 'Usage (%)': utilization} for room, utilization in avg_utilization_weekly.items()}
 
                 # Display weekly utilization
                 if avg_utilization_weekly:
@@ -389,6 +570,153 @@ with tab2:
         else:
             st.warning("No data available for the selected week and rooms.")
 
+# Date Range Trends Tab
+with tab3:
+    st.markdown("<h3 style='color: #3F51B5;'>Date Range Dashboard</h3>", unsafe_allow_html=True)
+    st.write(f"Share of observed weekday office hours with presence, {range_start.date()} to {range_end.date()}.")
+
+    if not selected_rooms:
+        st.warning("Please select at least one room to view occupancy data.")
+    else:
+        # Two prefix-sum lookups per room, however long the range
+        with timer.stage('load_data', chart='range'):
+            rollup = load_rollup('Room Occupancy', tuple(files_in(manifest, [HOURS_PARTITION], [selected_building])),
+                                 building_info['spaces_id'], spaces)
+        selected_keys = [room_keys.get(room, -1) for room in selected_rooms]
+        with timer.stage('utilization', chart='range', level=range_level):
+            if range_level == "Room":
+                range_utilization = dict(zip(selected_rooms, rollup.utilization(
+                    selected_keys, range_start, range_end, start_time.hour, end_time.hour)))
+            else:
+                range_utilization = rollup.group_utilization(level_groups(selected_keys, range_level), range_start,
+                                                             range_end, start_time.hour, end_time.hour)
+
+        range_utilization = {name: utilization for name, utilization in range_utilization.items() if not np.isnan(utilization)}
+        if range_utilization:
+            df_utilization_range = pd.DataFrame({range_level: list(range_utilization), 'Usage (%)': list(range_utilization.values())})
+            with timer.stage('figure', chart='range'):
+                range_fig = px.bar(df_utilization_range, x=range_level, y='Usage (%)', color_discrete_sequence=['#3F51B5'])
+                range_fig.update_layout(title=f'Average Utilization by {range_level}', yaxis_range=[0, 100])
+            with timer.stage('render', chart='range'):
+                st.plotly_chart(range_fig, use_container_width=True)
+
+            utilization_text_range = "<div style='border: 2px solid #3F51B5; padding: 10px; border-radius: 10px; background-color: #f3f4fb;'>"
+            utilization_text_range += "<h3 style='color: #3F51B5;'>Average Utilization</h3>"
+            for name, utilization in range_utilization.items():
+                utilization_text_range += f"<p style='font-size: 18px; font-weight: bold; color: #333;'>{name}: {utilization:.2f}% utilized</p>"
+            utilization_text_range += "</div>"
+            st.markdown(utilization_text_range, unsafe_allow_html=True)
+
+            get_download_link(
+                df_utilization_range,
+                title="📄 Download Date Range Utilization Data",
+                filename="average_range_utilization.csv",
+                key='download_range'
+            )
+        else:
+            st.warning("No data available for the selected dates and rooms.")
+
+# Bookings Tab
+with tab4:
+    st.markdown("<h3 style='color: #009688;'>Bookings Dashboard</h3>", unsafe_allow_html=True)
+    st.write(f"Bookings against presence over observed weekday office hours, {range_start.date()} to {range_end.date()}: "
+             "ghost bookings are booked with nobody present, walk-in hours are occupied without a booking.")
+
+    if not selected_rooms:
+        st.warning("Please select at least one room to view booking data.")
+    else:
+        # Every room's counts are precomputed over the hour grid, so any range is a few lookups per room
+        with timer.stage('load_data', chart='bookings'):
+            booking_rollup = load_booking_rollup('Room Occupancy', tuple(files_in(manifest, [HOURS_PARTITION], [selected_building])),
+                                                 building_info['spaces_id'], spaces)
+        selected_keys = [room_keys.get(room, -1) for room in selected_rooms]
+        with timer.stage('utilization', chart='bookings', level=range_level):
+            if range_level == "Room":
+                rates = booking_rollup.rates(selected_keys, range_start, range_end, start_time.hour, end_time.hour)
+                df_bookings = pd.DataFrame({range_level: selected_rooms, **rates})
+            else:
+                group_rates = booking_rollup.group_rates(level_groups(selected_keys, range_level), range_start, range_end,
+                                                         start_time.hour, end_time.hour)
+                df_bookings = pd.DataFrame([{range_level: name, **rates} for name, rates in group_rates.items()])
+
+        rate_columns = ['Ghost Booking Rate (%)', 'Walk-in Rate (%)', 'Booking Utilization (%)']
+        if not df_bookings.empty:
+            df_bookings = df_bookings[df_bookings[rate_columns].notna().any(axis=1)]
+        if not df_bookings.empty:
+            with timer.stage('figure', chart='bookings'):
+                bookings_fig = px.bar(df_bookings.melt(id_vars=range_level, value_vars=rate_columns, var_name='Rate', value_name='%'),
+                                      x=range_level, y='%', color='Rate', barmode='group',
+                                      color_discrete_sequence=['#E53935', '#FFB300', '#009688'])
+                bookings_fig.update_layout(title=f'Booking Rates by {range_level}', yaxis_range=[0, 100])
+            with timer.stage('render', chart='bookings'):
+                st.plotly_chart(bookings_fig, use_container_width=True)
+                st.dataframe(df_bookings.round(2), hide_index=True, use_container_width=True)
+
+            get_download_link(
+                df_bookings,
+                title="📄 Download Booking Data",
+                filename="booking_rates.csv",
+                key='download_bookings'
+            )
+        else:
+            st.warning("No booking or presence data available for the selected dates and rooms.")
+
+# Right-Sizing Tab
+with tab5:
+    st.markdown("<h3 style='color: #795548;'>Right-Sizing Dashboard</h3>", unsafe_allow_html=True)
+    st.write(f"Peak headcount while occupied against capacity, and the share of observed time occupied, "
+             f"{range_start.date()} to {range_end.date()}.")
+
+    if not selected_rooms:
+        st.warning("Please select at least one room to view headcount data.")
+    else:
+        # Merging the rooms' day histograms over the range; no readings are loaded
+        with timer.stage('load_data', chart='rightsizing'):
+            peak_histograms = load_peak_histograms('Room Occupancy', tuple(files_in(manifest, [PEAKS_PARTITION], [selected_building])),
+                                                   building_info['spaces_id'], spaces)
+        selected_keys = [room_keys.get(room, -1) for room in selected_rooms]
+        with timer.stage('utilization', chart='rightsizing'):
+            df_rightsizing = rightsizing_frame(selected_rooms, [capacities[key] if key >= 0 else 0 for key in selected_keys],
+                                               peak_histograms.histograms(selected_keys, range_start, range_end),
+                                               peak_histograms.occupied_share(selected_keys, range_start, range_end))
+            df_rightsizing = df_rightsizing[df_rightsizing['Occupied (%)'].notna()]
+
+        if not df_rightsizing.empty:
+            percentile_columns = ['p50', 'p90', 'p99']
+            with timer.stage('figure', chart='rightsizing'):
+                rightsizing_fig = px.bar(df_rightsizing.melt(id_vars='Room', value_vars=percentile_columns, var_name='Percentile',
+                                                             value_name='People'),
+                                         x='Room', y='People', color='Percentile', barmode='group',
+                                         color_discrete_sequence=['#D7CCC8', '#A1887F', '#5D4037'])
+                rightsizing_fig.add_scatter(x=df_rightsizing['Room'], y=df_rightsizing['Capacity'], mode='markers', name='Capacity',
+                                            marker=dict(symbol='line-ew-open', size=24, color='#212121', line=dict(width=3)))
+                rightsizing_fig.update_layout(title='Peak Headcount Percentiles vs Capacity')
+            with timer.stage('render', chart='rightsizing'):
+                st.plotly_chart(rightsizing_fig, use_container_width=True)
+                st.dataframe(df_rightsizing.round(2), hide_index=True, use_container_width=True)
+
+            get_download_link(
+                df_rightsizing,
+                title="📄 Download Right-Sizing Data",
+                filename="room_rightsizing.csv",
+                key='download_rightsizing'
+            )
+        else:
+            st.warning("No occupied readings available for the selected dates and rooms.")
+
+# Figure cache usage after this run
+cache_stats = figure_cache.stats()
+st.sidebar.caption(
+    f"🗄️ Figure cache: {cache_stats['hits']} hits, {cache_stats['misses']} misses, "
+    f"{cache_stats['entries']} entries ({cache_stats['bytes'] / 2 ** 20:.1f} of {cache_stats['max_bytes'] / 2 ** 20:.0f} MB)"
+)
+
+# Stage timings of this run, also appended to the timing log
+if timer.enabled:
+    with st.sidebar.expander(f"⏱️ Stage timings ({timer.total_seconds():.2f}s)"):
+        st.dataframe(timer.frame(), hide_index=True, use_container_width=True)
+    timer.write_log()
+
 # Style updates for the utilization boxes
 st.markdown("""
 <style>
@@ -0,0 +1 @@
+# Data loading and occupancy computations shared by the Streamlit dashboards
@@ -0,0 +1,178 @@
+import argparse
+import json
+import os
+import platform
+import shutil
+import tempfile
+import time
+import tracemalloc
+
+import pandas as pd
+
+from occupancy.cube import build_cube
+from occupancy.figures import create_combined_heatmap
+from occupancy.index import build_index
+from occupancy.ingest import MAX_WORKERS, update_manifest
+from occupancy.loading import load_sensor_csv, load_week, week_files
+from occupancy.manifest import manifest_spaces
+from occupancy.metrics import floor_daily_matrix, floor_weekly_matrix, room_daily_matrix, room_weekly_matrix
+from occupancy.synthetic import generate
+
+# Benchmarks of the load / aggregate / render pipeline on synthetic data of several sizes.
+# Each stage reports its best wall time over the repeats and its peak traced memory (NumPy
+# and Python allocations; Arrow buffers are not traced). Results can be stored as a baseline
+# and later runs compared against it:
+#
+#   python -m occupancy.bench --save-baseline
+#   python -m occupancy.bench --baseline bench_baseline.json
+
+# Sizes as weeks x floors x rooms per floor
+DEFAULT_SIZES = '1x3x20,4x5x40,8x10x50'
+
+# Bin width and office hours of the daily matrices and heatmap
+BIN_MINUTES = 15
+START_MINUTE, END_MINUTE = 9 * 60, 17 * 60
+
+# Default file of stored baseline results
+BASELINE_PATH = 'bench_baseline.json'
+
+
+# Parse 'WxFxR' sizes into (weeks, floors, rooms per floor) tuples
+def parse_sizes(text):
+    return [tuple(int(part) for part in size.split('x')) for size in text.split(',') if size]
+
+
+# Run a stage once, returning its result, wall time (seconds) and peak traced memory (bytes)
+def _measure(stage):
+    tracemalloc.start()
+    tracemalloc.reset_peak()
+    started = time.perf_counter()
+    try:
+        result = stage()
+        seconds = time.perf_counter() - started
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return result, seconds, peak
+
+
+# The pipeline stages on one generated dataset, in order; each takes the previous results
+def _stages(data_dir, cache_dir, workbooks, csv_path, max_workers):
+    state = {}
+
+    def ingest():
+        state['manifest'], errors = update_manifest(data_dir, workbooks, cache_dir, max_workers=max_workers)
+        if errors:
+            raise RuntimeError(f"ingestion failed: {errors[0][1]}")
+        state['spaces'] = manifest_spaces(state['manifest'])
+        state['week'], state['files'] = week_files(state['manifest'], state['manifest']['dates'][0])
+
+    def load():
+        state['facts'], _ = load_week(state['files'], state['week'], state['spaces'], cache_dir=cache_dir)
+        return len(state['facts'])
+
+    def cube():
+        state['cube'] = build_cube(state['facts'], len(state['spaces']))
+
+    def daily():
+        rooms, keys = state['spaces']['Space Name'].tolist(), list(range(len(state['spaces'])))
+        for date in pd.date_range(state['week'], periods=5):
+            state['daily'] = room_daily_matrix(state['cube'], rooms, keys, date, BIN_MINUTES, START_MINUTE, END_MINUTE)
+
+    def weekly():
+        rooms, keys = state['spaces']['Space Name'].tolist(), list(range(len(state['spaces'])))
+        room_weekly_matrix(state['cube'], rooms, keys, state['week'])
+
+    def heatmap():
+        fig = create_combined_heatmap(state['daily'].frame(), "Time of Day", tick_step=60 // BIN_MINUTES)
+        return len(fig.to_json())
+
+    def csv_load():
+        state['sensors'], _ = load_sensor_csv(csv_path)
+        return len(state['sensors'])
+
+    def floor_index():
+        state['index'] = build_index(state['sensors'], 'Location Name')
+
+    def floor_daily():
+        floors = list(state['index'].keys)
+        for date in pd.date_range(state['week'], periods=5):
+            floor_daily_matrix(state['index'], floors, 'Associated Users Count', date, BIN_MINUTES, START_MINUTE, END_MINUTE)
+
+    def floor_weekly():
+        floor_weekly_matrix(state['index'], list(state['index'].keys), 'Associated Users Count', state['week'],
+                            START_MINUTE, END_MINUTE)
+
+    return [('ingest', ingest), ('load_week', load), ('build_cube', cube), ('daily_matrix', daily),
+            ('weekly_matrix', weekly), ('heatmap', heatmap), ('csv_load', csv_load), ('floor_index', floor_index),
+            ('floor_daily', floor_daily), ('floor_weekly', floor_weekly)]
+
+
+# Benchmark every stage on one size; repeats run on a fresh workbook cache each time
+def bench_size(weeks, floors, rooms, repeat=3, max_workers=MAX_WORKERS, seed=0):
+    root = tempfile.mkdtemp(prefix='occupancy-bench-')
+    try:
+        data_dir = os.path.join(root, 'data')
+        workbooks, csv_path = generate(data_dir, weeks, floors, rooms, seed=seed)
+        results = {}
+        for run in range(repeat):
+            cache_dir = os.path.join(root, f"cache-{run}")
+            for name, stage in _stages(data_dir, cache_dir, workbooks, csv_path, max_workers):
+                output, seconds, peak = _measure(stage)
+                best = results.setdefault(name, {'seconds': seconds, 'peak_mb': peak / 2 ** 20})
+                best['seconds'] = min(best['seconds'], seconds)
+                best['peak_mb'] = max(best['peak_mb'], peak / 2 ** 20)
+                if output is not None:
+                    best['output'] = output
+        return results
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+
+
+# Benchmark all sizes, returning a JSON-serializable result set
+def run_benchmarks(sizes, repeat=3, max_workers=MAX_WORKERS):
+    return {
+        'created': pd.Timestamp.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'machine': platform.machine(),
+        'sizes': {f"{weeks}x{floors}x{rooms}": bench_size(weeks, floors, rooms, repeat, max_workers)
+                  for weeks, floors, rooms in sizes},
+    }
+
+
+# Text table of results, with the ratio to a baseline's wall time where it has the same size and stage
+def format_results(results, baseline=None):
+    lines = [f"{'size':<12} {'stage':<14} {'seconds':>9} {'peak MB':>9} {'vs base':>8}"]
+    for size, stages in results['sizes'].items():
+        for stage, values in stages.items():
+            base = (baseline or {}).get('sizes', {}).get(size, {}).get(stage)
+            ratio = f"{values['seconds'] / base['seconds']:.2f}x" if base and base['seconds'] else ''
+            lines.append(f"{size:<12} {stage:<14} {values['seconds']:>9.4f} {values['peak_mb']:>9.1f} {ratio:>8}")
+    return '\n'.join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the occupancy pipeline on synthetic data.")
+    parser.add_argument('--sizes', default=DEFAULT_SIZES, help="comma-separated WEEKSxFLOORSxROOMS sizes")
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--workers', type=int, default=MAX_WORKERS, help="ingestion worker processes")
+    parser.add_argument('--baseline', default=BASELINE_PATH, help="baseline results to compare against")
+    parser.add_argument('--save-baseline', action='store_true', help="store these results as the baseline")
+    parser.add_argument('--output', help="also write these results to a JSON file")
+    args = parser.parse_args(argv)
+
+    results = run_benchmarks(parse_sizes(args.sizes), args.repeat, args.workers)
+    baseline = None
+    if os.path.exists(args.baseline) and not args.save_baseline:
+        with open(args.baseline, encoding='utf-8') as f:
+            baseline = json.load(f)
+    print(format_results(results, baseline))
+
+    for path in [args.output] + ([args.baseline] if args.save_baseline else []):
+        if path:
+            with open(path, 'w', encoding='utf-8') as f:
+                json.dump(results, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,70 @@
+import numpy as np
+import pandas as pd
+
+# Selectable time bin widths in minutes; each divides an hour, so bins never straddle one
+BIN_WIDTHS = (5, 15, 30, 60)
+
+MINUTES_PER_DAY = 24 * 60
+
+
+# Minutes since midnight of a datetime.time
+def minute_of_day(time):
+    return time.hour * 60 + time.minute
+
+
+# Bin numbers (since midnight) [first, last) of the bins starting in [start_minute, end_minute]
+def bin_range(bin_minutes, start_minute, end_minute):
+    first = start_minute // bin_minutes
+    last = min(end_minute, MINUTES_PER_DAY - 1) // bin_minutes + 1
+    return first, max(last, first)
+
+
+# Start timestamps of the bins of one day starting in [start_minute, end_minute]
+def bin_starts(date, bin_minutes, start_minute, end_minute):
+    first, last = bin_range(bin_minutes, start_minute, end_minute)
+    day = np.datetime64(pd.Timestamp(date).date(), 'D')
+    return pd.DatetimeIndex(day + np.arange(first, last) * np.timedelta64(bin_minutes, 'm'))
+
+
+# Max value per group and bin on one day, for all groups at once. Rows are given as parallel
+# group numbers, timestamps and values; result is [num_groups, bins], NaN where no reading.
+def binned_max(groups, timestamps, values, num_groups, date, bin_minutes, start_minute, end_minute):
+    groups = np.asarray(groups, dtype=np.int64)
+    timestamps = np.asarray(timestamps, dtype='datetime64[ns]')
+    values = np.asarray(values, dtype=np.float64)
+    first, last = bin_range(bin_minutes, start_minute, end_minute)
+    num_bins = last - first
+
+    valid = (groups >= 0) & (groups < num_groups) & ~np.isnat(timestamps) & ~np.isnan(values)
+    day = np.datetime64(pd.Timestamp(date).date(), 'D')
+    bins = np.full(len(timestamps), -1, dtype=np.int64)
+    bins[valid] = (timestamps[valid] - day) // np.timedelta64(bin_minutes, 'm') - first
+    valid &= (bins >= 0) & (bins < num_bins)
+
+    out = np.full(num_groups * num_bins, -np.inf)
+    np.maximum.at(out, groups[valid] * num_bins + bins[valid], values[valid])
+    out[out == -np.inf] = np.nan
+    return out.reshape(num_groups, num_bins)
+
+
+# Max value per group and day over [start_date, start_date + days), counting only rows whose
+# time of day lies in [start_minute, end_minute]; result is [num_groups, days], NaN where no reading
+def daily_max(groups, timestamps, values, num_groups, start_date, days, start_minute=0, end_minute=MINUTES_PER_DAY - 1):
+    groups = np.asarray(groups, dtype=np.int64)
+    timestamps = np.asarray(timestamps, dtype='datetime64[ns]')
+    values = np.asarray(values, dtype=np.float64)
+
+    valid = (groups >= 0) & (groups < num_groups) & ~np.isnat(timestamps) & ~np.isnan(values)
+    first = np.datetime64(pd.Timestamp(start_date).date(), 'D')
+    stamps = timestamps[valid]
+    dates = stamps.astype('datetime64[D]')
+    day_index = np.full(len(timestamps), -1, dtype=np.int64)
+    minutes = np.full(len(timestamps), -1, dtype=np.int64)
+    day_index[valid] = (dates - first).astype(np.int64)
+    minutes[valid] = (stamps - dates) // np.timedelta64(1, 'm')
+    valid &= (day_index >= 0) & (day_index < days) & (minutes >= start_minute) & (minutes <= end_minute)
+
+    out = np.full(num_groups * days, -np.inf)
+    np.maximum.at(out, groups[valid] * days + day_index[valid], values[valid])
+    out[out == -np.inf] = np.nan
+    return out.reshape(num_groups, days)
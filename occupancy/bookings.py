@@ -0,0 +1,91 @@
+from dataclasses import dataclass
+
+import numpy as np
+
+from occupancy.rollup import WORKDAYS, flag_days, hour_prefix_sums, range_totals, unpack_hours
+
+# Booking-vs-presence analytics from the per room-day hour flags (see hour_flags). The booked,
+# occupied and observed hours of every room-day are unpacked into [room-days, 24] boolean grids
+# and combined with whole-array algebra, only over observed hours:
+#   used     booked & occupied
+#   walk-in  occupied & ~booked
+# A booking is a run of consecutive booked hours of a day, counted at its first hour; it is a
+# ghost booking if none of its hours is occupied. The counts are kept as prefix sums over days
+# and hours like the utilization rollup, so any date range and office hours is a few lookups.
+
+# Hour counts of the rollup
+BOOKING_COUNTS = ('booked', 'used', 'occupied', 'walk_in', 'bookings', 'ghost_bookings')
+
+
+# Boolean [room-days, 24] grids of each booking count from the hour grids of the flags
+def booking_hours(booked, occupied, observed):
+    observed = observed.astype(bool)
+    booked = booked.astype(bool) & observed
+    occupied = occupied.astype(bool) & observed
+
+    # Runs of booked hours start where the previous hour of the day is not booked; numbering
+    # the starts in order gives every booked hour the number of its run
+    starts = booked.copy()
+    starts[:, 1:] &= ~booked[:, :-1]
+    runs = np.cumsum(starts.ravel()).reshape(booked.shape)
+    used_runs = np.zeros(int(starts.sum()) + 1, dtype=bool)
+    used_runs[runs[booked & occupied]] = True
+
+    return {
+        'booked': booked,
+        'used': booked & occupied,
+        'occupied': occupied,
+        'walk_in': occupied & ~booked,
+        'bookings': starts,
+        'ghost_bookings': starts & ~used_runs[runs],
+    }
+
+
+# Ghost booking, walk-in and booking-hour utilization rates (percent) of booking counts, with
+# the bookings and booked hours they are taken over; NaN where there is nothing to take a rate of
+def booking_rates(totals):
+    with np.errstate(invalid='ignore', divide='ignore'):
+        def rate(part, whole):
+            return np.where(whole > 0, part * 100.0 / whole, np.nan)
+        return {
+            'Bookings': totals['bookings'],
+            'Booked Hours': totals['booked'],
+            'Ghost Booking Rate (%)': rate(totals['ghost_bookings'], totals['bookings']),
+            'Walk-in Rate (%)': rate(totals['walk_in'], totals['occupied']),
+            'Booking Utilization (%)': rate(totals['used'], totals['booked']),
+        }
+
+
+# Prefix sums of the booking counts per space, over days and hours of the day (see Rollup)
+@dataclass
+class BookingRollup:
+    first_date: np.datetime64
+    counts: dict
+
+    # Booking counts per space key over [start_date, end_date] and [start_hour, end_hour]; bookings
+    # are counted if they start within the hours
+    def totals(self, keys, start_date, end_date, start_hour=0, end_hour=23):
+        return dict(zip(self.counts, range_totals(list(self.counts.values()), self.first_date, keys, start_date, end_date,
+                                                  start_hour, end_hour)))
+
+    # Booking rates per space key
+    def rates(self, keys, start_date, end_date, start_hour=0, end_hour=23):
+        return booking_rates(self.totals(keys, start_date, end_date, start_hour, end_hour))
+
+    # Booking rates of groups of space keys (e.g. floors or buildings), pooling their counts
+    def group_rates(self, groups, start_date, end_date, start_hour=0, end_hour=23):
+        result = {}
+        for name, keys in groups.items():
+            totals = self.totals(keys, start_date, end_date, start_hour, end_hour)
+            result[name] = {metric: value[0] for metric, value in
+                            booking_rates({count: np.array([values.sum()]) for count, values in totals.items()}).items()}
+        return result
+
+
+# Build the booking rollup from hour flags keyed by 'Space Key' (see hour_flags and split_spaces)
+def build_booking_rollup(flags, num_spaces, workdays=WORKDAYS):
+    keys, day_index, valid, first_date, num_days = flag_days(flags, workdays)
+    grids = booking_hours(*(unpack_hours(flags[column].to_numpy()[valid])
+                            for column in ('Booked Hours', 'Occupied Hours', 'Observed Hours')))
+    return BookingRollup(first_date, {name: hour_prefix_sums(keys, day_index, grids[name], num_spaces, num_days)
+                                      for name in BOOKING_COUNTS})
@@ -0,0 +1,103 @@
+import hashlib
+import json
+import os
+
+import pyarrow.feather as feather
+
+# Default location of the on-disk workbook cache
+CACHE_DIR = '.occupancy_cache'
+
+# Bump when the layout of cached tables changes so old entries are ignored
+CACHE_SCHEMA = 14
+
+
+# Identify a source file independently of its contents
+def source_id(path):
+    return hashlib.blake2b(os.path.abspath(path).encode('utf-8'), digest_size=8).hexdigest()
+
+
+# Build the cache key for a source file from its path, size and mtime (optionally its contents)
+def file_key(path, hash_contents=False):
+    stat = os.stat(path)
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(f"{CACHE_SCHEMA}|{os.path.abspath(path)}|{stat.st_size}|{stat.st_mtime_ns}".encode('utf-8'))
+    if hash_contents:
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1 << 20), b''):
+                digest.update(chunk)
+    return digest.hexdigest()
+
+
+# Path of the index file of the cache entry for a source file with the given key. The index
+# is written last, so an entry exists only once all of its partitions are on disk.
+def entry_path(cache_dir, path, key):
+    return os.path.join(cache_dir, f"{source_id(path)}-{key}.json")
+
+
+# Path of one partition of a cache entry, relative to the cache directory; partitions are
+# directories such as week=2024-09-23, each holding one file per source
+def partition_name(path, key, partition):
+    return os.path.join(partition, f"{source_id(path)}-{key}.arrow")
+
+
+# Check whether a cache entry exists for a source file with the given key
+def has_entry(cache_dir, path, key):
+    return os.path.exists(entry_path(cache_dir, path, key))
+
+
+# Read the index of a cache entry, or return None if it does not exist
+def read_entry(cache_dir, path, key):
+    entry = entry_path(cache_dir, path, key)
+    if not os.path.exists(entry):
+        return None
+    with open(entry, encoding='utf-8') as f:
+        return json.load(f)
+
+
+# Write a file atomically through a temporary file in the same directory
+def _write_atomic(target, write):
+    tmp = f"{target}.{os.getpid()}.tmp"
+    write(tmp)
+    os.replace(tmp, target)
+
+
+# Write the partitions of a source file as uncompressed Arrow IPC files, then its index
+# (the given info plus the partition names), and drop older entries for the same source
+def write_entry(cache_dir, path, key, partitions, info=None):
+    os.makedirs(cache_dir, exist_ok=True)
+    names = {}
+    for partition, table in partitions.items():
+        name = partition_name(path, key, partition)
+        os.makedirs(os.path.dirname(os.path.join(cache_dir, name)), exist_ok=True)
+        _write_atomic(os.path.join(cache_dir, name),
+                      lambda tmp: feather.write_feather(table, tmp, compression='uncompressed'))
+        names[partition] = name
+
+    entry = entry_path(cache_dir, path, key)
+    index = dict(info or {}, partitions=names)
+
+    def write_index(tmp):
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(index, f)
+    _write_atomic(entry, write_index)
+
+    _remove_stale(cache_dir, path, set(names.values()) | {os.path.basename(entry)})
+    return index
+
+
+# Remove files of older entries for a source file, keeping the given names
+def _remove_stale(cache_dir, path, keep):
+    prefix = f"{source_id(path)}-"
+    for root, _, files in os.walk(cache_dir):
+        for name in files:
+            relative = os.path.relpath(os.path.join(root, name), cache_dir)
+            if name.startswith(prefix) and name.endswith(('.arrow', '.json')) and relative not in keep:
+                try:
+                    os.remove(os.path.join(root, name))
+                except OSError:
+                    pass
+
+
+# Remove every cached entry of a source file, e.g. a workbook deleted from its folder
+def remove_entries(cache_dir, path):
+    _remove_stale(cache_dir, path, keep=set())
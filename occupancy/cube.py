@@ -0,0 +1,91 @@
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+from occupancy.bins import bin_range
+
+# Slots are as wide as the finest selectable time bin, so every bin is a whole number of slots
+SLOT_MINUTES = 5
+SLOTS_PER_DAY = 24 * 60 // SLOT_MINUTES
+
+# Cell value for a slot without any reading
+MISSING = -1
+
+
+# Dense room x day x slot arrays of the occupancy fact table. Rooms are indexed by
+# space key; days are consecutive calendar days starting at first_date, so a week is
+# a contiguous slice.
+@dataclass
+class OccupancyCube:
+    first_date: np.datetime64
+    presence: np.ndarray
+    peak: np.ndarray
+
+    @property
+    def num_days(self):
+        return self.presence.shape[1]
+
+    # Position of a date on the day axis (may fall outside the cube)
+    def day_position(self, date):
+        return int((np.datetime64(pd.Timestamp(date).date(), 'D') - self.first_date).astype(np.int64))
+
+    # Slice values for the given space keys over [start_date, start_date + days), MISSING outside the cube
+    def _days(self, values, keys, start_date, days):
+        keys = np.asarray(keys, dtype=np.int64)
+        start = self.day_position(start_date)
+        out = np.full((len(keys), days, SLOTS_PER_DAY), MISSING, dtype=values.dtype)
+        lo, hi = max(start, 0), min(start + days, self.num_days)
+        known = (keys >= 0) & (keys < len(values))
+        if lo < hi and known.any():
+            out[np.flatnonzero(known), lo - start:hi - start] = values[keys[known], lo:hi]
+        return out
+
+    # Max presence per room for each bin_minutes bin starting in [start_minute, end_minute] on one
+    # day; MISSING where no reading. Bins are groups of whole slots, so this is a reshape and a max.
+    def binned_presence(self, keys, date, bin_minutes, start_minute, end_minute):
+        if bin_minutes % SLOT_MINUTES or (24 * 60) % bin_minutes:
+            raise ValueError(f"Bin width must be a multiple of {SLOT_MINUTES} minutes dividing a day, got {bin_minutes}")
+        day = self._days(self.presence, keys, date, 1)[:, 0]
+        slots_per_bin = bin_minutes // SLOT_MINUTES
+        binned = day.reshape(len(day), SLOTS_PER_DAY // slots_per_bin, slots_per_bin).max(axis=2)
+        first, last = bin_range(bin_minutes, start_minute, end_minute)
+        return binned[:, first:last]
+
+    # Max presence per room for each day in [start_date, start_date + days); MISSING where no reading
+    def daily_presence(self, keys, start_date, days):
+        return self._days(self.presence, keys, start_date, days).max(axis=2)
+
+
+# Values of a column for the valid rows, with missing readings as MISSING
+def _values(column, valid, dtype):
+    values = column.to_numpy(dtype=np.float64, na_value=np.nan)[valid]
+    return np.nan_to_num(values, nan=MISSING).astype(dtype)
+
+
+# Build the cube from a fact table indexed by timestamp with 'Space Key', 'People Presence' and 'Peak People Count'
+def build_cube(df, num_spaces):
+    keys = df['Space Key'].to_numpy().astype(np.int64)
+    timestamps = df.index.values.astype('datetime64[ns]')
+    valid = (keys >= 0) & ~np.isnat(timestamps)
+
+    codes = keys[valid]
+    timestamps = timestamps[valid]
+    days = timestamps.astype('datetime64[D]')
+    if len(days):
+        first_date = days.min()
+        num_days = int((days.max() - first_date).astype(np.int64)) + 1
+    else:
+        first_date, num_days = np.datetime64('1970-01-01', 'D'), 0
+
+    day_index = (days - first_date).astype(np.int64)
+    slot_index = ((timestamps - days) // np.timedelta64(SLOT_MINUTES, 'm')).astype(np.int64)
+    cells = (codes, day_index, slot_index)
+
+    shape = (num_spaces, num_days, SLOTS_PER_DAY)
+    presence = np.full(shape, MISSING, dtype=np.int8)
+    np.maximum.at(presence, cells, _values(df['People Presence'], valid, np.int8))
+    peak = np.full(shape, MISSING, dtype=np.int16)
+    np.maximum.at(peak, cells, _values(df['Peak People Count'], valid, np.int16))
+
+    return OccupancyCube(first_date, presence, peak)
@@ -0,0 +1,122 @@
+import hashlib
+import os
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+from pyarrow import fs
+
+from occupancy.cache import CACHE_DIR
+from occupancy.timestamps import week_starts
+
+# Building- and week-partitioned storage of the cached workbooks. Each workbook is split by
+# 'Building Name' into building=<id> shards and each shard by the Monday of its 'Local Date'
+# into week=YYYY-MM-DD partitions (keys like building=<id>/week=2024-09-23); queries open only
+# the partitions of the requested buildings and weeks and read only the requested rows and columns.
+
+# Partition of rows without a 'Local Date'
+UNDATED = 'none'
+
+
+# Partition directory of a week start (ISO date) or UNDATED
+def week_partition(week):
+    return f"week={week}"
+
+
+# Partition directory of a building's shard; names are hashed so any building name is a safe
+# directory name. Rows without a building share one shard.
+def building_partition(building):
+    if building is None or pd.isna(building):
+        return 'building=none'
+    return f"building={hashlib.blake2b(str(building).encode('utf-8'), digest_size=6).hexdigest()}"
+
+
+# Split a workbook table into one table per building shard
+def partition_by_building(table):
+    if 'Building Name' not in table.column_names:
+        return {building_partition(None): table}
+    codes, buildings = pd.factorize(table.column('Building Name').to_numpy(zero_copy_only=False))
+    shards = {building_partition(building): table.take(pa.array(np.flatnonzero(codes == code)))
+              for code, building in enumerate(buildings)}
+    if (codes < 0).any():
+        shards[building_partition(None)] = table.take(pa.array(np.flatnonzero(codes < 0)))
+    return shards
+
+
+# Split a workbook table into one table per week partition, plus UNDATED rows
+def partition_by_week(table):
+    dates = table.column('Local Date').to_numpy(zero_copy_only=False).astype('datetime64[D]')
+    weeks = week_starts(dates)
+    undated = np.isnat(weeks)
+    labels = np.where(undated, np.datetime64('1970-01-01', 'D'), weeks).astype(np.int64)
+
+    partitions = {}
+    for label in np.unique(labels[~undated]):
+        rows = np.flatnonzero((labels == label) & ~undated)
+        partitions[week_partition(np.datetime64(int(label), 'D'))] = table.take(pa.array(rows))
+    if undated.any():
+        partitions[week_partition(UNDATED)] = table.take(pa.array(np.flatnonzero(undated)))
+    return partitions
+
+
+# Week starts (ISO dates) of the weeks overlapping [start_date, end_date]
+def weeks_between(start_date, end_date=None):
+    start = np.datetime64(pd.Timestamp(start_date).date(), 'D')
+    end = start if end_date is None else np.datetime64(pd.Timestamp(end_date).date(), 'D')
+    first, last = week_starts(np.array([start, end]))
+    return [str(week) for week in np.arange(first, last + 1, 7)]
+
+
+# Files of a manifest's workbooks in the given partitions (e.g. week=2024-09-23) of the given
+# buildings (by name; default every building), from the least to the most recently modified
+# workbook (the order de-duplication relies on)
+def files_in(manifest, partitions, buildings=None):
+    partitions = set(partitions)
+    shards = None if buildings is None else {building_partition(building) for building in buildings}
+    workbooks = sorted(manifest.get('workbooks', {}).items(), key=lambda item: (item[1].get('modified', 0), item[0]))
+    files = []
+    for _, summary in workbooks:
+        for key, name in sorted(summary.get('partitions', {}).items()):
+            shard, _, partition = key.rpartition('/')
+            if partition in partitions and (shards is None or shard in shards):
+                files.append(name)
+    return files
+
+
+# Partition files of a manifest for the given weeks (ISO week starts or UNDATED) and buildings
+def partition_files(manifest, weeks, buildings=None):
+    return files_in(manifest, [week_partition(week) for week in weeks], buildings)
+
+
+# Read the rows of the given partition files between two dates (inclusive), optionally only
+# for the given space names and columns. Rows without a 'Local Date' are added on request.
+def read_partitions(files, start_date=None, end_date=None, rooms=None, columns=None,
+                    include_undated=False, cache_dir=CACHE_DIR):
+    if not files:
+        return None
+    dataset = ds.dataset([os.path.join(cache_dir, name) for name in files], format='ipc',
+                         filesystem=fs.LocalFileSystem(use_mmap=True))
+
+    predicate = None
+    if start_date is not None:
+        end_date = start_date if end_date is None else end_date
+        date = ds.field('Local Date')
+        predicate = (date >= pa.scalar(pd.Timestamp(start_date), pa.timestamp('ns'))) & \
+                    (date < pa.scalar(pd.Timestamp(end_date) + pd.Timedelta(days=1), pa.timestamp('ns')))
+        if include_undated:
+            predicate = predicate | ~date.is_valid()
+    if rooms is not None:
+        in_rooms = ds.field('Space Name').isin(pa.array(list(rooms), pa.string()))
+        predicate = in_rooms if predicate is None else predicate & in_rooms
+
+    columns = None if columns is None else [name for name in columns if name in dataset.schema.names]
+    return dataset.to_table(columns=columns, filter=predicate)
+
+
+# Query a manifest's dataset: rows between two dates (inclusive), optionally restricted to
+# a set of space names and columns. Only partitions of the overlapping weeks are opened.
+def query(manifest, start_date, end_date=None, rooms=None, columns=None, include_undated=False, cache_dir=CACHE_DIR):
+    weeks = weeks_between(start_date, end_date) + ([UNDATED] if include_undated else [])
+    return read_partitions(partition_files(manifest, weeks), start_date, end_date, rooms, columns,
+                           include_undated, cache_dir)
@@ -0,0 +1,197 @@
+import os
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+
+from occupancy.cache import CACHE_DIR
+from occupancy.dataset import partition_files, read_partitions
+from occupancy.dimensions import SPACE_LEVELS
+
+# De-duplication of overlapping exports (re-exported weeks, shared boundary days). Readings
+# are keyed by space and 'UTC Timestamp' ('Local Date' + 'Local Time' where it is missing),
+# hashed column by column into one uint64 per row; rows sharing a key are resolved by policy:
+#   'newest'        the reading of the most recently modified workbook wins
+#   'max_presence'  the reading with the highest presence (then peak count) wins, newest on ties
+DEDUP_POLICIES = ('newest', 'max_presence')
+DEDUP_POLICY = os.environ.get('OCCUPANCY_DEDUP_POLICY', 'newest')
+
+# Columns the fact key and the 'max_presence' policy read
+FACT_KEY_COLUMNS = SPACE_LEVELS + ['UTC Timestamp', 'Local Date', 'Local Time', 'People Presence', 'Peak People Count']
+
+# Hour bit mask columns of the hour flags; 'Observed Hours' decides which workbook an hour comes from
+FLAG_MASKS = ('Occupied Hours', 'Booked Hours')
+
+# Hash of missing values, and the multiplier combining column hashes
+_NULL_HASH = np.uint64(0x9E3779B97F4A7C15)
+_MULTIPLIER = np.uint64(0x100000001B3)
+
+
+# uint64 hash of each value of an Arrow column; dictionary columns hash their few distinct values only
+def column_hashes(column):
+    column = column.combine_chunks() if isinstance(column, pa.ChunkedArray) else column
+    if pa.types.is_dictionary(column.type):
+        values = np.append(pd.util.hash_array(column.dictionary.to_numpy(zero_copy_only=False).astype(object)), _NULL_HASH)
+        indices = pc.fill_null(column.indices, -1).to_numpy(zero_copy_only=False).astype(np.int64)
+        return values[indices]
+    if pa.types.is_string(column.type) or pa.types.is_large_string(column.type):
+        hashes = pd.util.hash_array(column.to_numpy(zero_copy_only=False).astype(object))
+    else:
+        hashes = pd.util.hash_array(pc.fill_null(column.cast(pa.int64()), 0).to_numpy(zero_copy_only=False))
+    return np.where(column.is_valid().to_numpy(zero_copy_only=False), hashes, _NULL_HASH)
+
+
+# Combined hash of the given columns of each row of a table (columns it lacks are skipped)
+def key_hashes(table, columns):
+    hashes = np.zeros(table.num_rows, dtype=np.uint64)
+    for column in columns:
+        if column in table.column_names:
+            hashes = hashes * _MULTIPLIER ^ column_hashes(table.column(column))
+    return hashes
+
+
+# Fact reading keys: space and UTC timestamp, or space and local date and time where the UTC timestamp is missing
+def fact_hashes(table):
+    levels = [column for column in SPACE_LEVELS if column in table.column_names]
+    hashes = key_hashes(table, levels + ['UTC Timestamp'])
+    if 'UTC Timestamp' in table.column_names:
+        missing = ~table.column('UTC Timestamp').is_valid().to_numpy(zero_copy_only=False)
+        if missing.any():
+            hashes = np.where(missing, key_hashes(table, levels + ['Local Date', 'Local Time']), hashes)
+    else:
+        hashes = key_hashes(table, levels + ['Local Date', 'Local Time'])
+    return hashes
+
+
+# Preference of fact readings under 'max_presence': presence first, then peak count
+def fact_scores(table):
+    presence = pc.fill_null(table.column('People Presence').cast(pa.int64()), -1).to_numpy()
+    peak = pc.fill_null(table.column('Peak People Count').cast(pa.int64()), -1).to_numpy()
+    return presence * (1 << 20) + peak
+
+
+# Hour flag keys: space and day
+def flag_hashes(table):
+    return key_hashes(table, SPACE_LEVELS + ['Local Date'])
+
+
+# Merge the hour flags of room-days found in several workbooks hour by hour, so exports that
+# share a boundary day each contribute the hours they observed. An hour observed by several
+# workbooks takes its bits from the newest one ('newest'), or is occupied if any of them saw
+# presence ('max_presence'). Sources number the workbooks from oldest to newest.
+def merge_flags(table, sources, policy=DEDUP_POLICY):
+    if policy not in DEDUP_POLICIES:
+        raise ValueError(f"Unknown de-duplication policy {policy!r}; expected one of {', '.join(DEDUP_POLICIES)}")
+    hashes = flag_hashes(table)
+    order = np.lexsort((-sources, hashes))
+    sorted_hashes = hashes[order]
+    first = np.ones(len(order), dtype=bool)
+    first[1:] = sorted_hashes[1:] != sorted_hashes[:-1]
+    starts = np.flatnonzero(first)
+
+    def masks(column):
+        return pc.fill_null(table.column(column).cast(pa.int64()), 0).to_numpy()[order]
+
+    # Hours already observed by newer rows of the same room-day, one rank (newest first) at a time
+    observed = masks('Observed Hours')
+    rank = np.arange(len(order)) - np.repeat(starts, np.diff(np.append(starts, len(order))))
+    seen = np.zeros(len(order), dtype=np.int64)
+    for level in range(1, int(rank.max(initial=0)) + 1):
+        rows = np.flatnonzero(rank == level)
+        seen[rows] = seen[rows - 1] | observed[rows - 1]
+    own = observed & ~seen
+
+    merged = table.take(pa.array(order[starts]))
+    merged = merged.set_column(merged.column_names.index('Observed Hours'), 'Observed Hours',
+                               pa.array(np.bitwise_or.reduceat(observed, starts) if len(starts) else observed, pa.int32()))
+    for column in FLAG_MASKS:
+        if column in table.column_names:
+            values = masks(column)
+            values = values if policy == 'max_presence' and column == 'Occupied Hours' else values & own
+            reduced = np.bitwise_or.reduceat(values, starts) if len(starts) else values
+            merged = merged.set_column(merged.column_names.index(column), column, pa.array(reduced, pa.int32()))
+    return merged
+
+
+# Rows to keep: one per key, the best by the policy. Sources number the workbooks from oldest
+# to newest, so newer sources win ties; duplicates within one source keep their first row.
+def keep_rows(hashes, sources, policy=DEDUP_POLICY, scores=None):
+    if policy not in DEDUP_POLICIES:
+        raise ValueError(f"Unknown de-duplication policy {policy!r}; expected one of {', '.join(DEDUP_POLICIES)}")
+    if policy == 'max_presence' and scores is not None:
+        order = np.lexsort((-sources, -scores, hashes))
+    else:
+        order = np.lexsort((-sources, hashes))
+    sorted_hashes = hashes[order]
+    first = np.ones(len(order), dtype=bool)
+    first[1:] = sorted_hashes[1:] != sorted_hashes[:-1]
+    keep = np.zeros(len(order), dtype=bool)
+    keep[order[first]] = True
+    return keep
+
+
+# De-duplicate the tables of several workbooks (oldest first); returns the combined table
+# and the number of rows dropped from each input table
+def deduplicate(tables, hashes=fact_hashes, score=fact_scores, policy=DEDUP_POLICY):
+    combined = pa.concat_tables(tables)
+    sources = np.repeat(np.arange(len(tables)), [table.num_rows for table in tables])
+    scores = score(combined) if policy == 'max_presence' and score is not None else None
+    keep = keep_rows(hashes(combined), sources, policy, scores)
+    dropped = np.bincount(sources[~keep], minlength=len(tables))
+    return combined.filter(pa.array(keep)), dropped
+
+
+# Partition files grouped by workbook, in order; the files of one workbook share a name
+def files_by_workbook(files):
+    groups = {}
+    for name in files:
+        groups.setdefault(os.path.basename(name), []).append(name)
+    return groups
+
+
+# Read partition files like read_partitions, de-duplicating readings across (and within) their
+# workbooks. Files should be ordered from the oldest to the newest workbook, as week_files
+# returns them. Returns the table (or None) and the rows dropped per workbook file name.
+def read_deduplicated(files, start_date=None, end_date=None, rooms=None, columns=None, include_undated=False,
+                      cache_dir=CACHE_DIR, hashes=fact_hashes, score=fact_scores, key_columns=FACT_KEY_COLUMNS,
+                      policy=DEDUP_POLICY):
+    read_columns = None if columns is None else list(dict.fromkeys(list(columns) + key_columns))
+    tables = {}
+    for name, group in files_by_workbook(files).items():
+        table = read_partitions(group, start_date, end_date, rooms, read_columns, include_undated, cache_dir)
+        if table is not None and table.num_rows:
+            tables[name] = table
+    if not tables:
+        return None, {}
+
+    table, dropped = deduplicate(list(tables.values()), hashes, score, policy)
+    if columns is not None:
+        table = table.select([column for column in columns if column in table.column_names])
+    return table, {name: int(count) for name, count in zip(tables, dropped) if count}
+
+
+# Read hour flag files like read_partitions, merging room-days repeated across their workbooks
+# hour by hour (see merge_flags). Files should be ordered from the oldest to the newest workbook.
+def read_hour_flags(files, start_date=None, end_date=None, cache_dir=CACHE_DIR, policy=DEDUP_POLICY):
+    tables = []
+    for group in files_by_workbook(files).values():
+        table = read_partitions(group, start_date, end_date, cache_dir=cache_dir)
+        if table is not None and table.num_rows:
+            tables.append(table)
+    if not tables:
+        return None
+    sources = np.repeat(np.arange(len(tables)), [table.num_rows for table in tables])
+    return merge_flags(pa.concat_tables(tables), sources, policy)
+
+
+# Rows dropped as duplicates per week and workbook path for the given weeks of a manifest
+def duplicate_report(manifest, weeks, cache_dir=CACHE_DIR, policy=DEDUP_POLICY):
+    workbook_of = {os.path.basename(name): path for path, summary in manifest.get('workbooks', {}).items()
+                   for name in summary.get('partitions', {}).values()}
+    report = {}
+    for week in weeks:
+        _, dropped = read_deduplicated(partition_files(manifest, [week]), columns=[], cache_dir=cache_dir, policy=policy)
+        if dropped:
+            report[week] = {workbook_of[name]: count for name, count in dropped.items()}
+    return report
@@ -0,0 +1,70 @@
+import numpy as np
+import pandas as pd
+
+# Hierarchy levels identifying a space
+SPACE_LEVELS = ['Building Name', 'Floor Name', 'Space Name']
+
+# Columns describing a space; they move from the fact table to the dimension table
+SPACE_COLUMNS = SPACE_LEVELS + ['Space Capacity', 'Time Zone']
+
+
+# Number the distinct spaces of a frame: the first row of each space and each row's space number
+def _distinct_spaces(df):
+    levels = [pd.Categorical(df[column]) for column in SPACE_LEVELS if column in df.columns]
+
+    # Combine the level codes into one integer per row
+    combined = np.zeros(len(df), dtype=np.int64)
+    for level in levels:
+        combined = combined * (len(level.categories) + 1) + level.codes.astype(np.int64) + 1
+    _, first_rows, inverse = np.unique(combined, return_index=True, return_inverse=True)
+    return first_rows, inverse.ravel()
+
+
+# Space dimension table of a frame, indexed by 'Space Key'. Keys are ordered by building,
+# floor and space name, and each space keeps the attributes of its first row.
+def space_table(df):
+    columns = [column for column in SPACE_COLUMNS if column in df.columns]
+    first_rows, _ = _distinct_spaces(df)
+
+    spaces = df.iloc[first_rows][columns].reset_index(drop=True)
+    for column in columns:
+        if isinstance(spaces[column].dtype, pd.CategoricalDtype):
+            spaces[column] = spaces[column].astype(object)
+
+    sort_columns = [column for column in SPACE_LEVELS if column in columns]
+    spaces = spaces.sort_values(sort_columns, key=lambda column: column.astype(str), kind='stable')
+    spaces = spaces.drop_duplicates(sort_columns).reset_index(drop=True)
+    spaces.index.name = 'Space Key'
+    return spaces
+
+
+# Split a fact table into facts keyed by an integer 'Space Key' and a space dimension
+# table indexed by that key. An existing dimension table can be passed so keys stay
+# stable across partitions; rows of spaces missing from it get key -1.
+def split_spaces(df, spaces=None):
+    if spaces is None:
+        spaces = space_table(df)
+    columns = [column for column in SPACE_COLUMNS if column in df.columns]
+    levels = [column for column in SPACE_LEVELS if column in df.columns]
+
+    # Look up the few distinct spaces of the frame, then broadcast their keys to the rows
+    first_rows, inverse = _distinct_spaces(df)
+    distinct = df.iloc[first_rows][levels].astype(object)
+    lookup = pd.MultiIndex.from_frame(spaces[levels].astype(object))
+    keys = lookup.get_indexer(pd.MultiIndex.from_frame(distinct))
+
+    key_type = np.int16 if len(spaces) <= np.iinfo(np.int16).max else np.int32
+    facts = df.drop(columns=columns)
+    facts.insert(0, 'Space Key', keys[inverse].astype(key_type))
+    return facts, spaces
+
+
+# Space key for each space name (names are unique within a dashboard)
+def space_keys_by_name(spaces):
+    return {name: key for key, name in spaces['Space Name'].dropna().items()}
+
+
+# Space names on each floor, in key order
+def rooms_by_floor(spaces):
+    named = spaces.dropna(subset=['Floor Name', 'Space Name'])
+    return {floor: names.tolist() for floor, names in named.groupby('Floor Name', sort=True)['Space Name']}
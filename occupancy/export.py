@@ -0,0 +1,237 @@
+import os
+import tempfile
+import time
+import zipfile
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.csv as pacsv
+import pyarrow.parquet as pq
+
+from occupancy.bins import bin_range
+from occupancy.cache import CACHE_DIR
+from occupancy.cube import build_cube
+from occupancy.dataset import weeks_between
+from occupancy.dedup import read_deduplicated
+from occupancy.dimensions import space_keys_by_name
+from occupancy.loading import TIMESTAMP_SOURCE, load_week, week_files
+from occupancy.metrics import presence_utilization, room_daily_matrix
+from occupancy.timestamps import calendar_dates, local_timestamps, utc_timestamps
+
+# Bulk exports of the room dashboard: raw sensor rows, hourly presence and daily utilization
+# of a set of rooms (of one building, or of all) over a date range, as one CSV or Parquet table
+# or a zip of per-floor CSVs.
+# Tables are produced and written one week at a time, so a multi-month export holds at most a
+# week of rows in memory; the result is written to a file under the cache directory, where
+# exports older than EXPORT_MAX_AGE_HOURS are removed whenever another one is written.
+
+# Directory of prepared exports, and the age after which they are removed
+EXPORT_DIR = os.path.join(CACHE_DIR, 'exports')
+EXPORT_MAX_AGE_HOURS = float(os.environ.get('OCCUPANCY_EXPORT_MAX_AGE_HOURS', '24'))
+
+# Tables that can be exported
+EXPORT_TABLES = ('raw', 'hourly', 'utilization')
+
+# MIME type and file extension of each export format
+EXPORT_FORMATS = {
+    'csv': ('text/csv', '.csv'),
+    'parquet': ('application/vnd.apache.parquet', '.parquet'),
+    'zip': ('application/zip', '.zip'),
+}
+
+# Columns of the raw export, as stored in the week partitions
+RAW_COLUMNS = ['Building Name', 'Floor Name', 'Space Name', 'Space Capacity', 'Local Date', 'Local Time',
+               'Booking Status', 'People Presence', 'Peak People Count']
+
+
+# Schema of each export table, so an export without any rows still has its header
+EXPORT_SCHEMAS = {
+    'raw': pa.schema([('Building Name', pa.string()), ('Floor Name', pa.string()), ('Space Name', pa.string()),
+                      ('Space Capacity', pa.int16()), ('Local Date', pa.date32()), ('Local Time', pa.time32('s')),
+                      ('Booking Status', pa.int8()), ('People Presence', pa.int8()), ('Peak People Count', pa.int16())]),
+    'hourly': pa.schema([('Date', pa.date32()), ('Hour', pa.string()), ('Floor', pa.string()), ('Room', pa.string()),
+                         ('Presence', pa.int8())]),
+    'utilization': pa.schema([('Date', pa.date32()), ('Floor', pa.string()), ('Room', pa.string()),
+                              ('Usage (%)', pa.float64())]),
+}
+
+
+# Dictionary-encoded text columns as plain strings, so chunks of different weeks share one schema
+def _decoded(table):
+    columns = [column.cast(column.type.value_type) if pa.types.is_dictionary(column.type) else column
+               for column in table.columns]
+    return pa.table(columns, names=table.column_names)
+
+
+# Raw rows of the rooms between two dates (inclusive), without duplicates of overlapping exports,
+# one table per week. Rows are kept within the hourly bins of the office hours and dated and timed
+# by the timestamp source like the other tables, so with 'utc' 'Local Date' and 'Local Time' are
+# converted from 'UTC Timestamp' and 'Time Zone'.
+def raw_chunks(manifest, rooms, start_date, end_date, start_minute=9 * 60, end_minute=17 * 60, cache_dir=CACHE_DIR,
+               building=None, timestamp_source=TIMESTAMP_SOURCE):
+    start, end = pd.Timestamp(start_date), pd.Timestamp(end_date)
+    first, last = bin_range(60, start_minute, end_minute)
+    for week in weeks_between(start, end):
+        lo, hi = max(start, pd.Timestamp(week)), min(end, pd.Timestamp(week) + pd.Timedelta(days=6))
+        _, files = week_files(manifest, week, timestamp_source, building)
+        if timestamp_source == 'utc':
+            # Converted dates may fall a day away from 'Local Date', so neighbouring days are read as well
+            table, _ = read_deduplicated(list(files), lo - pd.Timedelta(days=1), hi + pd.Timedelta(days=1), rooms=rooms,
+                                         columns=RAW_COLUMNS + ['UTC Timestamp', 'Time Zone'], include_undated=True,
+                                         cache_dir=cache_dir)
+        else:
+            table, _ = read_deduplicated(list(files), lo, hi, rooms=rooms, columns=RAW_COLUMNS, cache_dir=cache_dir)
+        if table is None or not table.num_rows:
+            continue
+
+        table = _decoded(table)
+        if timestamp_source == 'utc':
+            timestamps = utc_timestamps(table.column('UTC Timestamp').to_numpy(zero_copy_only=False),
+                                        table.column('Time Zone').to_numpy(zero_copy_only=False))
+        else:
+            timestamps = local_timestamps(table.column('Local Date').cast(pa.timestamp('ns')).to_numpy(zero_copy_only=False),
+                                          table.column('Local Time').cast(pa.duration('ns')).to_numpy(zero_copy_only=False))
+        dates = calendar_dates(timestamps)
+        seconds = (timestamps - dates).astype('timedelta64[s]').astype(np.int64)
+        keep = ((dates >= lo.to_datetime64()) & (dates <= hi.to_datetime64())
+                & (seconds >= first * 3600) & (seconds < last * 3600))
+        if not keep.any():
+            continue
+
+        # Dates are written as dates and times as a time of day
+        table = table.filter(pa.array(keep))
+        table = table.set_column(table.column_names.index('Local Time'), 'Local Time',
+                                 pa.array(seconds[keep].astype(np.int32)).cast(pa.time32('s')))
+        yield table.set_column(table.column_names.index('Local Date'), 'Local Date', pa.array(dates[keep], pa.date32()))
+
+
+# Hourly presence matrices of the rooms for the days of the range with readings, one list per
+# week, each built from that week's cube
+def _weekly_matrices(manifest, spaces, rooms, start_date, end_date, start_minute, end_minute, cache_dir, building,
+                     timestamp_source):
+    key_of = space_keys_by_name(spaces)
+    rooms = [room for room in rooms if room in key_of]
+    keys = [key_of[room] for room in rooms]
+    source = manifest if building is None else manifest.get('buildings', {}).get(building, {})
+    dates = pd.DatetimeIndex(source.get('dates', []))
+    dates = dates[(dates >= pd.Timestamp(start_date)) & (dates <= pd.Timestamp(end_date))]
+    for week in weeks_between(start_date, end_date):
+        week_dates = dates[(dates >= pd.Timestamp(week)) & (dates < pd.Timestamp(week) + pd.Timedelta(days=7))]
+        if not len(week_dates) or not rooms:
+            continue
+        _, files = week_files(manifest, week, timestamp_source, building)
+        facts, _ = load_week(files, week, spaces, timestamp_source, cache_dir)
+        if facts is None:
+            continue
+        cube = build_cube(facts, len(spaces))
+        yield [room_daily_matrix(cube, rooms, keys, date, 60, start_minute, end_minute) for date in week_dates]
+
+
+# Room floors of a space table by space name
+def _floors(spaces, rooms):
+    floor_of = dict(zip(spaces['Space Name'], spaces['Floor Name']))
+    return np.array([floor_of.get(room) for room in rooms], dtype=object)
+
+
+# Long-format hourly presence (Date, Hour, Floor, Room, Presence), one table per week
+def hourly_chunks(manifest, spaces, rooms, start_date, end_date, start_minute, end_minute, cache_dir=CACHE_DIR,
+                  building=None, timestamp_source=TIMESTAMP_SOURCE):
+    for matrices in _weekly_matrices(manifest, spaces, rooms, start_date, end_date, start_minute, end_minute,
+                                     cache_dir, building, timestamp_source):
+        tables = []
+        for matrix in matrices:
+            num_rooms, num_hours = matrix.values.shape
+            tables.append(pa.table({
+                'Date': np.full(num_rooms * num_hours, matrix.periods.normalize()[0].to_datetime64()).astype('datetime64[D]'),
+                'Hour': np.tile(matrix.periods.strftime('%H:%M').to_numpy(dtype=object), num_rooms),
+                'Floor': np.repeat(_floors(spaces, matrix.entities), num_hours),
+                'Room': np.repeat(np.array(matrix.entities, dtype=object), num_hours),
+                'Presence': matrix.values.ravel().astype(np.int8),
+            }))
+        yield pa.concat_tables(tables)
+
+
+# Daily presence utilization per room (Date, Floor, Room, Usage (%)), one table per week
+def utilization_chunks(manifest, spaces, rooms, start_date, end_date, start_minute, end_minute, cache_dir=CACHE_DIR,
+                       building=None, timestamp_source=TIMESTAMP_SOURCE):
+    for matrices in _weekly_matrices(manifest, spaces, rooms, start_date, end_date, start_minute, end_minute,
+                                     cache_dir, building, timestamp_source):
+        records = []
+        for matrix in matrices:
+            utilization = presence_utilization(matrix)
+            records += [{'Date': matrix.periods[0].date(), 'Floor': floor, 'Room': room, 'Usage (%)': float(usage)}
+                        for floor, (room, usage) in zip(_floors(spaces, list(utilization)), utilization.items())]
+        yield pa.Table.from_pylist(records)
+
+
+# Write chunks of one table as CSV or Parquet to a binary file object; returns the rows written.
+# The header (or Parquet schema) is written even if there are no chunks.
+def write_chunks(chunks, fileobj, fmt, schema):
+    writer = pq.ParquetWriter(fileobj, schema) if fmt == 'parquet' else pacsv.CSVWriter(fileobj, schema)
+    rows = 0
+    try:
+        for chunk in chunks:
+            writer.write_table(chunk.select(schema.names).cast(schema))
+            rows += chunk.num_rows
+    finally:
+        writer.close()
+    return rows
+
+
+# Chunks of an export table for the given rooms; spaces is the space table of the building, if one is given
+def table_chunks(table, manifest, spaces, rooms, start_date, end_date, start_minute, end_minute, cache_dir=CACHE_DIR,
+                 building=None, timestamp_source=TIMESTAMP_SOURCE):
+    if table == 'raw':
+        return raw_chunks(manifest, rooms, start_date, end_date, start_minute, end_minute, cache_dir, building,
+                          timestamp_source)
+    producer = hourly_chunks if table == 'hourly' else utilization_chunks
+    return producer(manifest, spaces, rooms, start_date, end_date, start_minute, end_minute, cache_dir, building,
+                    timestamp_source)
+
+
+# Remove prepared exports older than max_age_hours, e.g. those of sessions that ended
+def remove_stale_exports(export_dir=EXPORT_DIR, max_age_hours=EXPORT_MAX_AGE_HOURS):
+    if not os.path.isdir(export_dir):
+        return
+    cutoff = time.time() - max_age_hours * 3600
+    for name in os.listdir(export_dir):
+        path = os.path.join(export_dir, name)
+        try:
+            if name.startswith('occupancy-export-') and os.path.getmtime(path) < cutoff:
+                os.remove(path)
+        except OSError:
+            pass
+
+
+# Write an export to a new file under export_dir and return its path, first removing stale
+# exports; the caller may remove it sooner. CSV and Parquet hold the first of the tables; 'zip'
+# holds every table as <floor>/<table>.csv, reading each floor's rooms separately so only one
+# entry is being written at a time.
+def export_to_file(fmt, tables, manifest, spaces, rooms, start_date, end_date, start_minute=9 * 60,
+                   end_minute=17 * 60, cache_dir=CACHE_DIR, building=None, timestamp_source=TIMESTAMP_SOURCE,
+                   export_dir=EXPORT_DIR):
+    options = dict(start_date=start_date, end_date=end_date, start_minute=start_minute, end_minute=end_minute,
+                   cache_dir=cache_dir, building=building, timestamp_source=timestamp_source)
+    remove_stale_exports(export_dir)
+    os.makedirs(export_dir, exist_ok=True)
+    handle, path = tempfile.mkstemp(prefix='occupancy-export-', suffix=EXPORT_FORMATS[fmt][1], dir=export_dir)
+    try:
+        with os.fdopen(handle, 'wb') as f:
+            if fmt != 'zip':
+                write_chunks(table_chunks(tables[0], manifest, spaces, rooms, **options), f, fmt, EXPORT_SCHEMAS[tables[0]])
+                return path
+            floor_of = dict(zip(spaces['Space Name'], spaces['Floor Name']))
+            floors = {}
+            for room in rooms:
+                floors.setdefault(floor_of.get(room, 'Unknown floor'), []).append(room)
+            with zipfile.ZipFile(f, 'w', zipfile.ZIP_DEFLATED) as zf:
+                for floor, floor_rooms in floors.items():
+                    for table in tables:
+                        with zf.open(f"{floor}/{table}.csv", 'w', force_zip64=True) as entry:
+                            write_chunks(table_chunks(table, manifest, spaces, floor_rooms, **options), entry, 'csv',
+                                         EXPORT_SCHEMAS[table])
+        return path
+    except BaseException:
+        os.remove(path)
+        raise
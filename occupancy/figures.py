@@ -0,0 +1,37 @@
+import numpy as np
+import plotly.graph_objects as go
+
+# Plotly figures shared by the dashboards and the benchmarks
+
+
+# Function to create combined heatmap for all rooms; with sub-hourly bins only every tick_step-th bin is labelled
+def create_combined_heatmap(all_room_data, x_label, tick_step=1, title='Combined Room Occupancy', row_height=50):
+    fig = go.Figure()
+
+    # Add heatmap trace; occupancy flags are sent as int8 rather than float64
+    fig.add_trace(go.Heatmap(
+        z=all_room_data.T.to_numpy(dtype=np.int8),
+        x=all_room_data.index,
+        y=all_room_data.columns,
+        colorscale='YlOrRd',
+        showscale=False,
+        hoverongaps=False,
+        hovertemplate='Room: %{y}<br>Time: %{x}<br>Occupied: %{z}<extra></extra>'
+    ))
+
+    # Update layout
+    fig.update_layout(
+        title=title,
+        xaxis_title=x_label,
+        yaxis_title='Rooms',
+        height=max(400, row_height * len(all_room_data.columns) + 100),
+        xaxis=dict(
+            tickmode='array',
+            tickvals=all_room_data.index[::tick_step],
+            ticktext=all_room_data.index[::tick_step].strftime('%H:%M') if x_label == "Time of Day" else ['Mon', 'Tue', 'Wed', 'Thu', 'Fri'],
+            tickangle=45
+        ),
+        yaxis=dict(autorange="reversed")
+    )
+
+    return fig
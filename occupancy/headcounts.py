@@ -0,0 +1,180 @@
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+
+from occupancy.dedup import key_hashes
+from occupancy.dimensions import SPACE_LEVELS
+
+# Headcount histograms of 'Peak People Count' for capacity right-sizing. Headcounts are small
+# integers, so instead of an approximate quantile sketch (t-digest, KLL) each room-day keeps
+# the exact number of its readings at each headcount ('Peak Counts', index = people). Merging
+# histograms is adding them, and percentiles of any range are exact, never rereading the raw
+# rows. Each room-day also keeps the minutes observed and occupied (by 'People Presence'),
+# each reading lasting until the next one of the day.
+# Histograms are written per workbook at ingestion, one per room, day and hour so exports that
+# share a day are de-duplicated hour by hour.
+
+# Partition holding the per room-day headcount histograms of a workbook
+PEAKS_PARTITION = 'peaks'
+
+# Columns the histogram key and the 'max_presence' policy read
+PEAK_KEY_COLUMNS = SPACE_LEVELS + ['Local Date', 'Hour', 'Readings']
+
+# Percentiles of the right-sizing report
+PERCENTILES = (50, 90, 99)
+
+# Longest time a reading counts for: gaps in the readings are not counted as observed
+MAX_READING_MINUTES = 60
+
+
+# Minutes each reading lasts: until the next reading of the same group, and the group's typical
+# spacing for its last reading, at most MAX_READING_MINUTES
+def _reading_minutes(times, groups):
+    minutes = pd.Series(times / pd.Timedelta(minutes=1), index=times.index)
+    gaps = -minutes.groupby(groups).diff(-1)
+    typical = gaps.groupby(groups).transform('median')
+    return gaps.fillna(typical).fillna(MAX_READING_MINUTES).clip(0, MAX_READING_MINUTES).to_numpy()
+
+
+# Per space, day and hour counts of readings by 'Peak People Count', the number of readings and
+# the minutes observed and occupied
+def peak_histograms(table):
+    levels = [column for column in SPACE_LEVELS if column in table.column_names]
+    df = table.select(levels + ['Local Date', 'Local Time', 'People Presence', 'Peak People Count']).to_pandas()
+    df = df[df['Local Date'].notna() & df['Local Time'].notna()].sort_values(levels + ['Local Date', 'Local Time'])
+
+    # Readings last until the next one of the room-day, even across hours
+    days = df.groupby(levels + ['Local Date'], observed=True, dropna=False, sort=True).ngroup().to_numpy()
+    minutes = _reading_minutes(df['Local Time'], days)
+
+    df['Hour'] = (df['Local Time'] // pd.Timedelta(hours=1)).clip(0, 23).astype(np.int8)
+    groups = df.groupby(levels + ['Local Date', 'Hour'], observed=True, dropna=False, sort=True)
+    rows = groups.ngroup().to_numpy()
+    histograms = groups.size().reset_index(name='Readings')
+
+    # Time observed and occupied, weighting each reading by how long it lasts
+    presence = df['People Presence'].to_numpy(dtype=np.float64, na_value=np.nan)
+    histograms['Observed Minutes'] = np.bincount(rows, np.where(np.isnan(presence), 0, minutes), len(histograms))
+    histograms['Occupied Minutes'] = np.bincount(rows, np.where(presence > 0, minutes, 0), len(histograms))
+
+    # Readings by headcount; each list stops at the room-day's highest headcount
+    has_peak = df['Peak People Count'].notna().to_numpy()
+    peaks = np.maximum(df['Peak People Count'].to_numpy(dtype=np.float64, na_value=0).astype(np.int64), 0)
+    counts = np.zeros((len(histograms), int(peaks.max()) + 1 if len(peaks) else 1), dtype=np.int32)
+    np.add.at(counts, (rows[has_peak], peaks[has_peak]), 1)
+    lengths = counts.shape[1] - np.argmax(counts[:, ::-1] > 0, axis=1)
+    offsets = np.concatenate([[0], np.cumsum(lengths)]).astype(np.int32)
+    values = counts[np.arange(counts.shape[1]) < lengths[:, None]]
+
+    for column in levels:
+        histograms[column] = histograms[column].astype(object)
+    histograms['Readings'] = histograms['Readings'].astype(np.int32)
+    histograms = pa.Table.from_pandas(histograms, preserve_index=False)
+    return histograms.append_column('Peak Counts', pa.ListArray.from_arrays(pa.array(offsets), pa.array(values, pa.int32())))
+
+
+# Histogram keys: space, day and hour
+def histogram_hashes(table):
+    return key_hashes(table, SPACE_LEVELS + ['Local Date', 'Hour'])
+
+
+# Preference of histograms under 'max_presence': the room-day hour with the most readings
+def histogram_scores(table):
+    return pc.fill_null(table.column('Readings').cast(pa.int64()), 0).to_numpy()
+
+
+# Percentiles (nearest rank) of merged histograms, one row per histogram; NaN where a histogram
+# is empty. Only occupied readings (headcount above 0) count unless occupied_only is False.
+def histogram_percentiles(counts, percentiles=PERCENTILES, occupied_only=True):
+    counts = np.array(counts, dtype=np.int64, ndmin=2)
+    if occupied_only:
+        counts[:, 0] = 0
+    cumulative = counts.cumsum(axis=1)
+    total = cumulative[:, -1]
+    ranks = np.ceil(np.outer(total, percentiles) / 100).clip(min=1)
+    values = (cumulative[:, None, :] < ranks[:, :, None]).sum(axis=2).astype(np.float64)
+    return np.where(total[:, None] > 0, values, np.nan)
+
+
+# Highest headcount of each histogram; NaN where a histogram is empty
+def histogram_max(counts):
+    counts = np.array(counts, dtype=np.int64, ndmin=2)
+    highest = counts.shape[1] - 1 - np.argmax(counts[:, ::-1] > 0, axis=1)
+    return np.where(counts.sum(axis=1) > 0, highest, np.nan)
+
+
+# Headcount histograms and minutes of every room-day, as dense arrays sorted by day
+@dataclass
+class PeakHistograms:
+    num_spaces: int
+    keys: np.ndarray
+    days: np.ndarray
+    counts: np.ndarray
+    observed_minutes: np.ndarray
+    occupied_minutes: np.ndarray
+
+    # Sum of per room-day values per space key over [start_date, end_date]; unknown keys get zeros
+    def _merge(self, values, keys, start_date, end_date):
+        keys = np.asarray(keys, dtype=np.int64)
+        lo = np.searchsorted(self.days, np.datetime64(pd.Timestamp(start_date).date(), 'D'), 'left')
+        hi = np.searchsorted(self.days, np.datetime64(pd.Timestamp(end_date).date(), 'D'), 'right')
+
+        position = np.full(self.num_spaces, -1, dtype=np.int64)
+        known = (keys >= 0) & (keys < self.num_spaces)
+        position[keys[known]] = np.flatnonzero(known)
+        rows = position[self.keys[lo:hi]]
+        selected = rows >= 0
+
+        out = np.zeros((len(keys),) + values.shape[1:], dtype=values.dtype)
+        np.add.at(out, rows[selected], values[lo:hi][selected])
+        return out
+
+    # Merged histogram per space key over [start_date, end_date]
+    def histograms(self, keys, start_date, end_date):
+        return self._merge(self.counts.astype(np.int64), keys, start_date, end_date)
+
+    # Share of observed minutes with presence (percent) per space key; NaN where nothing was observed
+    def occupied_share(self, keys, start_date, end_date):
+        occupied = self._merge(self.occupied_minutes, keys, start_date, end_date)
+        observed = self._merge(self.observed_minutes, keys, start_date, end_date)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return np.where(observed > 0, occupied * 100.0 / observed, np.nan)
+
+
+# Build the dense histograms from peak histograms keyed by 'Space Key' (see peak_histograms and
+# split_spaces); the hours of a room-day are summed when merged
+def build_peak_histograms(histograms, num_spaces):
+    keys = histograms['Space Key'].to_numpy().astype(np.int64)
+    days = histograms['Local Date'].to_numpy().astype('datetime64[D]')
+    lists = histograms['Peak Counts'].to_numpy()
+    valid = (keys >= 0) & ~np.isnat(days)
+
+    lengths = np.array([len(values) for values in lists], dtype=np.int64)
+    counts = np.zeros((len(lists), max(lengths.max(initial=0), 1)), dtype=np.int32)
+    if len(lists):
+        counts[np.arange(counts.shape[1]) < lengths[:, None]] = np.concatenate(list(lists))
+
+    order = np.argsort(days[valid], kind='stable')
+    minutes = [histograms[column].to_numpy(dtype=np.float64)[valid][order] for column in ('Observed Minutes', 'Occupied Minutes')]
+    return PeakHistograms(num_spaces, keys[valid][order], days[valid][order], counts[valid][order], *minutes)
+
+
+# Right-sizing table of rooms: capacity, share of observed time occupied and percentiles and
+# maximum of the headcount while occupied, against capacity
+def rightsizing_frame(rooms, capacities, counts, occupied_share, percentiles=PERCENTILES):
+    counts = np.array(counts, dtype=np.int64, ndmin=2)
+    capacities = np.asarray(capacities, dtype=np.float64)
+    values = histogram_percentiles(counts, percentiles)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        frame = pd.DataFrame({
+            'Room': list(rooms),
+            'Capacity': capacities,
+            'Occupied (%)': np.asarray(occupied_share, dtype=np.float64),
+            **{f'p{p}': values[:, i] for i, p in enumerate(percentiles)},
+            'Max': histogram_max(counts),
+        })
+        frame[f'p{percentiles[-1]} of Capacity (%)'] = np.where(capacities > 0, values[:, -1] * 100 / capacities, np.nan)
+    return frame
@@ -0,0 +1,70 @@
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+
+# Day number (days since 1970-01-01) of a date-like value
+def _day(date):
+    return np.datetime64(pd.Timestamp(date).date(), 'D').astype(np.int64)
+
+
+# Row order that sorts a timestamp-indexed frame by (key, date, time)
+def sort_order(df, key_column):
+    codes = pd.Categorical(df[key_column]).codes
+    timestamps = df.index.values.astype('datetime64[ns]').view(np.int64)
+    return np.lexsort((timestamps, codes))
+
+
+# Sort a timestamp-indexed frame by (key, date, time), as expected by build_index
+def sort_rows(df, key_column):
+    order = sort_order(df, key_column)
+    if (order == np.arange(len(order))).all():
+        return df
+    return df.iloc[order]
+
+
+# Secondary index over a frame sorted by (key, date, time). Rows of one key are the
+# contiguous block offsets[i]:offsets[i + 1]; dates within the block are searched with
+# searchsorted, so lookups return slices of the frame instead of scanning it.
+@dataclass
+class SortedIndex:
+    frame: pd.DataFrame
+    keys: pd.Index
+    offsets: np.ndarray
+    days: np.ndarray
+
+    # Row bounds of a key (empty for unknown keys)
+    def bounds(self, key, start_date=None, end_date=None):
+        try:
+            position = self.keys.get_loc(key)
+        except KeyError:
+            return 0, 0
+        lo, hi = int(self.offsets[position]), int(self.offsets[position + 1])
+        if start_date is not None:
+            end_date = start_date if end_date is None else end_date
+            days = self.days[lo:hi]
+            lo, hi = (lo + int(np.searchsorted(days, _day(start_date), 'left')),
+                      lo + int(np.searchsorted(days, _day(end_date), 'right')))
+        return lo, hi
+
+    # Rows of a key, optionally restricted to dates in [start_date, end_date]
+    def rows(self, key, start_date=None, end_date=None):
+        lo, hi = self.bounds(key, start_date, end_date)
+        return self.frame.iloc[lo:hi]
+
+    # Row positions of several keys over [start_date, end_date], with the position of each row's key in keys
+    def positions(self, keys, start_date=None, end_date=None):
+        bounds = [self.bounds(key, start_date, end_date) for key in keys]
+        rows = np.concatenate([np.arange(lo, hi) for lo, hi in bounds] + [np.empty(0, dtype=np.int64)])
+        groups = np.repeat(np.arange(len(bounds)), [hi - lo for lo, hi in bounds])
+        return rows.astype(np.int64), groups
+
+
+# Build the index for a timestamp-indexed frame, sorting it by (key, date, time) if needed
+def build_index(df, key_column):
+    df = sort_rows(df, key_column)
+    keys = pd.Categorical(df[key_column])
+    offsets = np.searchsorted(keys.codes, np.arange(len(keys.categories) + 1), 'left')
+    days = df.index.values.astype('datetime64[ns]').astype('datetime64[D]').view(np.int64)
+    return SortedIndex(df, pd.Index(keys.categories, dtype=object), offsets, days)
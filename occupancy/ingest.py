@@ -0,0 +1,134 @@
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from multiprocessing import get_context
+
+import pyarrow as pa
+
+from occupancy.cache import CACHE_DIR, file_key, has_entry, read_entry, remove_entries, write_entry
+from occupancy.dataset import partition_by_building, partition_by_week
+from occupancy.dedup import DEDUP_POLICY, duplicate_report
+from occupancy.headcounts import PEAKS_PARTITION, peak_histograms
+from occupancy.manifest import build_manifest, manifest_changes, manifest_path, read_manifest, summarize_table, write_manifest
+from occupancy.rollup import HOURS_PARTITION, hour_flags
+from occupancy.xlsx_reader import EXPORT_COLUMNS, read_export
+
+# Export columns used by the dashboards; the rest of each workbook is never decoded
+WORKBOOK_COLUMNS = ['Building Name', 'Floor Name', 'Space Name', 'Space Capacity', 'Local Date', 'Local Time',
+                    'Booking Status', 'People Presence', 'Peak People Count', 'UTC Timestamp', 'Time Zone']
+
+# Narrow Arrow types for small integer columns; text columns are dictionary-encoded
+COLUMN_TYPES = {
+    'Space Capacity': pa.int16(),
+    'Booking Status': pa.int8(),
+    'People Presence': pa.int8(),
+    'Peak People Count': pa.int16(),
+}
+
+# Worker processes used to parse workbooks (unset or 0 uses every core, 1 disables the pool)
+MAX_WORKERS = int(os.environ.get('OCCUPANCY_INGEST_WORKERS', '0')) or None
+
+
+# Convert a typed column from the export reader to an Arrow array
+def _to_arrow(name, values, kind):
+    if kind == 'str':
+        return pa.array(values, type=pa.string(), from_pandas=True).dictionary_encode()
+    if kind == 'date':
+        return pa.array(values.astype('datetime64[ns]'))
+    array = pa.array(values, from_pandas=True)
+    return array.cast(COLUMN_TYPES[name]) if name in COLUMN_TYPES else array
+
+
+# Parse one weekly workbook into an Arrow table
+def read_workbook(path, columns=WORKBOOK_COLUMNS):
+    arrays = read_export(path, columns)
+    return pa.table({name: _to_arrow(name, arrays[name], EXPORT_COLUMNS[name]) for name in columns})
+
+
+# Parse a workbook and store it in the cache as week partitions, hour flags and headcount histograms of
+# each building, plus a summary; runs in a worker process, so only the Arrow IPC files cross the process boundary
+def ingest_workbook(path, key, cache_dir=CACHE_DIR):
+    table = read_workbook(path)
+    partitions = {}
+    for building, rows in partition_by_building(table).items():
+        partitions.update({f"{building}/{week}": part for week, part in partition_by_week(rows).items()})
+        partitions[f"{building}/{HOURS_PARTITION}"] = hour_flags(rows)
+        partitions[f"{building}/{PEAKS_PARTITION}"] = peak_histograms(rows)
+    write_entry(cache_dir, path, key, partitions, summarize_table(table))
+
+
+# Parse the given workbooks into the cache, one workbook per task across a process pool
+def _ingest_all(paths, keys, cache_dir, max_workers):
+    errors = {}
+    workers = min(max_workers or os.cpu_count() or 1, len(paths))
+    if workers <= 1:
+        for path in paths:
+            try:
+                ingest_workbook(path, keys[path], cache_dir)
+            except Exception as e:
+                errors[path] = e
+        return errors
+
+    # Spawned workers avoid forking the Streamlit server and its threads
+    with ProcessPoolExecutor(max_workers=workers, mp_context=get_context('spawn')) as pool:
+        futures = {pool.submit(ingest_workbook, path, keys[path], cache_dir): path for path in paths}
+        for future in as_completed(futures):
+            try:
+                future.result()
+            except Exception as e:
+                errors[futures[future]] = e
+    return errors
+
+
+# Cache keys of the given workbooks, parsing new or changed ones into the cache
+def _refresh_entries(paths, cache_dir, hash_contents, max_workers):
+    errors = {}
+    keys = {}
+    for path in paths:
+        try:
+            keys[path] = file_key(path, hash_contents)
+        except OSError as e:
+            errors[path] = e
+
+    stale = [path for path in keys if not has_entry(cache_dir, path, keys[path])]
+    if stale:
+        errors.update(_ingest_all(stale, keys, cache_dir, max_workers))
+    return {path: key for path, key in keys.items() if path not in errors}, errors
+
+
+# Bring the manifest of a folder of workbooks up to date and return it. Only new or
+# changed workbooks are parsed; the others keep their manifest entry. Any change bumps the
+# manifest version, removes the cached partitions of workbooks no longer in paths and
+# recounts the duplicate rows of the weeks it touched.
+def update_manifest(folder_path, paths, cache_dir=CACHE_DIR, hash_contents=False, max_workers=MAX_WORKERS):
+    path = manifest_path(folder_path, cache_dir)
+    manifest = read_manifest(path)
+    known = manifest.get('workbooks', {})
+    keys, errors = _refresh_entries(paths, cache_dir, hash_contents, max_workers)
+
+    workbooks = {}
+    for workbook, key in keys.items():
+        if known.get(workbook, {}).get('key') == key:
+            workbooks[workbook] = known[workbook]
+            continue
+        try:
+            workbooks[workbook] = {'key': key, 'modified': os.stat(workbook).st_mtime_ns, **read_entry(cache_dir, workbook, key)}
+        except Exception as e:
+            errors[workbook] = e
+
+    same_policy = manifest.get('dedup_policy') == DEDUP_POLICY
+    if workbooks != known or not manifest or not same_policy:
+        changes = manifest_changes(known, workbooks)
+        for removed in changes['removed']:
+            if removed not in errors:
+                remove_entries(cache_dir, removed)
+        previous = manifest
+        manifest = build_manifest(workbooks, previous.get('version', 0) + 1, changes)
+
+        # Duplicates only change in the weeks of changed workbooks, unless the policy changed
+        weeks = set(changes['weeks']) if same_policy else set(manifest['weeks'])
+        duplicates = {week: counts for week, counts in previous.get('duplicates', {}).items()
+                      if week not in weeks and week in manifest['weeks']}
+        duplicates.update(duplicate_report(manifest, sorted(weeks & set(manifest['weeks'])), cache_dir))
+        manifest.update(dedup_policy=DEDUP_POLICY, duplicates=dict(sorted(duplicates.items())))
+        write_manifest(path, manifest)
+    return manifest, [(workbook, errors[workbook]) for workbook in paths if workbook in errors]
@@ -0,0 +1,117 @@
+import os
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+from occupancy.cache import CACHE_DIR
+from occupancy.dataset import UNDATED, partition_files, weeks_between
+from occupancy.dedup import DEDUP_POLICY, read_deduplicated
+from occupancy.dimensions import split_spaces
+from occupancy.index import sort_rows
+from occupancy.timestamps import calendar_dates, local_timestamps, utc_timestamps, week_starts
+
+# Build timestamps from 'Local Date' + 'Local Time' ('local') or from 'UTC Timestamp' + 'Time Zone' ('utc')
+TIMESTAMP_SOURCES = ('local', 'utc')
+TIMESTAMP_SOURCE = os.environ.get('OCCUPANCY_TIMESTAMP_SOURCE', 'local')
+
+# Fact columns read from the week partitions
+FACT_COLUMNS = ['Building Name', 'Floor Name', 'Space Name', 'Local Date', 'Local Time', 'People Presence', 'Peak People Count']
+
+
+# Values that could not be parsed while loading, which the dashboards turn into warnings, and
+# readings dropped as duplicates of overlapping exports
+@dataclass
+class LoadReport:
+    unparsed_timestamps: int = 0
+    unparsed_dates: int = 0
+    duplicate_rows: int = 0
+
+
+# Week start of a date and the partition files load_week reads for it, of one building or all of
+# them; the files carry the workbooks' cache keys, so they also identify the version of that week's data
+def week_files(manifest, date, timestamp_source=TIMESTAMP_SOURCE, building=None):
+    week = weeks_between(date)[0]
+    if timestamp_source == 'utc':
+        weeks = weeks_between(pd.Timestamp(week) - pd.Timedelta(days=1), pd.Timestamp(week) + pd.Timedelta(days=7)) + [UNDATED]
+    else:
+        weeks = weeks_between(week)
+    return week, tuple(partition_files(manifest, weeks, None if building is None else [building]))
+
+
+# Load the fact rows of one week (Monday week_start) from its partition files: timestamp-indexed,
+# keyed by the 'Space Key' of the given space table and sorted by (space, date, time). Readings
+# repeated by overlapping exports are resolved by the de-duplication policy.
+# Returns (None, report) if there is nothing to read.
+def load_week(files, week_start, spaces, timestamp_source=TIMESTAMP_SOURCE, cache_dir=CACHE_DIR, policy=DEDUP_POLICY):
+    start_date = pd.Timestamp(week_start)
+    end_date = start_date + pd.Timedelta(days=6)
+    if timestamp_source == 'utc':
+        # Converted dates may fall a day away from 'Local Date', so neighbouring days are read as well
+        table, dropped = read_deduplicated(list(files), start_date - pd.Timedelta(days=1), end_date + pd.Timedelta(days=1),
+                                           columns=FACT_COLUMNS + ['UTC Timestamp', 'Time Zone'], include_undated=True,
+                                           cache_dir=cache_dir, policy=policy)
+    else:
+        table, dropped = read_deduplicated(list(files), start_date, end_date, columns=FACT_COLUMNS,
+                                           cache_dir=cache_dir, policy=policy)
+
+    report = LoadReport(duplicate_rows=sum(dropped.values()))
+    if table is None:
+        return None, report
+    df = table.to_pandas()
+
+    # Timestamps, calendar dates and week starts are derived with datetime64 arithmetic only
+    if timestamp_source == 'utc':
+        timestamps = utc_timestamps(df['UTC Timestamp'], df['Time Zone'])
+        dates = calendar_dates(timestamps)
+    else:
+        timestamps = local_timestamps(df['Local Date'], df['Local Time'])
+        dates = calendar_dates(df['Local Date'])
+    report.unparsed_timestamps = int(np.isnat(timestamps).sum())
+    report.unparsed_dates = int(np.isnat(dates).sum())
+
+    if timestamp_source == 'utc':
+        # Keep only the readings whose converted date falls in the week
+        in_week = (dates >= start_date.to_datetime64()) & (dates <= end_date.to_datetime64())
+        df, timestamps, dates = df[in_week], timestamps[in_week], dates[in_week]
+        if df.empty:
+            return None, report
+
+    df.index = pd.DatetimeIndex(timestamps, name='timestamp')
+    df['Local Date'] = dates.astype('datetime64[ns]')
+    df['Week Start'] = week_starts(dates).astype('datetime64[ns]')
+
+    # Ensure 'People Presence' is binary
+    df['People Presence'] = df['People Presence'].astype('int8')
+
+    # Only the derived timestamp index is used from here on
+    df = df.drop(columns=['Local Time', 'UTC Timestamp'], errors='ignore')
+
+    # Building, floor, space and capacity live in the dimension table; facts keep only the space key
+    df, _ = split_spaces(df, spaces)
+
+    # Keep rows sorted by (Space, Date, Time) so per-room lookups are slices
+    return sort_rows(df, 'Space Key'), report
+
+
+# Load a cleaned floor-level sensor CSV ('Local Date', 'Local Hour', 'Local Minute', ...) indexed by timestamp
+def load_sensor_csv(file_path):
+    df = pd.read_csv(file_path)
+    report = LoadReport()
+
+    # Combine date, hour and minute into a timestamp
+    dates = pd.to_datetime(df['Local Date'], format='%Y-%m-%d', errors='coerce')
+    hours = pd.to_numeric(df['Local Hour'], errors='coerce')
+    minutes = pd.to_numeric(df['Local Minute'], errors='coerce')
+    timestamps = dates + pd.to_timedelta(hours * 60 + minutes, unit='m')
+    report.unparsed_timestamps = int(timestamps.isna().sum())
+    report.unparsed_dates = int(dates.isna().sum())
+
+    df['Local Hour'] = hours.astype('Int64')
+    df['Local Minute'] = minutes.astype('Int64')
+    df.index = pd.DatetimeIndex(timestamps, name='timestamp')
+
+    # 'Local Date' and 'Week Start' (Monday) as datetime.date
+    df['Local Date'] = dates.dt.date.to_numpy()
+    df['Week Start'] = pd.Series(week_starts(dates.to_numpy())).dt.date.to_numpy()
+    return df, report
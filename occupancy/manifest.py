@@ -0,0 +1,144 @@
+import hashlib
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+from occupancy.cache import CACHE_DIR, source_id
+from occupancy.dimensions import SPACE_COLUMNS, space_table
+from occupancy.timestamps import week_starts
+
+# Bump when the manifest layout changes so old manifests are rebuilt
+MANIFEST_SCHEMA = 5
+
+# Small JSON summary of a folder of workbooks: the dates, weeks, spaces and week partitions
+# of each cached workbook plus their union. Dashboards fill their widgets from it and load
+# fact data only for the partitions covering the current selection; 'buildings' holds the
+# dates, weeks, time zones and space fingerprint of each building. Each rebuild bumps
+# 'version' and records which workbooks and weeks changed; 'duplicates' counts the rows of
+# each workbook dropped as duplicates of other exports, per week.
+
+
+# Path of the manifest for a folder of workbooks
+def manifest_path(folder_path, cache_dir=CACHE_DIR):
+    return os.path.join(cache_dir, f"manifest-{source_id(folder_path)}.json")
+
+
+# Read a manifest, or return an empty one if it is missing, unreadable or outdated
+def read_manifest(path):
+    try:
+        with open(path, encoding='utf-8') as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    return manifest if manifest.get('schema') == MANIFEST_SCHEMA else {}
+
+
+# Write a manifest atomically
+def write_manifest(path, manifest):
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f)
+    os.replace(tmp, path)
+
+
+# ISO strings of the distinct dates in a datetime64 array
+def _iso_dates(dates):
+    dates = np.unique(np.asarray(dates, dtype='datetime64[D]'))
+    return [str(date) for date in dates[~np.isnat(dates)]]
+
+
+# JSON records of a space table (NaN and NA become null)
+def _space_records(spaces):
+    spaces = spaces.astype(object).where(spaces.notna(), None)
+    return spaces.to_dict('records')
+
+
+# Summarise a workbook table: its calendar dates (overall and per building), rows without a
+# date and the spaces it reports on
+def summarize_table(table):
+    columns = [column for column in SPACE_COLUMNS + ['Local Date'] if column in table.column_names]
+    df = table.select(columns).to_pandas()
+    building_dates = {}
+    if 'Building Name' in df.columns:
+        building_dates = {str(building): _iso_dates(dates.to_numpy())
+                          for building, dates in df.groupby('Building Name', observed=True)['Local Date']}
+    return {
+        'dates': _iso_dates(df['Local Date'].to_numpy()),
+        'building_dates': building_dates,
+        'undated_rows': int(df['Local Date'].isna().sum()),
+        'spaces': _space_records(space_table(df)),
+    }
+
+
+# Fingerprint of a space table's records; space keys (row positions) are stable while it is unchanged
+def spaces_id(records):
+    return hashlib.blake2b(json.dumps(records, sort_keys=True, default=str).encode('utf-8'), digest_size=8).hexdigest()
+
+
+# Workbooks added, changed and removed between two sets of workbook summaries, and the week
+# partitions they touched (before or after the change)
+def manifest_changes(known, workbooks):
+    added = sorted(path for path in workbooks if path not in known)
+    removed = sorted(path for path in known if path not in workbooks)
+    changed = sorted(path for path in workbooks if path in known and known[path].get('key') != workbooks[path].get('key'))
+    partitions = {key.rpartition('/')[2] for path in added + changed + removed
+                  for summary in (known.get(path), workbooks.get(path)) if summary for key in summary.get('partitions', {})}
+    return {
+        'added': added,
+        'changed': changed,
+        'removed': removed,
+        'weeks': sorted(partition.split('=', 1)[1] for partition in partitions if partition.startswith('week=')),
+    }
+
+
+# Dates, weeks, time zones and space fingerprint of each building of a set of workbook summaries
+def _buildings(workbooks, space_records):
+    buildings = {}
+    for summary in workbooks.values():
+        for building, dates in summary.get('building_dates', {}).items():
+            buildings.setdefault(building, set()).update(dates)
+    result = {}
+    for building, dates in sorted(buildings.items()):
+        dates = np.array(sorted(dates), dtype='datetime64[D]')
+        records = [record for record in space_records if record['Building Name'] == building]
+        result[building] = {
+            'dates': _iso_dates(dates),
+            'weeks': _iso_dates(week_starts(dates)),
+            'time_zones': sorted({record['Time Zone'] for record in records if record.get('Time Zone')}),
+            'spaces_id': spaces_id(records),
+        }
+    return result
+
+
+# Build a manifest from the summaries of each workbook, keyed by path
+def build_manifest(workbooks, version=1, changes=None):
+    dates = np.array(sorted({date for summary in workbooks.values() for date in summary['dates']}), dtype='datetime64[D]')
+    records = [record for summary in workbooks.values() for record in summary['spaces']]
+    spaces = space_table(pd.DataFrame.from_records(records, columns=SPACE_COLUMNS)) if records else pd.DataFrame(columns=SPACE_COLUMNS)
+    space_records = _space_records(spaces)
+    return {
+        'schema': MANIFEST_SCHEMA,
+        'version': version,
+        'changes': changes or manifest_changes({}, workbooks),
+        'workbooks': workbooks,
+        'dates': _iso_dates(dates),
+        'weeks': _iso_dates(week_starts(dates)),
+        'undated_rows': sum(summary.get('undated_rows', 0) for summary in workbooks.values()),
+        'spaces': space_records,
+        'spaces_id': spaces_id(space_records),
+        'buildings': _buildings(workbooks, space_records),
+    }
+
+
+# Space dimension table of a manifest, indexed by 'Space Key'; for one building, only its spaces
+# with keys of their own (as the building's shards are loaded with), fingerprinted by its 'spaces_id'
+def manifest_spaces(manifest, building=None):
+    records = manifest.get('spaces', [])
+    if building is not None:
+        records = [record for record in records if record['Building Name'] == building]
+    spaces = pd.DataFrame.from_records(records, columns=SPACE_COLUMNS)
+    spaces.index.name = 'Space Key'
+    return spaces
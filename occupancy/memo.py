@@ -0,0 +1,91 @@
+import os
+import sys
+import threading
+from collections import OrderedDict
+from dataclasses import fields, is_dataclass
+
+import numpy as np
+import pandas as pd
+
+# Memory budget of the dashboards' figure and aggregate cache, in megabytes
+FIGURE_CACHE_MB = float(os.environ.get('OCCUPANCY_FIGURE_CACHE_MB', '256'))
+
+
+# Rough in-memory size of a cached value: array buffers, frames, Plotly figures, dataclasses (such
+# as OccupancyMatrix) and containers of them
+def estimate_size(value):
+    if isinstance(value, np.ndarray):
+        return value.nbytes
+    if isinstance(value, (pd.DataFrame, pd.Series, pd.Index)):
+        return int(np.sum(value.memory_usage(deep=True)))
+    if is_dataclass(value) and not isinstance(value, type):
+        return sys.getsizeof(value) + sum(estimate_size(getattr(value, field.name)) for field in fields(value))
+    if hasattr(value, 'to_plotly_json'):
+        return estimate_size(value.to_plotly_json())
+    if isinstance(value, dict):
+        return sys.getsizeof(value) + sum(estimate_size(k) + estimate_size(v) for k, v in value.items())
+    if isinstance(value, (list, tuple)):
+        return sys.getsizeof(value) + sum(estimate_size(item) for item in value)
+    return sys.getsizeof(value)
+
+
+# Least recently used cache with a memory budget, shared by every session of a dashboard.
+# Keys should identify the dataset version and the whole selection a value was built from.
+class LRUCache:
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    # Cached value of a key (marking it most recently used), or default
+    def get(self, key, default=None):
+        with self._lock:
+            if key not in self._entries:
+                self.misses += 1
+                return default
+            self.hits += 1
+            self._entries.move_to_end(key)
+            return self._entries[key][0]
+
+    # Store a value, evicting least recently used entries until it fits; values larger than the budget are not kept
+    def put(self, key, value, size=None):
+        size = estimate_size(value) if size is None else size
+        with self._lock:
+            if key in self._entries:
+                self.size -= self._entries.pop(key)[1]
+            if size > self.max_bytes:
+                return
+            while self._entries and self.size + size > self.max_bytes:
+                _, (_, evicted) = self._entries.popitem(last=False)
+                self.size -= evicted
+                self.evictions += 1
+            self._entries[key] = (value, size)
+            self.size += size
+
+    # Cached value of a key, computing and storing it on a miss. Computation runs outside
+    # the lock, so concurrent sessions may occasionally build the same value twice.
+    def get_or_compute(self, key, compute):
+        missing = object()
+        value = self.get(key, missing)
+        if value is missing:
+            value = compute()
+            self.put(key, value)
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.size = 0
+
+    # Hit, miss and eviction counters plus current usage
+    def stats(self):
+        with self._lock:
+            return {'hits': self.hits, 'misses': self.misses, 'evictions': self.evictions,
+                    'entries': len(self._entries), 'bytes': self.size, 'max_bytes': self.max_bytes}
@@ -0,0 +1,95 @@
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+from occupancy.bins import bin_starts, binned_max, daily_max
+
+# Side-effect free daily/weekly occupancy matrices and utilization shared by both dashboards.
+# Inputs are the cube (rooms) or the sorted index (floors); results are plain arrays, so they
+# can be cached, computed in worker processes or benchmarked outside Streamlit.
+
+
+# Entities (rooms or floors) x periods (time bins or days) of occupancy values
+@dataclass
+class OccupancyMatrix:
+    entities: list
+    periods: pd.DatetimeIndex
+    values: np.ndarray
+
+    # Periods x entities frame, as plotted by the dashboards
+    def frame(self):
+        return pd.DataFrame(self.values.T, index=self.periods, columns=self.entities)
+
+    # Values of one entity by name
+    def row(self, entity):
+        return self.values[self.entities.index(entity)]
+
+
+# Weekdays shown from a week start (Monday to Friday)
+def workdays(week_start, days=5):
+    return pd.date_range(start=pd.Timestamp(week_start).normalize(), periods=days, freq='D')
+
+
+# Presence per room and time bin on one day, sliced out of the cube; bins without readings count as unoccupied
+def room_daily_matrix(cube, rooms, keys, date, bin_minutes, start_minute, end_minute):
+    binned = cube.binned_presence(keys, date, bin_minutes, start_minute, end_minute)
+    return OccupancyMatrix(list(rooms), bin_starts(date, bin_minutes, start_minute, end_minute), np.maximum(binned, 0))
+
+
+# Daily max presence per room over the working days of a week. Only rooms with readings
+# during the week are kept; days without readings count as unoccupied.
+def room_weekly_matrix(cube, rooms, keys, week_start, days=5):
+    daily = cube.daily_presence(keys, week_start, days)
+    has_data = (daily >= 0).any(axis=1)
+    return OccupancyMatrix([room for room, keep in zip(rooms, has_data) if keep], workdays(week_start, days),
+                           np.maximum(daily[has_data], 0))
+
+
+# Max of a column per floor and time bin on one day, binned for all floors at once from the
+# sorted index; bins without readings count as empty
+def floor_daily_matrix(index, floors, column, date, bin_minutes, start_minute, end_minute):
+    rows, groups = index.positions(floors, date)
+    binned = binned_max(groups, index.frame.index.values[rows],
+                        index.frame[column].to_numpy(dtype=np.float64, na_value=np.nan)[rows],
+                        len(floors), date, bin_minutes, start_minute, end_minute)
+    return OccupancyMatrix(list(floors), bin_starts(date, bin_minutes, start_minute, end_minute),
+                           np.nan_to_num(binned, nan=0))
+
+
+# Daily max of a column per floor over the working days of a week, counting readings within
+# office hours only. Floors without any such reading are left out; other days count as empty.
+def floor_weekly_matrix(index, floors, column, week_start, start_minute, end_minute, days=5):
+    dates = workdays(week_start, days)
+    rows, groups = index.positions(floors, dates[0], dates[-1])
+    daily = daily_max(groups, index.frame.index.values[rows],
+                      index.frame[column].to_numpy(dtype=np.float64, na_value=np.nan)[rows],
+                      len(floors), dates[0], days, start_minute, end_minute)
+    has_data = ~np.isnan(daily).all(axis=1)
+    return OccupancyMatrix([floor for floor, keep in zip(floors, has_data) if keep], dates,
+                           np.nan_to_num(daily[has_data], nan=0))
+
+
+# Share of periods with presence (percent) per entity
+def presence_utilization(matrix):
+    return dict(zip(matrix.entities, matrix.values.mean(axis=1) * 100 if matrix.values.size else []))
+
+
+# Mean value as a share of capacity (percent) per entity; entities without a positive capacity get 0
+def capacity_utilization(matrix, capacities):
+    capacity = np.array([capacities.get(entity, 0) for entity in matrix.entities], dtype=np.float64)
+    means = matrix.values.mean(axis=1) if matrix.values.size else np.zeros(len(matrix.entities))
+    with np.errstate(invalid='ignore', divide='ignore'):
+        utilization = np.where(capacity > 0, means / capacity * 100, 0.0)
+    return dict(zip(matrix.entities, utilization))
+
+
+# Presence utilization of groups of entities (e.g. rooms per floor), pooling their periods; groups without entities are skipped
+def group_utilization(matrix, groups):
+    position = {entity: i for i, entity in enumerate(matrix.entities)}
+    result = {}
+    for name, members in groups.items():
+        rows = [position[member] for member in members if member in position]
+        if rows and matrix.values.shape[1]:
+            result[name] = matrix.values[rows].mean() * 100
+    return result
@@ -0,0 +1,188 @@
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from multiprocessing import get_context
+
+import pandas as pd
+
+from occupancy.bins import BIN_WIDTHS
+from occupancy.cache import CACHE_DIR
+from occupancy.cube import build_cube
+from occupancy.dataset import files_in
+from occupancy.dedup import read_deduplicated
+from occupancy.dimensions import split_spaces
+from occupancy.headcounts import PEAK_KEY_COLUMNS, PEAKS_PARTITION, build_peak_histograms, histogram_hashes, histogram_scores, rightsizing_frame
+from occupancy.ingest import MAX_WORKERS, update_manifest
+from occupancy.loading import TIMESTAMP_SOURCE, TIMESTAMP_SOURCES, load_week, week_files
+from occupancy.manifest import manifest_spaces
+from occupancy.metrics import group_utilization, presence_utilization, room_daily_matrix, room_weekly_matrix
+from occupancy.sites import minutes_of
+from occupancy.watch import workbook_paths
+
+# Headless batch reports: daily and weekly utilization of every room and floor in a folder of
+# weekly exports, the figures the room dashboard offers for download one selection at a time,
+# and weekly peak headcount percentiles of every room against its capacity.
+# Each week is computed in its own worker process and written as week=YYYY-MM-DD partitions:
+#
+#   python -m occupancy.report "Room Occupancy" reports --format parquet
+
+# Report tables written per week
+TABLES = ('daily_rooms', 'daily_floors', 'weekly_rooms', 'weekly_floors', 'rightsizing_rooms')
+
+# Output formats and the file written in each partition
+FORMATS = {'csv': 'part.csv', 'parquet': 'part.parquet'}
+
+
+# Space keys of each floor of one building's space table
+def _floor_groups(spaces):
+    named = spaces.dropna(subset=['Floor Name'])
+    return {floor: keys.tolist() for floor, keys in named.groupby('Floor Name', sort=True).groups.items()}
+
+
+# Room and floor records of one matrix's utilization, tagged with the given columns; the
+# matrix entities are space keys of one building, so rooms sharing a name stay apart
+def _records(matrix, spaces, building, tags):
+    utilization = presence_utilization(matrix)
+    room_rows = [dict(tags, **{'Building Name': building, 'Floor Name': spaces.at[key, 'Floor Name'],
+                               'Room': spaces.at[key, 'Space Name'], 'Usage (%)': usage}) for key, usage in utilization.items()]
+    floor_rows = [dict(tags, **{'Building Name': building, 'Floor': floor, 'Usage (%)': usage})
+                  for floor, usage in group_utilization(matrix, _floor_groups(spaces)).items()]
+    return room_rows, floor_rows
+
+
+# Right-sizing records of one building's rooms observed during a week, merged from their hour histograms
+def _rightsizing_records(manifest, spaces, building, week, cache_dir):
+    end = pd.Timestamp(week) + pd.Timedelta(days=6)
+    histograms, _ = read_deduplicated(files_in(manifest, [PEAKS_PARTITION], [building]), week, end, hashes=histogram_hashes,
+                                      score=histogram_scores, key_columns=PEAK_KEY_COLUMNS, cache_dir=cache_dir)
+    if histograms is None:
+        return []
+    histograms, _ = split_spaces(histograms.to_pandas(), spaces)
+    histograms = build_peak_histograms(histograms, len(spaces))
+    keys = range(len(spaces))
+    frame = rightsizing_frame(spaces['Space Name'], spaces['Space Capacity'].fillna(0), histograms.histograms(keys, week, end),
+                              histograms.occupied_share(keys, week, end))
+    frame.insert(0, 'Floor Name', spaces['Floor Name'].to_numpy())
+    frame.insert(0, 'Building Name', building)
+    frame.insert(0, 'Week Start', week)
+    return frame[frame['Occupied (%)'].notna()].to_dict('records')
+
+
+# Write one table partition as CSV or Parquet, atomically
+def _write_partition(df, out_dir, table, week, fmt):
+    directory = os.path.join(out_dir, table, f"week={week}")
+    os.makedirs(directory, exist_ok=True)
+    target = os.path.join(directory, FORMATS[fmt])
+    tmp = f"{target}.{os.getpid()}.tmp"
+    if fmt == 'parquet':
+        df.to_parquet(tmp, index=False)
+    else:
+        df.to_csv(tmp, index=False)
+    os.replace(tmp, target)
+
+
+# Compute and write the report tables of one week; runs in a worker process. Each building is
+# read from its own shard with its own space table. Days are the manifest dates of the week, and
+# rooms without readings on a day are left out of that day.
+def week_report(manifest, week, dates, out_dir, fmt='csv', bin_minutes=60, start_minute=9 * 60,
+                end_minute=17 * 60, timestamp_source=TIMESTAMP_SOURCE, cache_dir=CACHE_DIR):
+    tables = {table: [] for table in TABLES}
+    for building in manifest.get('buildings', {}):
+        spaces = manifest_spaces(manifest, building)
+        _, files = week_files(manifest, week, timestamp_source, building)
+        facts, _ = load_week(files, week, spaces, timestamp_source, cache_dir)
+        keys = list(range(len(spaces)))
+
+        if facts is not None:
+            cube = build_cube(facts, len(spaces))
+            for date in dates:
+                observed = cube.daily_presence(keys, date, 1)[:, 0] >= 0
+                day_keys = [key for key, seen in zip(keys, observed) if seen]
+                matrix = room_daily_matrix(cube, day_keys, day_keys, date, bin_minutes, start_minute, end_minute)
+                room_rows, floor_rows = _records(matrix, spaces, building, {'Date': date})
+                tables['daily_rooms'] += room_rows
+                tables['daily_floors'] += floor_rows
+
+            room_rows, floor_rows = _records(room_weekly_matrix(cube, keys, keys, week), spaces, building, {'Week Start': week})
+            tables['weekly_rooms'] += room_rows
+            tables['weekly_floors'] += floor_rows
+
+        tables['rightsizing_rooms'] += _rightsizing_records(manifest, spaces, building, week, cache_dir)
+
+    counts = {}
+    for table, rows in tables.items():
+        if rows:
+            _write_partition(pd.DataFrame(rows), out_dir, table, week, fmt)
+        counts[table] = len(rows)
+    return counts
+
+
+# Write the reports of every week of a folder of workbooks, one week per task across a process
+# pool; returns row counts per table and the errors of failed workbooks and weeks
+def run_report(folder_path, out_dir, fmt='csv', bin_minutes=60, start_minute=9 * 60, end_minute=17 * 60,
+               timestamp_source=TIMESTAMP_SOURCE, cache_dir=CACHE_DIR, max_workers=MAX_WORKERS):
+    manifest, errors = update_manifest(folder_path, workbook_paths(folder_path), cache_dir, max_workers=max_workers)
+    errors = list(errors)
+
+    dates_by_week = {}
+    for date in manifest.get('dates', []):
+        dates_by_week.setdefault(week_files(manifest, date, timestamp_source)[0], []).append(date)
+    options = dict(fmt=fmt, bin_minutes=bin_minutes, start_minute=start_minute, end_minute=end_minute,
+                   timestamp_source=timestamp_source, cache_dir=cache_dir)
+
+    totals = {table: 0 for table in TABLES}
+    workers = min(max_workers or os.cpu_count() or 1, len(dates_by_week))
+    if workers <= 1:
+        results = []
+        for week, dates in dates_by_week.items():
+            try:
+                results.append(week_report(manifest, week, dates, out_dir, **options))
+            except Exception as e:
+                errors.append((week, e))
+    else:
+        # Spawned workers, as for ingestion; each reads only its week's partitions
+        results = []
+        with ProcessPoolExecutor(max_workers=workers, mp_context=get_context('spawn')) as pool:
+            futures = {pool.submit(week_report, manifest, week, dates, out_dir, **options): week
+                       for week, dates in dates_by_week.items()}
+            for future in as_completed(futures):
+                try:
+                    results.append(future.result())
+                except Exception as e:
+                    errors.append((futures[future], e))
+
+    for counts in results:
+        for table, count in counts.items():
+            totals[table] += count
+    return totals, errors
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Write daily and weekly room and floor utilization and room right-sizing reports.")
+    parser.add_argument('folder', nargs='?', default='Room Occupancy', help="folder of weekly .xlsx exports")
+    parser.add_argument('out_dir', nargs='?', default='reports', help="output directory")
+    parser.add_argument('--format', choices=sorted(FORMATS), default='csv')
+    parser.add_argument('--bin-minutes', type=int, choices=BIN_WIDTHS, default=60)
+    parser.add_argument('--start', default='09:00', help="office hours start (HH:MM)")
+    parser.add_argument('--end', default='17:00', help="office hours end (HH:MM), inclusive bin start")
+    parser.add_argument('--timestamp-source', choices=TIMESTAMP_SOURCES, default=TIMESTAMP_SOURCE,
+                        help="build timestamps from local date and time or from UTC (default: OCCUPANCY_TIMESTAMP_SOURCE)")
+    parser.add_argument('--cache-dir', default=CACHE_DIR)
+    parser.add_argument('--workers', type=int, default=MAX_WORKERS, help="worker processes (default: every core)")
+    args = parser.parse_args(argv)
+
+    started = time.perf_counter()
+    totals, errors = run_report(args.folder, args.out_dir, args.format, args.bin_minutes, minutes_of(args.start),
+                                minutes_of(args.end), args.timestamp_source, args.cache_dir, args.workers)
+    for table, count in totals.items():
+        print(f"{table}: {count} rows")
+    for source, e in errors:
+        print(f"error: {source}: {e}", file=sys.stderr)
+    print(f"wrote {args.out_dir} in {time.perf_counter() - started:.2f}s")
+    return 1 if errors else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,138 @@
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+
+from occupancy.dimensions import SPACE_LEVELS
+from occupancy.timestamps import EPOCH_WEEKDAY
+
+# Partition holding the per room-day hour flags of a workbook
+HOURS_PARTITION = 'hours'
+
+# Monday to Friday; weekend days never count towards range utilization
+WORKDAYS = (0, 1, 2, 3, 4)
+
+
+# Per space and day bit masks of the hours with presence ('Occupied Hours'), with any
+# reading ('Observed Hours') and, where the export has 'Booking Status', with a booking
+# ('Booked Hours'); bit h stands for hour h of the local day
+def hour_flags(table):
+    levels = [column for column in SPACE_LEVELS if column in table.column_names]
+    values = ['People Presence'] + [column for column in ['Booking Status'] if column in table.column_names]
+    df = table.select(levels + ['Local Date', 'Local Time'] + values).to_pandas()
+    df = df[df['Local Date'].notna() & df['Local Time'].notna()]
+    df['Hour'] = (df['Local Time'] // pd.Timedelta(hours=1)).astype(np.int64)
+
+    # One row per space, day and hour, so bits can be summed instead of or-ed
+    hourly = df.groupby(levels + ['Local Date', 'Hour'], observed=True, dropna=False)[values].max().reset_index()
+    bits = np.left_shift(1, hourly['Hour'].to_numpy()).astype(np.int32)
+    presence = hourly['People Presence'].to_numpy(dtype=np.float64, na_value=np.nan)
+    hourly['Occupied Hours'] = np.where(presence > 0, bits, 0)
+    hourly['Observed Hours'] = np.where(~np.isnan(presence), bits, 0)
+    masks = ['Occupied Hours', 'Observed Hours']
+    if 'Booking Status' in values:
+        booked = hourly['Booking Status'].to_numpy(dtype=np.float64, na_value=np.nan)
+        hourly['Booked Hours'] = np.where(booked > 0, bits, 0)
+        masks.append('Booked Hours')
+
+    flags = hourly.groupby(levels + ['Local Date'], observed=True, dropna=False)[masks].sum()
+    flags = flags.reset_index()
+    for column in levels:
+        flags[column] = flags[column].astype(object)
+    return pa.Table.from_pandas(flags, preserve_index=False)
+
+
+# Unpack hour bit masks into a [..., 24] array of 0/1 counts
+def unpack_hours(masks):
+    return (np.asarray(masks, dtype=np.int64)[..., None] >> np.arange(24)) & 1
+
+
+# Space keys and day positions of the workday rows of a flag table keyed by 'Space Key', the
+# rows kept and the first date and number of days they span
+def flag_days(flags, workdays=WORKDAYS):
+    keys = flags['Space Key'].to_numpy().astype(np.int64)
+    days = flags['Local Date'].to_numpy().astype('datetime64[D]')
+    valid = (keys >= 0) & ~np.isnat(days)
+    weekday = (days.astype(np.int64) + EPOCH_WEEKDAY) % 7
+    valid &= np.isin(weekday, workdays)
+    keys, days = keys[valid], days[valid]
+
+    if len(days):
+        first_date = days.min()
+        num_days = int((days.max() - first_date).astype(np.int64)) + 1
+    else:
+        first_date, num_days = np.datetime64('1970-01-01', 'D'), 0
+    return keys, (days - first_date).astype(np.int64), valid, first_date, num_days
+
+
+# Prefix sums over days and hours of per-row [24] hour counts: out[k, d, h] sums the counts of
+# space k on days before d and hours before h
+def hour_prefix_sums(keys, day_index, hours, num_spaces, num_days):
+    counts = np.zeros((num_spaces, num_days + 1, 25), dtype=np.int32)
+    np.add.at(counts, (keys, day_index + 1), np.pad(hours, ((0, 0), (1, 0))))
+    return counts.cumsum(axis=1).cumsum(axis=2, dtype=np.int32)
+
+
+# Totals of prefix sums per space key over [lo, hi) days and [h0, h1) hours; unknown keys get 0
+def prefix_totals(prefix, keys, lo, hi, h0, h1):
+    keys = np.asarray(keys, dtype=np.int64)
+    known = (keys >= 0) & (keys < len(prefix))
+    values = prefix[keys[known]]
+    out = np.zeros(len(keys), dtype=np.int64)
+    out[known] = values[:, hi, h1] - values[:, lo, h1] - values[:, hi, h0] + values[:, lo, h0]
+    return out
+
+
+# Totals of each prefix sum (days from first_date) per space key over [start_date, end_date] and
+# [start_hour, end_hour], the dates clipped to the days of the prefix sums
+def range_totals(prefixes, first_date, keys, start_date, end_date, start_hour=0, end_hour=23):
+    num_days = prefixes[0].shape[1] - 1
+
+    def day(date):
+        position = int((np.datetime64(pd.Timestamp(date).date(), 'D') - first_date).astype(np.int64))
+        return min(max(position, 0), num_days)
+
+    lo, hi = day(start_date), day(pd.Timestamp(end_date) + pd.Timedelta(days=1))
+    return [prefix_totals(prefix, keys, lo, hi, start_hour, end_hour + 1) for prefix in prefixes]
+
+
+# Prefix sums of occupied and observed hours per space, over days and hours of the day.
+# occupied[k, d, h] counts occupied hours of space k on days before d and hours before h,
+# so any (date range, office hours) total is four lookups.
+@dataclass
+class Rollup:
+    first_date: np.datetime64
+    occupied: np.ndarray
+    observed: np.ndarray
+
+    @property
+    def num_days(self):
+        return self.occupied.shape[1] - 1
+
+    # Occupied and observed hours per space key over [start_date, end_date] and [start_hour, end_hour]
+    def totals(self, keys, start_date, end_date, start_hour=0, end_hour=23):
+        return tuple(range_totals((self.occupied, self.observed), self.first_date, keys, start_date, end_date,
+                                  start_hour, end_hour))
+
+    # Share of observed hours with presence (percent) per space key; NaN where nothing was observed
+    def utilization(self, keys, start_date, end_date, start_hour=0, end_hour=23):
+        occupied, observed = self.totals(keys, start_date, end_date, start_hour, end_hour)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return np.where(observed > 0, occupied * 100.0 / observed, np.nan)
+
+    # Utilization of groups of space keys (e.g. floors or buildings), pooling their hours
+    def group_utilization(self, groups, start_date, end_date, start_hour=0, end_hour=23):
+        result = {}
+        for name, keys in groups.items():
+            occupied, observed = self.totals(keys, start_date, end_date, start_hour, end_hour)
+            result[name] = occupied.sum() * 100.0 / observed.sum() if observed.sum() else np.nan
+        return result
+
+
+# Build the rollup from hour flags keyed by 'Space Key' (see hour_flags and split_spaces)
+def build_rollup(flags, num_spaces, workdays=WORKDAYS):
+    keys, day_index, valid, first_date, num_days = flag_days(flags, workdays)
+    prefixes = [hour_prefix_sums(keys, day_index, unpack_hours(flags[column].to_numpy()[valid]), num_spaces, num_days)
+                for column in ('Occupied Hours', 'Observed Hours')]
+    return Rollup(first_date, *prefixes)
@@ -0,0 +1,38 @@
+import json
+import os
+
+# Per-site settings of the room dashboard, keyed by 'Building Name' in a JSON file:
+#
+#   {"ABC Building A": {"title": "Winnipeg Office", "office_hours": ["09:00", "17:00"]}}
+#
+# Every key is optional; buildings missing from the file use their name as the title and the
+# default office hours. Office hours are local times, like the exports' 'Local Time'.
+SITES_PATH = os.environ.get('OCCUPANCY_SITES', 'sites.json')
+
+DEFAULT_OFFICE_HOURS = ('09:00', '17:00')
+
+
+# Site settings from the JSON file, or none if it is missing or unreadable
+def load_sites(path=SITES_PATH):
+    try:
+        with open(path, encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+# Minutes since midnight of an HH:MM string
+def minutes_of(value):
+    hours, minutes = str(value).split(':')
+    return int(hours) * 60 + int(minutes)
+
+
+# Title and office hours (minutes since midnight) of a building
+def site_settings(sites, building):
+    site = sites.get(building, {})
+    start, end = site.get('office_hours', DEFAULT_OFFICE_HOURS)
+    return {
+        'title': site.get('title', building),
+        'start_minute': minutes_of(start),
+        'end_minute': minutes_of(end),
+    }
@@ -0,0 +1,207 @@
+import argparse
+import os
+import zipfile
+from xml.sax.saxutils import escape
+
+import numpy as np
+import pandas as pd
+
+from occupancy.xlsx_reader import EXCEL_EPOCH, EXPORT_COLUMNS, SHARED_STRINGS_PATH, SHEET_PATH
+
+# Synthetic ABCWeekly workbooks (the 11 export columns) and AlphaComWeekly CSVs for
+# benchmarking: N weeks x M floors x K rooms per floor of weekday office-hour readings.
+# The same seed always gives the same data.
+
+# Readings of the ABCWeekly exports: weekdays, 9:00 to 17:00 every 15 minutes
+EXPORT_SLOTS = pd.timedelta_range('09:00:00', '17:00:00', freq='15min')
+
+# Readings of the AlphaComWeekly CSV: every day, around the clock every 15 minutes
+SENSOR_SLOTS = pd.timedelta_range('00:00:00', '23:45:00', freq='15min')
+
+TIME_ZONE = 'Canada/Winnipeg'
+
+# Offset of Winnipeg local time from UTC during daylight saving time
+UTC_OFFSET = np.timedelta64(5, 'h')
+
+
+# Share of rooms in use by time of day: low at the edges of the day, highest late morning and mid-afternoon
+def _daily_profile(slots):
+    hours = slots / pd.Timedelta(hours=1)
+    return np.clip(np.sin((hours - 7) / 11 * np.pi), 0.05, None) ** 2
+
+
+# Rooms of a building: floor and space names, capacity and how busy each room is
+def _rooms(floors, rooms_per_floor, rng):
+    floor_names = np.repeat([f"Floor {floor + 1}" for floor in range(floors)], rooms_per_floor)
+    space_names = [f"{floor + 1}{room + 1:02d}" for floor in range(floors) for room in range(rooms_per_floor)]
+    capacity = rng.integers(2, 13, len(space_names))
+    busy = rng.uniform(0.1, 0.8, len(space_names))
+    return floor_names, np.array(space_names, dtype=object), capacity, busy
+
+
+# Columns of one synthetic ABCWeekly export for the week starting on week_start (a Monday)
+def export_week(week_start, floors, rooms_per_floor, building='ABC Building A', seed=0):
+    rng = np.random.default_rng(seed)
+    floor_names, space_names, capacity, busy = _rooms(floors, rooms_per_floor, np.random.default_rng(0))
+    days = np.datetime64(pd.Timestamp(week_start).date(), 'D') + np.arange(5)
+
+    # Rows ordered by room, then day, then time of day, like the real exports
+    num_rooms, num_slots = len(space_names), len(EXPORT_SLOTS)
+    room = np.repeat(np.arange(num_rooms), len(days) * num_slots)
+    day = np.tile(np.repeat(days, num_slots), num_rooms)
+    slot = np.tile(EXPORT_SLOTS.to_numpy(), num_rooms * len(days))
+
+    presence = rng.random(len(room)) < busy[room] * _daily_profile(EXPORT_SLOTS)[np.tile(np.arange(num_slots), num_rooms * len(days))]
+    peak = np.where(presence, rng.integers(1, capacity[room] + 1), 0)
+    booked = presence | (rng.random(len(room)) < 0.1)
+    local = day.astype('datetime64[ns]') + slot
+    return {
+        'Building Name': np.full(len(room), building, dtype=object),
+        'Floor Name': floor_names[room],
+        'Space Name': space_names[room],
+        'Space Capacity': capacity[room],
+        'Local Date': day,
+        'Local Time': slot,
+        'Booking Status': booked.astype(np.int64),
+        'People Presence': presence.astype(np.int64),
+        'Peak People Count': peak.astype(np.int64),
+        'UTC Timestamp': ((local + UTC_OFFSET).astype('datetime64[ms]')).astype(np.int64),
+        'Time Zone': np.full(len(room), TIME_ZONE, dtype=object),
+    }
+
+
+# Excel column letters of the first n columns
+def _column_letters(n):
+    return [chr(ord('A') + i) for i in range(n)]
+
+
+# Cell values of a column as sheet XML cell contents: shared string indexes or numbers
+def _cell_values(values, kind, strings):
+    if kind == 'str':
+        codes, uniques = pd.factorize(values)
+        offset = len(strings)
+        strings.extend(str(value) for value in uniques)
+        return (codes + offset).astype(str), True
+    if kind == 'date':
+        return (values.astype('datetime64[D]') - EXCEL_EPOCH).astype(np.int64).astype(str), False
+    if kind == 'time':
+        return np.char.mod('%.17g', values / np.timedelta64(1, 'D')), False
+    return np.asarray(values).astype(np.int64).astype(str), False
+
+
+# Write columns as a minimal single-sheet XLSX workbook readable by Excel and read_export
+def write_workbook(path, columns):
+    names = list(columns)
+    letters = _column_letters(len(names))
+    strings = list(names)
+    header = ''.join(f'<c r="{letter}1" t="s"><v>{i}</v></c>' for i, letter in enumerate(letters))
+
+    # One row template with a slot per cell value; text cells point into the shared strings
+    cells = [_cell_values(columns[name], EXPORT_COLUMNS.get(name, 'int'), strings) for name in names]
+    num_rows = len(next(iter(columns.values())))
+    types = [' t="s"' if shared else '' for _, shared in cells]
+    templates = ''.join(f'<c r="{letter}{{0}}"{cell_type}><v>{{{i + 1}}}</v></c>'
+                        for i, (letter, cell_type) in enumerate(zip(letters, types)))
+    row_template = '<row r="{0}">' + templates + '</row>'
+
+    with zipfile.ZipFile(path, 'w', zipfile.ZIP_DEFLATED) as zf:
+        zf.writestr('[Content_Types].xml', CONTENT_TYPES)
+        zf.writestr('_rels/.rels', ROOT_RELS)
+        zf.writestr('xl/workbook.xml', WORKBOOK)
+        zf.writestr('xl/_rels/workbook.xml.rels', WORKBOOK_RELS)
+        with zf.open(SHEET_PATH, 'w') as f:
+            f.write(f'{XML_HEADER}<worksheet xmlns="{MAIN_NS}"><sheetData><row r="1">{header}</row>'.encode('utf-8'))
+            columns_text = [values for values, _ in cells]
+            for start in range(0, num_rows, 10000):
+                block = [row_template.format(row + 2, *(values[row] for values in columns_text))
+                         for row in range(start, min(start + 10000, num_rows))]
+                f.write(''.join(block).encode('utf-8'))
+            f.write(b'</sheetData></worksheet>')
+        shared = ''.join(f'<si><t>{escape(text)}</t></si>' for text in strings)
+        zf.writestr(SHARED_STRINGS_PATH, f'{XML_HEADER}<sst xmlns="{MAIN_NS}" count="{len(strings)}" '
+                                         f'uniqueCount="{len(strings)}">{shared}</sst>')
+
+
+# Floor-level AlphaComWeekly CSV frame: users per floor every 15 minutes for every day of the weeks
+def sensor_frame(first_week, weeks, floors, rooms_per_floor, seed=0):
+    rng = np.random.default_rng(seed)
+    _, _, capacity, busy = _rooms(floors, rooms_per_floor, np.random.default_rng(0))
+    floor_capacity = capacity.reshape(floors, rooms_per_floor).sum(axis=1)
+    floor_busy = busy.reshape(floors, rooms_per_floor).mean(axis=1)
+
+    days = np.datetime64(pd.Timestamp(first_week).date(), 'D') + np.arange(7 * weeks)
+    weekday = (days.astype(np.int64) + 3) % 7 < 5
+    num_slots = len(SENSOR_SLOTS)
+    floor = np.repeat(np.arange(floors), len(days) * num_slots)
+    day = np.tile(np.repeat(np.arange(len(days)), num_slots), floors)
+    slot = np.tile(np.arange(num_slots), floors * len(days))
+
+    expected = floor_capacity[floor] * floor_busy[floor] * _daily_profile(SENSOR_SLOTS)[slot] * np.where(weekday[day], 1.0, 0.1)
+    minutes = SENSOR_SLOTS.to_numpy()[slot] // np.timedelta64(1, 'm')
+    return pd.DataFrame({
+        'Location Name': np.array([f"Floor {n + 1}" for n in range(floors)], dtype=object)[floor],
+        'Local Date': days[day].astype(str),
+        'Local Hour': minutes // 60,
+        'Local Minute': minutes % 60,
+        'Associated Users Count': rng.poisson(expected),
+        'Capacity': floor_capacity[floor],
+    })
+
+
+# Write weeks x floors x rooms_per_floor of synthetic data to out_dir: one ABCWeekly workbook per
+# week (named like the real exports) and one AlphaComWeekly CSV; returns the written paths
+def generate(out_dir, weeks, floors, rooms_per_floor, first_week='2024-09-23', seed=0):
+    os.makedirs(out_dir, exist_ok=True)
+    workbooks = []
+    for week in range(weeks):
+        week_start = pd.Timestamp(first_week) + pd.Timedelta(weeks=week)
+        path = os.path.join(out_dir, f"ABCWeekly{week_start:%m-%d-%y} -ST.xlsx")
+        write_workbook(path, export_week(week_start, floors, rooms_per_floor, seed=seed + week))
+        workbooks.append(path)
+    csv_path = os.path.join(out_dir, 'AlphaComWeekly_Cleaned.csv')
+    sensor_frame(first_week, weeks, floors, rooms_per_floor, seed).to_csv(csv_path, index=False)
+    return workbooks, csv_path
+
+
+XML_HEADER = '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+MAIN_NS = 'http://schemas.openxmlformats.org/spreadsheetml/2006/main'
+REL_NS = 'http://schemas.openxmlformats.org/officeDocument/2006/relationships'
+CONTENT_TYPES = (
+    f'{XML_HEADER}<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+    '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+    '<Default Extension="xml" ContentType="application/xml"/>'
+    '<Override PartName="/xl/workbook.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+    '<Override PartName="/xl/worksheets/sheet1.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+    '<Override PartName="/xl/sharedStrings.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sharedStrings+xml"/>'
+    '</Types>'
+)
+ROOT_RELS = (
+    f'{XML_HEADER}<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    f'<Relationship Id="rId1" Type="{REL_NS}/officeDocument" Target="xl/workbook.xml"/></Relationships>'
+)
+WORKBOOK = (
+    f'{XML_HEADER}<workbook xmlns="{MAIN_NS}" xmlns:r="{REL_NS}">'
+    '<sheets><sheet name="Sheet1" sheetId="1" r:id="rId1"/></sheets></workbook>'
+)
+WORKBOOK_RELS = (
+    f'{XML_HEADER}<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    f'<Relationship Id="rId1" Type="{REL_NS}/worksheet" Target="worksheets/sheet1.xml"/>'
+    f'<Relationship Id="rId2" Type="{REL_NS}/sharedStrings" Target="sharedStrings.xml"/></Relationships>'
+)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Write synthetic ABCWeekly workbooks and an AlphaComWeekly CSV.")
+    parser.add_argument('out_dir')
+    parser.add_argument('--weeks', type=int, default=4)
+    parser.add_argument('--floors', type=int, default=3)
+    parser.add_argument('--rooms', type=int, default=20, help="rooms per floor")
+    parser.add_argument('--first-week', default='2024-09-23', help="Monday of the first week")
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args(argv)
+    workbooks, csv_path = generate(args.out_dir, args.weeks, args.floors, args.rooms, args.first_week, args.seed)
+    print(f"wrote {len(workbooks)} workbooks and {csv_path}")
+
+
+if __name__ == '__main__':
+    main()
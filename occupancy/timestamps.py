@@ -0,0 +1,58 @@
+import numpy as np
+import pandas as pd
+
+# 1970-01-01 was a Thursday; offset that makes (days + offset) % 7 the Monday-based weekday
+EPOCH_WEEKDAY = 3
+
+# Zone names seen in exports that are not (or no longer) in the IANA database
+ZONE_ALIASES = {
+    'Canada/Winnipeg': 'America/Winnipeg',
+    'Canada/Central': 'America/Winnipeg',
+    'Canada/Eastern': 'America/Toronto',
+    'Canada/Mountain': 'America/Edmonton',
+    'Canada/Pacific': 'America/Vancouver',
+    'Canada/Atlantic': 'America/Halifax',
+    'Canada/Newfoundland': 'America/St_Johns',
+    'Canada/Saskatchewan': 'America/Regina',
+    'US/Central': 'America/Chicago',
+    'US/Eastern': 'America/New_York',
+    'US/Mountain': 'America/Denver',
+    'US/Pacific': 'America/Los_Angeles',
+}
+
+
+# Local wall-clock timestamps from 'Local Date' (datetime64) and 'Local Time' (timedelta64)
+def local_timestamps(dates, times):
+    return np.asarray(dates, dtype='datetime64[ns]') + np.asarray(times, dtype='timedelta64[ns]')
+
+
+# Local wall-clock timestamps from 'UTC Timestamp' (epoch milliseconds) and 'Time Zone'
+def utc_timestamps(utc_ms, time_zones):
+    utc_ms = np.asarray(utc_ms, dtype=np.float64)
+    zones = pd.Categorical(time_zones)
+    out = np.full(len(utc_ms), np.datetime64('NaT'), dtype='datetime64[ns]')
+
+    # One vectorized conversion per distinct zone; rows with an unknown zone stay NaT
+    for code, zone in enumerate(zones.categories):
+        mask = zones.codes == code
+        try:
+            local = pd.to_datetime(utc_ms[mask], unit='ms', utc=True).tz_convert(ZONE_ALIASES.get(zone, zone))
+            local = local.tz_localize(None)
+        except Exception:
+            continue
+        out[mask] = local.to_numpy(dtype='datetime64[ns]')
+    return out
+
+
+# Calendar dates of timestamps
+def calendar_dates(timestamps):
+    return np.asarray(timestamps, dtype='datetime64[ns]').astype('datetime64[D]')
+
+
+# Monday of the week containing each date
+def week_starts(dates):
+    dates = np.asarray(dates, dtype='datetime64[D]')
+    days = dates.astype(np.int64)
+    starts = (days - (days + EPOCH_WEEKDAY) % 7).astype('datetime64[D]')
+    starts[np.isnat(dates)] = np.datetime64('NaT')
+    return starts
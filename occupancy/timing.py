@@ -0,0 +1,89 @@
+import json
+import os
+import threading
+import time
+import tracemalloc
+import uuid
+from contextlib import contextmanager
+
+import pandas as pd
+
+# Optional per-stage instrumentation of a dashboard run (load, aggregate, utilization, figure
+# build, chart rendering). Off unless OCCUPANCY_TIMING is set; when on, each run's stages are
+# shown in the sidebar and appended as JSON lines to OCCUPANCY_TIMING_LOG.
+#
+# OCCUPANCY_TIMING_MEMORY also traces the peak Python/NumPy memory of each stage. tracemalloc is
+# process-wide and slows allocation-heavy code, so use it on a single session when profiling.
+TIMING_ENABLED = os.environ.get('OCCUPANCY_TIMING', '').lower() in ('1', 'true', 'yes')
+TRACE_MEMORY = os.environ.get('OCCUPANCY_TIMING_MEMORY', '').lower() in ('1', 'true', 'yes')
+
+# Log of stage timings, one JSON object per stage and run
+TIMING_LOG = os.environ.get('OCCUPANCY_TIMING_LOG', 'occupancy_timing.jsonl')
+
+# Sessions run in threads of one process; appends to the log are serialized
+_log_lock = threading.Lock()
+
+
+# Stage timings of one dashboard run. Stages may nest (e.g. a load inside an aggregate that
+# missed the cache); each records its wall time, depth and, when tracing, its peak memory
+# above what was allocated when it started.
+class StageTimer:
+    def __init__(self, app, enabled=TIMING_ENABLED, trace_memory=TRACE_MEMORY, log_path=TIMING_LOG):
+        self.app = app
+        self.enabled = enabled
+        self.trace_memory = enabled and trace_memory
+        self.log_path = log_path
+        self.run_id = uuid.uuid4().hex[:12]
+        self.started = time.time()
+        self.records = []
+        self._peaks = []
+        if self.trace_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+
+    # Time the enclosed block as one stage; extra fields are kept with the record
+    @contextmanager
+    def stage(self, name, **fields):
+        if not self.enabled:
+            yield
+            return
+        record = dict(stage=name, depth=len(self._peaks), **fields)
+        self.records.append(record)
+        if self.trace_memory:
+            current, peak = tracemalloc.get_traced_memory()
+            if self._peaks:
+                self._peaks[-1] = max(self._peaks[-1], peak)
+            tracemalloc.reset_peak()
+            start_memory = current
+        self._peaks.append(0)
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            record['seconds'] = time.perf_counter() - started
+            peak = self._peaks.pop()
+            if self.trace_memory:
+                peak = max(peak, tracemalloc.get_traced_memory()[1])
+                record['peak_mb'] = (peak - start_memory) / 2 ** 20
+                if self._peaks:
+                    self._peaks[-1] = max(self._peaks[-1], peak)
+
+    # Stages of the run in the order they started, nested stages indented under their parent
+    def frame(self):
+        rows = [{'Stage': '  ' * record['depth'] + record['stage'], 'Seconds': record.get('seconds', float('nan')),
+                 'Peak MB': record.get('peak_mb')} for record in self.records]
+        df = pd.DataFrame(rows, columns=['Stage', 'Seconds', 'Peak MB'])
+        return df if self.trace_memory else df.drop(columns='Peak MB')
+
+    # Wall time of the top-level stages
+    def total_seconds(self):
+        return sum(record.get('seconds', 0) for record in self.records if record['depth'] == 0)
+
+    # Append the run's stages to the log file as JSON lines
+    def write_log(self):
+        if not (self.enabled and self.log_path and self.records):
+            return
+        stamp = pd.Timestamp(self.started, unit='s').isoformat()
+        lines = [json.dumps(dict(record, app=self.app, run=self.run_id, time=stamp), default=str) + '\n'
+                 for record in self.records]
+        with _log_lock, open(self.log_path, 'a', encoding='utf-8') as f:
+            f.writelines(lines)
@@ -0,0 +1,93 @@
+import argparse
+import os
+import sys
+import time
+
+from occupancy.cache import CACHE_DIR
+from occupancy.ingest import MAX_WORKERS, update_manifest
+
+# Watch a folder of weekly exports for added, changed or removed workbooks. A snapshot of the
+# folder (file names, sizes and mtimes) is cheap enough to take on every dashboard rerun; when
+# it changes, update_manifest ingests only the affected workbooks and bumps the manifest version.
+# Run as a process to ingest new exports before anyone opens the dashboard:
+#
+#   python -m occupancy.watch "Room Occupancy" --interval 60
+
+# Seconds between folder scans
+POLL_SECONDS = 60
+
+
+# Whether a file name is a workbook; Office lock files ('~$...') of workbooks open in Excel are not
+def is_workbook(name):
+    return name.endswith('.xlsx') and not name.startswith('~$')
+
+
+# Workbook paths of a folder
+def workbook_paths(folder_path):
+    return [os.path.join(folder_path, name) for name in sorted(os.listdir(folder_path)) if is_workbook(name)]
+
+
+# Names, sizes and modification times of a folder's workbooks; equal snapshots mean nothing to ingest
+def folder_snapshot(folder_path):
+    entries = []
+    with os.scandir(folder_path) as scan:
+        for entry in scan:
+            if is_workbook(entry.name) and entry.is_file():
+                stat = entry.stat()
+                entries.append((entry.name, stat.st_size, stat.st_mtime_ns))
+    return tuple(sorted(entries))
+
+
+# Bring a folder's manifest up to date with its workbooks; returns the manifest and ingestion errors
+def refresh(folder_path, cache_dir=CACHE_DIR, max_workers=MAX_WORKERS):
+    return update_manifest(folder_path, workbook_paths(folder_path), cache_dir, max_workers=max_workers)
+
+
+# One-line description of a manifest's latest changes
+def describe_changes(manifest):
+    changes = manifest.get('changes', {})
+    parts = [f"{len(changes[kind])} {kind}" for kind in ('added', 'changed', 'removed') if changes.get(kind)]
+    weeks = ', '.join(changes.get('weeks', []))
+    return f"version {manifest.get('version', 0)}: {', '.join(parts) or 'no workbook changes'}" + \
+        (f" (weeks {weeks})" if weeks else '')
+
+
+# Poll a folder and refresh its manifest whenever its snapshot changes; stops after max_scans if given
+def watch(folder_path, interval=POLL_SECONDS, cache_dir=CACHE_DIR, max_workers=MAX_WORKERS, max_scans=None, log=print):
+    snapshot = None
+    scans = 0
+    while max_scans is None or scans < max_scans:
+        current = folder_snapshot(folder_path)
+        if current != snapshot:
+            try:
+                manifest, errors = refresh(folder_path, cache_dir, max_workers)
+                log(describe_changes(manifest))
+                for path, e in errors:
+                    log(f"error: {path}: {e}")
+            except OSError as e:
+                errors = [(folder_path, e)]
+                log(f"error: {folder_path}: {e}")
+            # Failed workbooks (e.g. still being copied) are retried at the next scan
+            snapshot = None if errors else current
+        scans += 1
+        if max_scans is None or scans < max_scans:
+            time.sleep(interval)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Ingest new, changed or removed weekly exports as they appear.")
+    parser.add_argument('folder', nargs='?', default='Room Occupancy', help="folder of weekly .xlsx exports")
+    parser.add_argument('--interval', type=float, default=POLL_SECONDS, help="seconds between scans")
+    parser.add_argument('--cache-dir', default=CACHE_DIR)
+    parser.add_argument('--workers', type=int, default=MAX_WORKERS, help="worker processes (default: every core)")
+    parser.add_argument('--once', action='store_true', help="refresh once and exit")
+    args = parser.parse_args(argv)
+    try:
+        watch(args.folder, args.interval, args.cache_dir, args.workers, max_scans=1 if args.once else None)
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
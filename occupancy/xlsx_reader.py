@@ -0,0 +1,255 @@
+import html
+import re
+import zipfile
+import xml.etree.ElementTree as ET
+
+import numpy as np
+
+# Streaming reader for the ABCWeekly sensor exports. The sheet XML is decompressed in
+# chunks and scanned for the requested columns only, and values are converted to
+# typed NumPy arrays a chunk at a time.
+
+NS = '{http://schemas.openxmlformats.org/spreadsheetml/2006/main}'
+TEXT = NS + 't'
+
+SHEET_PATH = 'xl/worksheets/sheet1.xml'
+SHARED_STRINGS_PATH = 'xl/sharedStrings.xml'
+
+# Bytes of decompressed sheet XML scanned per step
+CHUNK_SIZE = 1 << 22
+
+# Excel serial day 0 (the 1900 date system, including Excel's leap year bug)
+EXCEL_EPOCH = np.datetime64('1899-12-30', 'D')
+
+# Column kinds of the ABCWeekly export format
+EXPORT_COLUMNS = {
+    'Building Name': 'str',
+    'Floor Name': 'str',
+    'Space Name': 'str',
+    'Space Capacity': 'int',
+    'Local Date': 'date',
+    'Local Time': 'time',
+    'Booking Status': 'int',
+    'People Presence': 'int',
+    'Peak People Count': 'int',
+    'UTC Timestamp': 'int',
+    'Time Zone': 'str',
+}
+
+# A <c> element in one of the given columns: attributes before its reference, column letters, row
+# number, attributes after it, <v> value and <is> inline text. Writers order the attributes
+# differently, so 'r' may come after 's' or 't'.
+CELL_PATTERN = (rb'<c\b([^>]*?)\sr="(%s)(\d+)"([^>]*?)'
+                rb'(?:/>|>(?:<f[^>]*?(?:/>|>[^<]*</f>))?(?:<v>([^<]*)</v>)?(?:<is>(.*?)</is>)?</c>)')
+HEADER_CELL = re.compile(CELL_PATTERN % rb'[A-Z]+', re.S)
+TAGS = re.compile(rb'<[^>]+>')
+
+
+# Read the shared strings table incrementally
+def read_shared_strings(zf):
+    if SHARED_STRINGS_PATH not in zf.namelist():
+        return []
+    strings = []
+    with zf.open(SHARED_STRINGS_PATH) as f:
+        for _, elem in ET.iterparse(f):
+            if elem.tag == NS + 'si':
+                # Plain strings hold one <t>; rich text runs are concatenated and phonetic hints skipped
+                text = elem.find(TEXT)
+                if text is not None:
+                    strings.append(text.text or '')
+                else:
+                    strings.append(''.join(run.findtext(TEXT, '') for run in elem.findall(NS + 'r')))
+                elem.clear()
+    return strings
+
+
+# Yield blocks of whole <row> elements from the decompressed sheet XML
+def _row_blocks(stream, chunk_size=CHUNK_SIZE):
+    pending = b''
+    while True:
+        data = stream.read(chunk_size)
+        if not data:
+            break
+        pending += data
+        end = pending.rfind(b'</row>')
+        if end < 0:
+            continue
+        end += len(b'</row>')
+        yield pending[:end]
+        pending = pending[end:]
+    if pending.strip():
+        yield pending
+
+
+# Decode the text of a cell that is not a plain number. Shared strings are unescaped by the
+# XML parser; inline and formula string text is raw XML, so its entities are resolved here.
+def _cell_text(attrs, value, inline, shared_strings):
+    if b't="s"' in attrs:
+        return shared_strings[int(value)]
+    if inline:
+        return html.unescape(TAGS.sub(b'', inline).decode('utf-8'))
+    if b't="e"' in attrs:
+        return None
+    return html.unescape(value.decode('utf-8'))
+
+
+# Map header names in the first row to their column letters
+def _read_headers(block, shared_strings):
+    first_row = block[:block.find(b'</row>')]
+    headers = {}
+    for before, letters, _, after, value, inline in HEADER_CELL.findall(first_row):
+        attrs = before + after
+        if value or inline:
+            text = _cell_text(attrs, value, inline, shared_strings)
+            if text is not None:
+                headers[text.strip()] = letters.decode('ascii')
+    header_row = re.search(rb'<row[^>]*? r="(\d+)"', first_row)
+    return headers, int(header_row.group(1)) if header_row else 1
+
+
+# Split the matched cells of a block by column letters, keeping only cells with a value
+def _split_cells(matches, letters_by_name):
+    matches = [m for m in matches if m[4] or m[5]]
+    if not matches:
+        return {name: None for name in letters_by_name}
+    before, letters, rows, after, values, inline = (np.array(part) for part in zip(*matches))
+    attrs = np.char.add(before, after)
+    rows = rows.astype(np.int64)
+    cells = {}
+    for name, column in letters_by_name.items():
+        mask = letters == column
+        cells[name] = (rows[mask], attrs[mask], values[mask], inline[mask]) if mask.any() else None
+    return cells
+
+
+# Convert the cells of one column to row numbers, numbers and (optional) texts
+def _convert_cells(cells, shared_strings, shared_array):
+    if cells is None:
+        return np.empty(0, np.int64), np.empty(0, np.float64), None
+
+    rows, attrs, values, inline = cells
+    numbers = np.full(len(rows), np.nan)
+
+    is_text = (np.char.find(attrs, b't="') >= 0) & (np.char.find(attrs, b't="n"') < 0) & (np.char.find(attrs, b't="b"') < 0)
+    numeric = ~is_text
+    if numeric.any():
+        numbers[numeric] = values[numeric].astype(np.float64)
+    if not is_text.any():
+        return rows, numbers, None
+
+    texts = np.full(len(rows), None, dtype=object)
+    shared = is_text & (np.char.find(attrs, b't="s"') >= 0)
+    if shared.any():
+        texts[shared] = shared_array[values[shared].astype(np.int64)]
+    for i in np.flatnonzero(is_text & ~shared):
+        texts[i] = _cell_text(attrs[i], values[i], inline[i], shared_strings)
+    return rows, numbers, texts
+
+
+# Format a numeric cell for a text column (e.g. a room number typed as a number)
+def _format_number(number):
+    return str(int(number)) if float(number).is_integer() else str(number)
+
+
+# Parse a date or time stored as text, returning NaT when it is not ISO formatted
+def _parse_text(text, unit):
+    try:
+        return np.datetime64(text.strip(), unit)
+    except ValueError:
+        return np.datetime64('NaT', unit)
+
+
+# Convert the numbers and texts of one column to a typed NumPy array
+def _to_array(numbers, texts, kind):
+    has_text = texts is not None
+    text_rows = np.flatnonzero(np.not_equal(texts, None)) if has_text else []
+
+    if kind == 'str':
+        out = np.full(len(numbers), None, dtype=object)
+        for i in np.flatnonzero(~np.isnan(numbers)):
+            out[i] = _format_number(numbers[i])
+        if has_text:
+            out[text_rows] = texts[text_rows]
+        return out
+
+    if kind == 'int':
+        for i in text_rows:
+            try:
+                numbers[i] = float(texts[i])
+            except ValueError:
+                pass
+        return numbers.astype(np.int64) if not np.isnan(numbers).any() else numbers
+
+    missing = np.isnan(numbers)
+    if kind == 'date':
+        out = EXCEL_EPOCH + np.where(missing, 0, np.floor(numbers)).astype(np.int64)
+        out[missing] = np.datetime64('NaT')
+        for i in text_rows:
+            out[i] = _parse_text(texts[i], 'D')
+        return out
+    if kind == 'time':
+        seconds = np.where(missing, 0, np.rint((numbers % 1) * 86400)).astype(np.int64)
+        out = seconds.astype('timedelta64[s]')
+        out[missing] = np.timedelta64('NaT')
+        midnight = np.datetime64('1970-01-01T00:00:00', 's')
+        for i in text_rows:
+            parsed = _parse_text('1970-01-01T' + texts[i].strip(), 's')
+            out[i] = parsed - midnight if not np.isnat(parsed) else np.timedelta64('NaT')
+        return out
+    raise ValueError(f"Unknown column kind: {kind}")
+
+
+# Read the requested columns of an ABCWeekly workbook as typed NumPy arrays
+def read_export(path, columns=None):
+    columns = list(EXPORT_COLUMNS) if columns is None else list(columns)
+    unknown = [name for name in columns if name not in EXPORT_COLUMNS]
+    if unknown:
+        raise ValueError(f"Unknown export columns: {', '.join(unknown)}")
+
+    with zipfile.ZipFile(path) as zf:
+        shared_strings = read_shared_strings(zf)
+        shared_array = np.array(shared_strings, dtype=object)
+        pattern = None
+        header_row = 0
+        parts = {name: [] for name in columns}
+
+        if SHEET_PATH not in zf.namelist():
+            raise ValueError(f"No {SHEET_PATH} in the workbook; is it an ABCWeekly export?")
+        with zf.open(SHEET_PATH) as f:
+            for block in _row_blocks(f):
+                if pattern is None:
+                    headers, header_row = _read_headers(block, shared_strings)
+                    if not headers:
+                        raise ValueError("No header row found in the worksheet.")
+                    missing = [name for name in columns if name not in headers]
+                    if missing:
+                        raise ValueError(f"Missing columns: {', '.join(missing)}")
+                    letters_by_name = {name: headers[name].encode('ascii') for name in columns}
+                    pattern = re.compile(CELL_PATTERN % b'|'.join(set(letters_by_name.values())), re.S)
+                cells = _split_cells(pattern.findall(block), letters_by_name)
+                for name in columns:
+                    parts[name].append(_convert_cells(cells[name], shared_strings, shared_array))
+
+    if pattern is None:
+        raise ValueError("The worksheet is empty.")
+
+    # Align the columns on the sheet row numbers; rows with none of the columns are dropped
+    all_rows = np.unique(np.concatenate([rows for name in columns for rows, _, _ in parts[name]]))
+    all_rows = all_rows[all_rows > header_row]
+    if not len(all_rows):
+        raise ValueError("The worksheet has a header row but no data rows.")
+
+    arrays = {}
+    for name in columns:
+        numbers = np.full(len(all_rows), np.nan)
+        texts = None
+        for rows, part_numbers, part_texts in parts[name]:
+            keep = rows > header_row
+            positions = np.searchsorted(all_rows, rows[keep])
+            numbers[positions] = part_numbers[keep]
+            if part_texts is not None:
+                if texts is None:
+                    texts = np.full(len(all_rows), None, dtype=object)
+                texts[positions] = part_texts[keep]
+        arrays[name] = _to_array(numbers, texts, EXPORT_COLUMNS[name])
+    return arrays
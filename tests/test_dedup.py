@@ -0,0 +1,58 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+from occupancy.dataset import files_in
+from occupancy.dedup import read_deduplicated, read_hour_flags
+from occupancy.headcounts import PEAK_KEY_COLUMNS, PEAKS_PARTITION, histogram_hashes, histogram_scores
+from occupancy.ingest import update_manifest
+from occupancy.rollup import HOURS_PARTITION, unpack_hours
+from occupancy.synthetic import export_week, write_workbook
+
+WEEK = '2024-09-23'
+
+
+# Ingest the given exports into a fresh cache, numbering their modification times in order
+def _ingest(folder, exports):
+    os.makedirs(folder)
+    paths = []
+    for i, columns in enumerate(exports):
+        path = os.path.join(folder, f'export_{i}.xlsx')
+        write_workbook(path, columns)
+        os.utime(path, ns=(i * 10**9, i * 10**9))
+        paths.append(path)
+    manifest, errors = update_manifest(folder, paths, cache_dir=os.path.join(folder, 'cache'), max_workers=1)
+    assert not errors
+    return manifest, os.path.join(folder, 'cache')
+
+
+# Observed and occupied hours, and readings by headcount, of everything ingested
+def _totals(manifest, cache_dir):
+    flags = read_hour_flags(files_in(manifest, [HOURS_PARTITION]), cache_dir=cache_dir)
+    histograms, _ = read_deduplicated(files_in(manifest, [PEAKS_PARTITION]), hashes=histogram_hashes, score=histogram_scores,
+                                      key_columns=PEAK_KEY_COLUMNS, cache_dir=cache_dir)
+    counts = np.zeros(64, dtype=np.int64)
+    for values in histograms.column('Peak Counts').to_pylist():
+        counts[:len(values)] += values
+    return {
+        'room-days': flags.num_rows,
+        'observed': int(unpack_hours(flags.column('Observed Hours').to_numpy()).sum()),
+        'occupied': int(unpack_hours(flags.column('Occupied Hours').to_numpy()).sum()),
+        'observed minutes': float(pd.Series(histograms.column('Observed Minutes').to_numpy()).sum()),
+        'counts': counts.tolist(),
+    }
+
+
+def test_day_split_across_workbooks_keeps_both_halves(tmp_path):
+    columns = export_week(WEEK, floors=1, rooms_per_floor=2, seed=3)
+    whole = _totals(*_ingest(str(tmp_path / 'whole'), [columns]))
+    assert whole['observed'] == whole['room-days'] * 9
+    assert sum(whole['counts']) == len(columns['Peak People Count'])
+
+    # Split the week at Thursday noon, so both workbooks hold part of Thursday
+    split = np.datetime64('2024-09-26T12:00')
+    local = columns['Local Date'].astype('datetime64[ns]') + columns['Local Time']
+    first = local < split
+    halves = [{name: values[mask] for name, values in columns.items()} for mask in (first, ~first)]
+    assert _totals(*_ingest(str(tmp_path / 'split'), halves)) == whole
@@ -0,0 +1,28 @@
+import os
+
+import pyarrow.csv as pacsv
+
+from occupancy.export import export_to_file, remove_stale_exports
+from occupancy.ingest import update_manifest
+from occupancy.manifest import manifest_spaces
+from occupancy.synthetic import export_week, write_workbook
+
+
+def test_raw_export_keeps_office_hours_and_stale_exports_are_removed(tmp_path):
+    path = str(tmp_path / 'export.xlsx')
+    write_workbook(path, export_week('2024-09-23', floors=1, rooms_per_floor=2))
+    cache_dir, export_dir = str(tmp_path / 'cache'), str(tmp_path / 'exports')
+    manifest, _ = update_manifest(str(tmp_path), [path], cache_dir=cache_dir, max_workers=1)
+    spaces = manifest_spaces(manifest)
+
+    for source in ('local', 'utc'):
+        exported = export_to_file('csv', ['raw'], manifest, spaces, list(spaces['Space Name']), '2024-09-23', '2024-09-24',
+                                  10 * 60, 11 * 60, cache_dir=cache_dir, timestamp_source=source, export_dir=export_dir)
+        rows = pacsv.read_csv(exported).to_pandas()
+        # Two rooms, two days, readings every 15 minutes in the 10:00 and 11:00 bins
+        assert len(rows) == 2 * 2 * 8
+        assert {time.hour for time in rows['Local Time']} == {10, 11}
+
+    assert len(os.listdir(export_dir)) == 2
+    remove_stale_exports(export_dir, max_age_hours=0)
+    assert os.listdir(export_dir) == []
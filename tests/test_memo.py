@@ -0,0 +1,12 @@
+import numpy as np
+import pandas as pd
+
+from occupancy.memo import estimate_size
+from occupancy.metrics import OccupancyMatrix
+
+
+def test_estimate_size_counts_matrix_fields():
+    values = np.zeros((20, 500))
+    matrix = OccupancyMatrix([f'Room {i}' for i in range(20)], pd.date_range('2024-09-23', periods=500, freq='h'), values)
+    assert estimate_size(matrix) > values.nbytes + matrix.periods.nbytes
+    assert estimate_size((matrix, matrix)) > 2 * values.nbytes
@@ -0,0 +1,21 @@
+import zipfile
+
+from occupancy.xlsx_reader import SHEET_PATH, read_export
+
+SHEET = (b'<?xml version="1.0" encoding="UTF-8"?>'
+         b'<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main"><sheetData>'
+         b'<row r="1"><c r="A1" t="inlineStr"><is><t>Building Name</t></is></c>'
+         b'<c t="inlineStr" r="B1"><is><t>Space Name</t></is></c></row>'
+         b'<row r="2"><c r="A2" t="inlineStr"><is><t>R&amp;D &lt;x&gt;</t></is></c>'
+         b'<c s="1" t="str" r="B2"><f>A2</f><v>A&amp;B &lt;1&gt;</v></c></row>'
+         b'</sheetData></worksheet>')
+
+
+def test_inline_and_formula_text_is_unescaped(tmp_path):
+    path = tmp_path / 'export.xlsx'
+    with zipfile.ZipFile(path, 'w') as zf:
+        zf.writestr(SHEET_PATH, SHEET)
+
+    arrays = read_export(path, ['Building Name', 'Space Name'])
+    assert list(arrays['Building Name']) == ['R&D <x>']
+    assert list(arrays['Space Name']) == ['A&B <1>']